@@ -559,8 +559,9 @@ def handle_goal_control(x: float, y: float):
     result = world.map.set_goal(Point(x, y), clearance=0.2)
     if result:
 
+        # Planners reuse what they have computed so far when they can
         for robot, controller in zip(world.robots, world.controllers):
-            controller.reset(robot.current_pose)
+            controller.retarget(robot.current_pose, goal=world.map.goal)
 
         send_world_data(sid)
 
@@ -0,0 +1,314 @@
+import heapq
+import numpy as np
+
+from model.controllers.lattice_graph import LatticeGraph
+
+
+class ClusterGraph:
+    """
+    Abstract graph used by hierarchical planners (HPA*). The lattice is partitioned
+    into square clusters of cluster_size x cluster_size cells. The free edges of the
+    lattice (LatticeGraph) crossing the border between two adjacent clusters are
+    grouped into entrances: two crossing edges are in the same entrance if their
+    cells on each side of the border are connected along the border. Each entrance
+    produces one or two transitions (edges crossing the border), and the clusters
+    touching at a corner get a transition if the diagonal edge between them is free.
+    Any path on the lattice can therefore be moved to go through the transitions,
+    so the abstract graph connects the same cells as the lattice. The cells of the
+    transitions are the nodes of the abstract graph. Two nodes are connected if they
+    are the two cells of a transition (inter edge) or if they are in the same cluster
+    and one can be reached from the other without leaving the cluster (intra edge).
+    The cost and the lattice path of each intra edge are computed once and cached.
+
+    Moves follow the free edges of the lattice, whose collision model is the one of
+    A*, so no further collision check is needed. When the map changes, only the
+    clusters touched by the added or removed obstacles and the clusters adjacent to
+    them are recomputed.
+    """
+
+    # Entrances at least this long get a transition at each end instead of one in the middle
+    LONG_ENTRANCE = 6
+
+    def __init__(self, world_map, discretization_step=0.2, margin=0.2, cluster_size=10):
+
+        self.world_map = world_map
+        self.discretization_step = discretization_step
+        self.margin = margin
+        self.cluster_size = cluster_size
+
+        self.lattice_graph = LatticeGraph(world_map, discretization_step, margin)
+
+        # Number of clusters along each axis
+        rows, cols = self.lattice_graph.shape
+        self.num_clusters = (int(np.ceil(rows / cluster_size)), int(np.ceil(cols / cluster_size)))
+
+        # Transitions between adjacent clusters ({(cluster_1, cluster_2): [(index_1, index_2), ...]})
+        self.borders = {}
+
+        # Other end of the transitions of each node ({index: set(index)})
+        self.transitions = {}
+
+        # Abstract nodes of each cluster ({cluster: set(index)})
+        self.cluster_nodes = {}
+
+        # Intra edges of each cluster ({cluster: {index_1: {index_2: (cost, path)}}})
+        self.intra_edges = {}
+
+        # Number of clusters recomputed by the last build or update
+        self.updated_clusters = 0
+
+        self.build()
+
+    @property
+    def map_version(self):
+        return self.lattice_graph.map_version
+
+    def get_clusters(self):
+        return [(ci, cj) for ci in range(self.num_clusters[0]) for cj in range(self.num_clusters[1])]
+
+    def get_cluster(self, index):
+        return ((index[0] - self.lattice_graph.min_i) // self.cluster_size,
+                (index[1] - self.lattice_graph.min_j) // self.cluster_size)
+
+    def get_cluster_range(self, cluster):
+        """
+        Returns the range (min_i, min_j, max_i, max_j) of the cells of the cluster
+        """
+        min_i = self.lattice_graph.min_i + cluster[0] * self.cluster_size
+        min_j = self.lattice_graph.min_j + cluster[1] * self.cluster_size
+        return (min_i, min_j,
+                min(min_i + self.cluster_size - 1, self.lattice_graph.max_i),
+                min(min_j + self.cluster_size - 1, self.lattice_graph.max_j))
+
+    def get_adjacent_clusters(self, cluster):
+        """
+        Clusters sharing a border or a corner with the one specified
+        """
+        ci, cj = cluster
+        return [(ci + di, cj + dj) for di in range(-1, 2) for dj in range(-1, 2)
+                if not (di == 0 and dj == 0) and
+                0 <= ci + di < self.num_clusters[0] and 0 <= cj + dj < self.num_clusters[1]]
+
+    def build(self):
+        """
+        Compute the whole abstract graph
+        """
+
+        clusters = self.get_clusters()
+
+        self.borders = {}
+        self.transitions = {}
+        for cluster in clusters:
+            for adjacent in self.get_adjacent_clusters(cluster):
+                if cluster < adjacent:
+                    self.update_border(cluster, adjacent)
+
+        self.cluster_nodes = {}
+        self.intra_edges = {}
+        for cluster in clusters:
+            self.cluster_nodes[cluster] = self.collect_cluster_nodes(cluster)
+            self.update_intra_edges(cluster)
+
+        self.updated_clusters = len(clusters)
+
+    def update(self):
+        """
+        Bring the abstract graph up to date with the map. Returns True if something changed
+        """
+
+        changes_bounds = self.lattice_graph.update()
+
+        if changes_bounds is None:
+            self.build()
+            return True
+
+        self.updated_clusters = 0
+        if len(changes_bounds) == 0:
+            return False
+
+        # Clusters containing cells whose edges might have changed
+        touched = set()
+        for bounds in changes_bounds:
+            min_i, min_j, max_i, max_j = self.lattice_graph.get_cells_in_bounds(bounds)
+            if min_i > max_i or min_j > max_j:
+                continue
+            min_ci, min_cj = self.get_cluster((min_i, min_j))
+            max_ci, max_cj = self.get_cluster((max_i, max_j))
+            for ci in range(min_ci, max_ci + 1):
+                for cj in range(min_cj, max_cj + 1):
+                    touched.add((ci, cj))
+
+        # The transitions between the touched clusters and the adjacent ones might change
+        for cluster in touched:
+            for adjacent in self.get_adjacent_clusters(cluster):
+                self.update_border(min(cluster, adjacent), max(cluster, adjacent))
+
+        # The paths inside the touched clusters must be recomputed. The adjacent
+        # clusters only need it if their set of nodes has changed
+        to_update = set(touched)
+        for cluster in touched:
+            for adjacent in self.get_adjacent_clusters(cluster):
+                if adjacent not in to_update and self.collect_cluster_nodes(adjacent) != self.cluster_nodes[adjacent]:
+                    to_update.add(adjacent)
+
+        for cluster in to_update:
+            self.cluster_nodes[cluster] = self.collect_cluster_nodes(cluster)
+            self.update_intra_edges(cluster)
+
+        self.updated_clusters = len(to_update)
+        return True
+
+    def update_border(self, cluster_1, cluster_2):
+        """
+        Compute the transitions between two adjacent clusters (cluster_1 is the one
+        with the lower cluster indices)
+        """
+
+        # Remove the old transitions
+        for index_1, index_2 in self.borders.get((cluster_1, cluster_2), []):
+            self.transitions[index_1].discard(index_2)
+            self.transitions[index_2].discard(index_1)
+            if len(self.transitions[index_1]) == 0:
+                del self.transitions[index_1]
+            if len(self.transitions[index_2]) == 0:
+                del self.transitions[index_2]
+
+        if cluster_1[0] != cluster_2[0] and cluster_1[1] != cluster_2[1]:
+            border = self.get_corner_transitions(cluster_1, cluster_2)
+        else:
+            border = self.get_border_transitions(cluster_1, cluster_2)
+
+        for index_1, index_2 in border:
+            self.transitions.setdefault(index_1, set()).add(index_2)
+            self.transitions.setdefault(index_2, set()).add(index_1)
+
+        self.borders[(cluster_1, cluster_2)] = border
+
+    def get_corner_transitions(self, cluster_1, cluster_2):
+        """
+        Transition between two clusters touching at a corner: the diagonal edge between their corner cells
+        """
+
+        di, dj = cluster_2[0] - cluster_1[0], cluster_2[1] - cluster_1[1]
+        min_i, min_j, max_i, max_j = self.get_cluster_range(cluster_1)
+        index_1 = (max_i if di > 0 else min_i, max_j if dj > 0 else min_j)
+        index_2 = (index_1[0] + di, index_1[1] + dj)
+        return [(index_1, index_2)] if self.lattice_graph.is_edge_free(index_1, index_2) else []
+
+    def get_runs(self, cells):
+        """
+        Label the cells of a side of a border (in order along it) with the run of cells connected along the border
+        """
+
+        runs = [0]
+        for previous, cell in zip(cells, cells[1:]):
+            runs.append(runs[-1] + (0 if self.lattice_graph.is_edge_free(previous, cell) else 1))
+        return runs
+
+    def get_border_transitions(self, cluster_1, cluster_2):
+        """
+        Transitions along the border between two clusters sharing a side
+        """
+
+        min_i, min_j, max_i, max_j = self.get_cluster_range(cluster_1)
+
+        # Cells on the two sides of the border, facing each other
+        if cluster_2[0] > cluster_1[0]:
+            side_1 = [(max_i, j) for j in range(min_j, max_j + 1)]
+            side_2 = [(max_i + 1, j) for j in range(min_j, max_j + 1)]
+        else:
+            side_1 = [(i, max_j) for i in range(min_i, max_i + 1)]
+            side_2 = [(i, max_j + 1) for i in range(min_i, max_i + 1)]
+
+        # Split the free edges crossing the border (straight and diagonal ones) into
+        # entrances, according to the runs of connected cells they join on the two sides
+        runs_1 = self.get_runs(side_1)
+        runs_2 = self.get_runs(side_2)
+        entrances = {}
+        for k in range(len(side_1)):
+            for other in (k - 1, k, k + 1):
+                if 0 <= other < len(side_2) and self.lattice_graph.is_edge_free(side_1[k], side_2[other]):
+                    entrances.setdefault((runs_1[k], runs_2[other]), []).append((side_1[k], side_2[other]))
+
+        border = []
+        for entrance in entrances.values():
+            if len({index_1 for index_1, _ in entrance}) >= self.LONG_ENTRANCE:
+                border.append(entrance[0])
+                border.append(entrance[-1])
+            else:
+                border.append(entrance[len(entrance) // 2])
+
+        return border
+
+    def collect_cluster_nodes(self, cluster):
+        nodes = set()
+        for adjacent in self.get_adjacent_clusters(cluster):
+            for transition in self.borders.get((min(cluster, adjacent), max(cluster, adjacent)), []):
+                for index in transition:
+                    if self.get_cluster(index) == cluster:
+                        nodes.add(index)
+        return nodes
+
+    def update_intra_edges(self, cluster):
+        nodes = self.cluster_nodes[cluster]
+        self.intra_edges[cluster] = {
+            node: {other: edge for other, edge in self.search_cluster(node, nodes).items() if other != node}
+            for node in nodes
+        }
+
+    def search_cluster(self, source, targets):
+        """
+        Dijkstra search from the source restricted to the cluster that contains it.
+        Returns {target: (cost, path)} for each reachable target, where path is the
+        list of lattice indices from the source to the target
+        """
+
+        cluster_range = self.get_cluster_range(self.get_cluster(source))
+        remaining = set(targets)
+
+        costs = {source: 0}
+        parents = {source: None}
+        closed_set = set()
+        open_set = [(0, source)]
+
+        result = {}
+        while len(open_set) > 0 and len(remaining) > 0:
+
+            cost, current = heapq.heappop(open_set)
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+
+            if current in remaining:
+                remaining.discard(current)
+                path = []
+                index = current
+                while index is not None:
+                    path.append(index)
+                    index = parents[index]
+                result[current] = (cost, path[::-1])
+
+            for neighbor, edge_cost in self.lattice_graph.get_neighbors(current, cluster_range):
+                new_cost = cost + edge_cost
+                if neighbor not in closed_set and new_cost < costs.get(neighbor, float('inf')):
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = current
+                    heapq.heappush(open_set, (new_cost, neighbor))
+
+        return result
+
+    def get_edges(self, index):
+        """
+        Abstract edges leaving the node. Returns a list of (index, cost, path)
+        """
+
+        edges = []
+
+        cluster_edges = self.intra_edges.get(self.get_cluster(index), {})
+        for other, (cost, path) in cluster_edges.get(index, {}).items():
+            edges.append((other, cost, path))
+
+        for other in self.transitions.get(index, []):
+            edges.append((other, self.lattice_graph.move_cost(index, other), [index, other]))
+
+        return edges
@@ -49,6 +49,9 @@ class Controller:
                 # Remove it from the list
                 self.search_algorithm.path.pop(0)
 
+                # Let the search algorithm know where the robot is
+                self.search_algorithm.update_start(current_target)
+
             target_x = current_target.x
             target_y = current_target.y
 
@@ -83,6 +86,9 @@ class Controller:
             # Remove it from the list
             self.search_algorithm.path.pop(0)
 
+            # Let the search algorithm know where the robot is
+            self.search_algorithm.update_start(current_target)
+
         # Add the orientation (keep the orientation of the robot while moving towards the goal)
         current_x, current_y, current_theta = self.robot.current_pose
         new_x, new_y = current_target
@@ -105,6 +111,9 @@ class Controller:
         self.search_algorithm.start = pose.as_point()
         self.search_algorithm.reset()
 
+    def retarget(self, pose, goal=None):
+        self.search_algorithm.retarget(start=pose.as_point(), goal=goal)
+
     def to_dict(self):
         return {
             "search_algorithm": self.search_algorithm.to_dict()
@@ -0,0 +1,129 @@
+import heapq
+import numpy as np
+
+from model.controllers.lattice_graph import LatticeGraph
+
+
+class CostToGoField:
+    """
+    Cost-to-go of each cell of the lattice, computed by a Dijkstra search that starts
+    from the goal and stored in a NumPy array. Moves follow the free edges of the
+    lattice (see LatticeGraph), so costs are the ones A* finds on it. Once the cost
+    of a cell is final, the path from that cell to the goal is read by steepest
+    descent in O(path length), so the same field serves any start position and any
+    number of robots heading to the same goal.
+
+    The search can be advanced a few cells at a time (expand) and is only restarted
+    when the goal or the map version changes.
+    """
+
+    def __init__(self, world_map, discretization_step=0.2, margin=0.2):
+
+        self.world_map = world_map
+        self.discretization_step = discretization_step
+        self.margin = margin
+
+        self.lattice_graph = LatticeGraph(world_map, discretization_step, margin)
+        self.min_i = self.lattice_graph.min_i
+        self.min_j = self.lattice_graph.min_j
+
+        # Cost-to-go of each cell and cells whose cost is final
+        self.costs = np.full(self.lattice_graph.shape, np.inf)
+        self.settled = np.zeros(self.lattice_graph.shape, dtype=bool)
+
+        self.goal_index = None
+        self.open_set = []
+
+        self.reset()
+
+    def point_to_index(self, point):
+        return round(point.x / self.discretization_step), round(point.y / self.discretization_step)
+
+    def reset(self):
+        """
+        Restart the search from the current goal
+        """
+
+        self.goal_index = self.point_to_index(self.world_map.goal)
+        self.costs[:, :] = np.inf
+        self.settled[:, :] = False
+        self.open_set = []
+
+        if self.lattice_graph.in_bounds(*self.goal_index):
+            self.costs[self.goal_index[0] - self.min_i, self.goal_index[1] - self.min_j] = 0
+            self.open_set.append((0, self.goal_index))
+
+    def is_valid(self):
+        return (self.goal_index == self.point_to_index(self.world_map.goal) and
+                self.lattice_graph.map_version == self.world_map.version)
+
+    def update(self):
+        """
+        Restart the search if the goal or the map changed. Returns True if the field has been reset
+        """
+
+        if self.is_valid():
+            return False
+
+        self.lattice_graph.update()
+        self.reset()
+        return True
+
+    @property
+    def complete(self):
+        return len(self.open_set) == 0
+
+    def is_settled(self, index):
+        return self.lattice_graph.in_bounds(*index) and self.settled[index[0] - self.min_i, index[1] - self.min_j]
+
+    def cost(self, index):
+        """
+        Cost-to-go of the cell (infinite if outside the map, not reachable or not yet reached)
+        """
+        if not self.lattice_graph.in_bounds(*index):
+            return np.inf
+        return self.costs[index[0] - self.min_i, index[1] - self.min_j]
+
+    def expand(self, max_expansions=None):
+        """
+        Settle up to max_expansions cells (all the remaining ones if None).
+        Returns the list of settled cells
+        """
+
+        expanded = []
+        while len(self.open_set) > 0 and (max_expansions is None or len(expanded) < max_expansions):
+
+            cost, current = heapq.heappop(self.open_set)
+            a, b = current[0] - self.min_i, current[1] - self.min_j
+            if self.settled[a, b]:
+                continue
+            self.settled[a, b] = True
+            expanded.append(current)
+
+            # Moves are symmetric, so the cells that reach the current one are the ones it reaches
+            for neighbor, move_cost in self.lattice_graph.get_neighbors(current):
+                na, nb = neighbor[0] - self.min_i, neighbor[1] - self.min_j
+                new_cost = cost + move_cost
+                if new_cost < self.costs[na, nb]:
+                    self.costs[na, nb] = new_cost
+                    heapq.heappush(self.open_set, (new_cost, neighbor))
+
+        return expanded
+
+    def descend(self, index):
+        """
+        Path (list of cells, from the one specified to the goal) obtained by moving each
+        time to the neighbor that minimizes move cost + cost-to-go. Returns None if
+        the cost of the cell is not final or the goal can't be reached
+        """
+
+        if not self.is_settled(index) or self.cost(index) == np.inf:
+            return None
+
+        path = [index]
+        current = index
+        while current != self.goal_index:
+            current = min(self.lattice_graph.get_neighbors(current), key=lambda move: move[1] + self.cost(move[0]))[0]
+            path.append(current)
+
+        return path
@@ -0,0 +1,168 @@
+from model.geometry.intersection import check_intersection
+from model.geometry.polygon import Polygon
+from model.geometry.point import Point
+
+
+class QuadCell:
+    """
+    Cell of the free space decomposition
+    """
+
+    def __init__(self, bounds, free=False):
+        self.bounds = bounds
+        self.free = free
+        self.children = None
+
+        # Position in the list of free cells (only for free leaves)
+        self.cell_id = None
+
+    @property
+    def center(self):
+        min_x, min_y, max_x, max_y = self.bounds
+        return Point((min_x + max_x) / 2, (min_y + max_y) / 2)
+
+    def contains(self, point):
+        min_x, min_y, max_x, max_y = self.bounds
+        return min_x <= point.x <= max_x and min_y <= point.y <= max_y
+
+    def as_polygon(self):
+        min_x, min_y, max_x, max_y = self.bounds
+        return Polygon([
+            Point(min_x, max_y),
+            Point(min_x, min_y),
+            Point(max_x, min_y),
+            Point(max_x, max_y),
+        ])
+
+
+class FreeSpaceQuadTree:
+    """
+    Adaptive decomposition of the free space of the map. Starting from the whole
+    map, a cell is split into four children as long as the obstacles (enlarged by
+    half the margin) intersect it and its sides are longer than min_cell_size.
+    Leaves that don't intersect any obstacle are free; the ones that reach the
+    minimum size while still intersecting an obstacle are considered occupied.
+    Open areas are covered by a few large cells and only the regions around the
+    obstacles are finely subdivided.
+
+    Two free leaves are adjacent if they share a portion of a side. The midpoint of
+    the shared portion (portal) belongs to both cells and, since the cells are
+    convex and free, the segments from it to any point of the two cells are collision
+    free: moving from a cell to an adjacent one through the portal is always safe.
+
+    The decomposition reflects the map at the time it is built (map_version).
+    """
+
+    def __init__(self, world_map, margin=0.2, min_cell_size=0.2):
+
+        self.world_map = world_map
+        self.margin = margin
+        self.min_cell_size = min_cell_size
+
+        self.root = None
+
+        # Free leaves and their adjacency ({cell_id: [(cell_id, portal), ...]})
+        self.cells = []
+        self.adjacency = []
+
+        self.map_version = None
+
+        self.build()
+
+    def is_outdated(self):
+        return self.map_version != self.world_map.version
+
+    def build(self):
+
+        self.map_version = self.world_map.version
+        self.root = QuadCell(self.world_map.map_boundaries)
+        self.cells = []
+
+        clearance = self.margin / 2
+
+        # Each cell is only tested against the obstacles intersecting its parent
+        stack = [(self.root, self.world_map.obstacles)]
+        while len(stack) > 0:
+
+            cell, candidates = stack.pop()
+            min_x, min_y, max_x, max_y = cell.bounds
+
+            region = QuadCell((min_x - clearance, min_y - clearance, max_x + clearance, max_y + clearance)).as_polygon()
+            obstacles = [obstacle for obstacle in candidates if check_intersection(region, obstacle.polygon)]
+            if len(obstacles) == 0:
+                cell.free = True
+                cell.cell_id = len(self.cells)
+                self.cells.append(cell)
+                continue
+
+            # Mixed cell with minimum size: occupied
+            if max_x - min_x <= self.min_cell_size and max_y - min_y <= self.min_cell_size:
+                continue
+
+            mid_x, mid_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+            cell.children = [
+                QuadCell((mid_x, mid_y, max_x, max_y)),
+                QuadCell((min_x, mid_y, mid_x, max_y)),
+                QuadCell((min_x, min_y, mid_x, mid_y)),
+                QuadCell((mid_x, min_y, max_x, mid_y)),
+            ]
+            stack.extend((child, obstacles) for child in cell.children)
+
+        self.build_adjacency()
+
+    @staticmethod
+    def key(value):
+        # Sides of adjacent cells are computed by the same halvings, round to absorb float noise
+        return round(value, 9)
+
+    def build_adjacency(self):
+        """
+        Find the adjacent free leaves by matching the sides of the cells with the same coordinate
+        """
+
+        self.adjacency = [[] for _ in self.cells]
+
+        # Free leaves by coordinate of their left and bottom sides
+        by_min_x = {}
+        by_min_y = {}
+        for cell in self.cells:
+            by_min_x.setdefault(self.key(cell.bounds[0]), []).append(cell)
+            by_min_y.setdefault(self.key(cell.bounds[1]), []).append(cell)
+
+        for cell in self.cells:
+            min_x, min_y, max_x, max_y = cell.bounds
+
+            # Cells on the right
+            for other in by_min_x.get(self.key(max_x), []):
+                low, high = max(min_y, other.bounds[1]), min(max_y, other.bounds[3])
+                if high - low > 1e-9:
+                    self.connect(cell, other, Point(max_x, (low + high) / 2))
+
+            # Cells above
+            for other in by_min_y.get(self.key(max_y), []):
+                low, high = max(min_x, other.bounds[0]), min(max_x, other.bounds[2])
+                if high - low > 1e-9:
+                    self.connect(cell, other, Point((low + high) / 2, max_y))
+
+    def connect(self, cell_1, cell_2, portal):
+        self.adjacency[cell_1.cell_id].append((cell_2.cell_id, portal))
+        self.adjacency[cell_2.cell_id].append((cell_1.cell_id, portal))
+
+    def locate(self, point):
+        """
+        Returns the free leaf containing the point (None if the point is in an occupied cell)
+        """
+
+        cell = self.root
+        if not cell.contains(point):
+            return None
+
+        while cell.children is not None:
+            cell = next((child for child in cell.children if child.contains(point)), None)
+            if cell is None:
+                return None
+
+        return cell if cell.free else None
+
+    def __len__(self):
+        return len(self.cells)
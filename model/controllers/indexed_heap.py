@@ -0,0 +1,106 @@
+class IndexedHeap:
+    """
+    Binary min-heap that keeps track of the position of each item. This allows us
+    to update the priority of an item already in the heap or to remove it in
+    O(log n), which is something we can't do with the PriorityQueue used by the
+    other algorithms. Items must be hashable and unique; priorities must be
+    comparable (e.g. numbers or tuples of numbers).
+    """
+
+    def __init__(self):
+        self.heap = []  # List of [priority, item]
+        self.positions = {}  # {item: index in the heap}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __iter__(self):
+        return iter([item for _, item in self.heap])
+
+    def clear(self):
+        self.heap = []
+        self.positions = {}
+
+    def top(self):
+        """
+        Returns the (item, priority) pair with the minimum priority without removing it
+        """
+        priority, item = self.heap[0]
+        return item, priority
+
+    def top_priority(self):
+        return self.heap[0][0]
+
+    def priority(self, item):
+        return self.heap[self.positions[item]][0]
+
+    def push(self, item, priority):
+        """
+        Insert the item with the specified priority. If the item is already
+        in the heap, its priority is updated instead
+        """
+
+        if item in self.positions:
+            index = self.positions[item]
+            old_priority = self.heap[index][0]
+            self.heap[index][0] = priority
+            if priority < old_priority:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        else:
+            self.heap.append([priority, item])
+            self.positions[item] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """
+        Remove and return the (item, priority) pair with the minimum priority
+        """
+
+        item, priority = self.top()
+        self.remove(item)
+        return item, priority
+
+    def remove(self, item):
+        index = self.positions.pop(item)
+        last = self.heap.pop()
+
+        # The removed item was the last one
+        if index == len(self.heap):
+            return
+
+        # Move the last item in the hole and restore the heap property
+        self.heap[index] = last
+        self.positions[last[1]] = index
+        self._sift_up(index)
+        self._sift_down(self.positions[last[1]])
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.positions[self.heap[i][1]] = i
+        self.positions[self.heap[j][1]] = j
+
+    def _sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if self.heap[index][0] < self.heap[parent][0]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _sift_down(self, index):
+        size = len(self.heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self.heap[child][0] < self.heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
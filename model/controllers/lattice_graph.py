@@ -0,0 +1,196 @@
+import numpy as np
+
+from model.geometry.intersection import segment_buffers_intersect_polygon
+
+
+UNKNOWN = -1
+FREE = 0
+BLOCKED = 1
+
+# Direction of the edges stored for each cell (the other 4 are the same edges seen from the other end)
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def lattice_boundaries(map_boundaries, discretization_step):
+    """
+    Returns (min_i, min_j, max_i, max_j), the range of lattice indices inside the map.
+    Cell (i, j) of the lattice is centered in (i * discretization_step, j * discretization_step)
+    """
+    min_x, min_y, max_x, max_y = map_boundaries
+    step = discretization_step
+    return (int(np.ceil(min_x / step - 1e-9)), int(np.ceil(min_y / step - 1e-9)),
+            int(np.floor(max_x / step + 1e-9)), int(np.floor(max_y / step + 1e-9)))
+
+
+class LatticeGraph:
+    """
+    Edges of the 8-connected lattice used by search based algorithms, with the collision
+    model of SearchBased.edge_cost: the edge between two adjacent cells is free if the
+    segment between their centers, enlarged by margin / 2 on each side (the buffer of
+    SearchAlgorithm.check_collision), does not intersect any obstacle. Planners that
+    work on the lattice only (JPS, HPA*, the cost-to-go field) therefore find paths
+    with the same costs as A* on it.
+
+    Edges are evaluated lazily, a block of BLOCK_SIZE x BLOCK_SIZE cells at a time (the
+    obstacles around the block are queried once and tested against all its edges with
+    a vectorized separating axis test), and cached in one array per direction. The
+    graph keeps track of the map version and, when updated, only invalidates the edges
+    around the obstacles reported by the map journal.
+    """
+
+    BLOCK_SIZE = 8
+
+    def __init__(self, world_map, discretization_step=0.2, margin=0.2):
+
+        self.world_map = world_map
+        self.discretization_step = discretization_step
+        self.margin = margin
+
+        self.min_i, self.min_j, self.max_i, self.max_j = lattice_boundaries(
+            world_map.map_boundaries, discretization_step
+        )
+
+        # State of the edge leaving each cell in each of the DIRECTIONS
+        self.edges = np.full((len(DIRECTIONS), self.max_i - self.min_i + 1, self.max_j - self.min_j + 1),
+                             UNKNOWN, dtype=np.int8)
+        self.map_version = world_map.version
+
+    @property
+    def shape(self):
+        return self.edges.shape[1:]
+
+    def in_bounds(self, i, j):
+        return self.min_i <= i <= self.max_i and self.min_j <= j <= self.max_j
+
+    def evaluate_block(self, a, b):
+        """
+        Evaluate the edges leaving the cells of the block containing the cell with array
+        coordinates (a, b)
+        """
+
+        rows, cols = self.shape
+        min_a, min_b = a - a % self.BLOCK_SIZE, b - b % self.BLOCK_SIZE
+        max_a, max_b = min(min_a + self.BLOCK_SIZE, rows), min(min_b + self.BLOCK_SIZE, cols)
+
+        grid_a, grid_b = np.meshgrid(np.arange(min_a, max_a), np.arange(min_b, max_b), indexing='ij')
+        origins = np.column_stack([grid_a.ravel(), grid_b.ravel()])
+
+        # Edges leaving the cells of the block and ending inside the map
+        slots = []
+        for direction, (di, dj) in enumerate(DIRECTIONS):
+            ends = origins + (di, dj)
+            inside = (ends[:, 0] >= 0) & (ends[:, 0] < rows) & (ends[:, 1] >= 0) & (ends[:, 1] < cols)
+            self.edges[direction, origins[~inside, 0], origins[~inside, 1]] = BLOCKED
+            slots.extend((direction, origin_a, origin_b) for origin_a, origin_b in origins[inside].tolist())
+
+        if len(slots) == 0:
+            return
+
+        slots = np.array(slots, dtype=np.int64)
+        directions = np.array(DIRECTIONS)[slots[:, 0]]
+        starts = (slots[:, 1:] + (self.min_i, self.min_j)) * self.discretization_step
+        ends = (slots[:, 1:] + directions + (self.min_i, self.min_j)) * self.discretization_step
+
+        min_x, min_y = np.minimum(starts, ends).min(axis=0) - self.margin
+        max_x, max_y = np.maximum(starts, ends).max(axis=0) + self.margin
+        collisions = np.zeros(len(slots), dtype=bool)
+        for obstacle_id in self.world_map.query_bounds((min_x, min_y, max_x, max_y)):
+            polygon = self.world_map.get_obstacle(obstacle_id).polygon
+            collisions |= segment_buffers_intersect_polygon(starts, ends, self.margin / 2, polygon)
+
+        self.edges[slots[:, 0], slots[:, 1], slots[:, 2]] = np.where(collisions, BLOCKED, FREE)
+
+    def is_edge_free(self, index_1, index_2):
+        """
+        Returns True if the two cells are adjacent, inside the map and connected by a free edge
+        """
+
+        if not (self.in_bounds(*index_1) and self.in_bounds(*index_2)):
+            return False
+
+        direction = (index_2[0] - index_1[0], index_2[1] - index_1[1])
+        if direction in DIRECTIONS:
+            origin = index_1
+        elif (-direction[0], -direction[1]) in DIRECTIONS:
+            origin, direction = index_2, (-direction[0], -direction[1])
+        else:
+            return False
+
+        slot = DIRECTIONS.index(direction), origin[0] - self.min_i, origin[1] - self.min_j
+        if self.edges[slot] == UNKNOWN:
+            self.evaluate_block(slot[1], slot[2])
+
+        return self.edges[slot] == FREE
+
+    def move_cost(self, index_1, index_2):
+        """
+        Length of the move between two adjacent cells (whether it is free or not)
+        """
+        diagonal = index_1[0] != index_2[0] and index_1[1] != index_2[1]
+        return self.discretization_step * (np.sqrt(2) if diagonal else 1)
+
+    def edge_cost(self, index_1, index_2):
+        if not self.is_edge_free(index_1, index_2):
+            return np.inf
+        return self.move_cost(index_1, index_2)
+
+    def get_neighbors(self, index, cells_range=None):
+        """
+        Cells connected to the one specified by a free edge (only the ones in the range
+        (min_i, min_j, max_i, max_j), if specified). Returns a list of (index, cost)
+        """
+
+        i, j = index
+        neighbors = []
+        for di in range(-1, 2):
+            for dj in range(-1, 2):
+                neighbor = (i + di, j + dj)
+                if di == 0 and dj == 0:
+                    continue
+                if cells_range is not None and not (cells_range[0] <= neighbor[0] <= cells_range[2] and
+                                                    cells_range[1] <= neighbor[1] <= cells_range[3]):
+                    continue
+                if self.is_edge_free(index, neighbor):
+                    neighbors.append((neighbor, self.move_cost(index, neighbor)))
+        return neighbors
+
+    def get_cells_in_bounds(self, bounds):
+        """
+        Returns the range (min_i, min_j, max_i, max_j) of the cells whose edges might
+        cross the region defined by the bounds enlarged by the margin
+        """
+
+        min_x, min_y, max_x, max_y = bounds
+        step = self.discretization_step
+        clearance = self.margin / 2
+        return (max(self.min_i, int(np.floor((min_x - clearance) / step)) - 1),
+                max(self.min_j, int(np.floor((min_y - clearance) / step)) - 1),
+                min(self.max_i, int(np.ceil((max_x + clearance) / step)) + 1),
+                min(self.max_j, int(np.ceil((max_y + clearance) / step)) + 1))
+
+    def invalidate(self, bounds):
+        min_i, min_j, max_i, max_j = self.get_cells_in_bounds(bounds)
+        if min_i <= max_i and min_j <= max_j:
+            self.edges[:, min_i - self.min_i:max_i - self.min_i + 1, min_j - self.min_j:max_j - self.min_j + 1] = UNKNOWN
+
+    def update(self):
+        """
+        Bring the graph up to date with the map. Returns the bounds of the changed
+        regions (empty if nothing changed) or None if the whole graph has been invalidated
+        """
+
+        if self.map_version == self.world_map.version:
+            return []
+
+        changes = self.world_map.changes_since(self.map_version)
+        self.map_version = self.world_map.version
+
+        if changes is None:
+            self.edges[:, :, :] = UNKNOWN
+            return None
+
+        changes_bounds = [change.bounds for change in changes]
+        for bounds in changes_bounds:
+            self.invalidate(bounds)
+
+        return changes_bounds
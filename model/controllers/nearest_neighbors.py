@@ -0,0 +1,174 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class NearestNeighborIndex:
+    """
+    Nearest neighbor index for the nodes of a tree that grows one node at a time.
+    Coordinates are stored in a NumPy buffer; a cKDTree covers the first part of the
+    buffer and the nodes added after the last rebuild (the tail) are searched by brute
+    force. The k-d tree is rebuilt when the tail grows longer than tail_factor * sqrt(n):
+    this balances the cost of the rebuilds (O(n log n) every sqrt(n) insertions) and
+    the cost of the brute force search of the tail in each query. Removed nodes are
+    only marked as such and are dropped at the next rebuild.
+
+    Items must be hashable (e.g. the indices of the nodes of a Tree); the position
+    of an item is read from its point attribute unless specified.
+    """
+
+    def __init__(self, min_tail=64, tail_factor=4, initial_capacity=1024):
+
+        # Rebuild the tree when the tail is longer than max(min_tail, tail_factor * sqrt(indexed nodes))
+        self.min_tail = min_tail
+        self.tail_factor = tail_factor
+        self.initial_capacity = initial_capacity
+
+        self.coordinates = np.empty((initial_capacity, 2))
+        self.alive = np.zeros(initial_capacity, dtype=bool)
+        self.items = []
+
+        # Position of each stored item in the buffer ({item: position})
+        self.positions = {}
+
+        self.tree = None
+        self.tree_size = 0
+        self.num_removed = 0
+
+    def clear(self):
+        self.coordinates = np.empty((self.initial_capacity, 2))
+        self.alive = np.zeros(self.initial_capacity, dtype=bool)
+        self.items = []
+        self.positions = {}
+        self.tree = None
+        self.tree_size = 0
+        self.num_removed = 0
+
+    def __len__(self):
+        return len(self.items) - self.num_removed
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __iter__(self):
+        return (item for position, item in enumerate(self.items) if self.alive[position])
+
+    def add(self, item, point=None):
+
+        if point is None:
+            point = item.point
+
+        position = len(self.items)
+        if position == len(self.coordinates):
+            self.coordinates = np.concatenate([self.coordinates, np.empty_like(self.coordinates)])
+            self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+
+        self.coordinates[position] = (point.x, point.y)
+        self.alive[position] = True
+        self.items.append(item)
+        self.positions[item] = position
+
+        if len(self.items) - self.tree_size > max(self.min_tail, self.tail_factor * np.sqrt(self.tree_size)):
+            self.rebuild()
+
+    def load(self, items, coordinates):
+        """
+        Replace the content of the index with the items in the (n, 2) array of coordinates
+        """
+
+        self.clear()
+        capacity = max(self.initial_capacity, len(items))
+        self.coordinates = np.empty((capacity, 2))
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        self.items = list(items)
+        self.coordinates[:len(self.items)] = coordinates
+        self.alive[:len(self.items)] = True
+        self.positions = {item: position for position, item in enumerate(self.items)}
+        self.rebuild()
+
+    def remove(self, item):
+
+        position = self.positions.pop(item, None)
+        if position is None:
+            return
+
+        self.alive[position] = False
+        self.num_removed += 1
+
+        if self.num_removed > max(self.min_tail, len(self.items) / 2):
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Drop the removed items and index all the others with a new k-d tree
+        """
+
+        if self.num_removed > 0:
+            keep = np.nonzero(self.alive[:len(self.items)])[0]
+            self.items = [self.items[position] for position in keep]
+            count = len(self.items)
+            self.coordinates[:count] = self.coordinates[keep]
+            self.alive[:] = False
+            self.alive[:count] = True
+            self.positions = {item: position for position, item in enumerate(self.items)}
+            self.num_removed = 0
+
+        self.tree_size = len(self.items)
+        self.tree = cKDTree(self.coordinates[:self.tree_size]) if self.tree_size > 0 else None
+
+    def nearest(self, point):
+        """
+        Returns the item closest to the point (None if the index is empty)
+        """
+
+        query = np.array([point.x, point.y])
+        best_position, best_distance = None, np.inf
+
+        # Indexed part. Removed items might be returned: look further until an alive one is found
+        if self.tree is not None:
+            best_distance, best_position = self.tree.query(query)
+            if not self.alive[best_position]:
+                best_position, best_distance = self.nearest_alive(query)
+
+        # Tail
+        end = len(self.items)
+        if end > self.tree_size:
+            offsets = self.coordinates[self.tree_size:end] - query
+            distances = np.einsum('ij,ij->i', offsets, offsets)
+            distances[~self.alive[self.tree_size:end]] = np.inf
+            first = np.argmin(distances)
+            if distances[first] < best_distance ** 2:
+                best_position = self.tree_size + first
+
+        return None if best_position is None else self.items[best_position]
+
+    def nearest_alive(self, query):
+        k = 4
+        while True:
+            distances, positions = self.tree.query(query, k=min(k, self.tree_size))
+            distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+            alive = self.alive[positions]
+            if np.any(alive):
+                first = np.argmax(alive)
+                return positions[first], distances[first]
+            if k >= self.tree_size:
+                return None, np.inf
+            k *= 4
+
+    def within_radius(self, point, radius):
+        """
+        Returns the items whose distance from the point is not greater than the radius
+        """
+
+        query = np.array([point.x, point.y])
+        positions = []
+
+        if self.tree is not None:
+            positions.extend(self.tree.query_ball_point(query, radius))
+
+        tail = self.coordinates[self.tree_size:len(self.items)]
+        if len(tail) > 0:
+            distances = np.hypot(tail[:, 0] - query[0], tail[:, 1] - query[1])
+            positions.extend(self.tree_size + np.nonzero(distances <= radius)[0])
+
+        return [self.items[position] for position in sorted(positions) if self.alive[position]]
@@ -0,0 +1,398 @@
+import math
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from model.controllers.sampler import Sampler, inside_bounds
+from model.geometry.intersection import check_intersection
+from model.geometry.polygon import Polygon
+from model.geometry.segment import Segment
+from model.geometry.point import Point
+
+
+class ProbabilisticRoadmap:
+    """
+    Roadmap of a probabilistic roadmap planner (PRM). Samples are drawn in the map
+    by a Sampler (with the same sequence and seed the roadmap is always the same)
+    and each pair of samples closer than the connection radius is a candidate edge. For every node and candidate edge the roadmap keeps the set of
+    obstacles blocking it; the nodes and edges with no blockers form the graph
+    that queries search. Adding or removing an obstacle only touches the nodes
+    and edges near it (found with a vectorized bounding box test), so the
+    roadmap follows the map journal incrementally. Where the queries fail the
+    roadmap can be expanded with new samples around the nodes they reached.
+
+    Snapshots of the roadmap are stored by fingerprint of the map (see
+    Map.fingerprint), margin, number of samples, connection radius, sequence and
+    seed: in memory (the last
+    MAX_STORED roadmaps) and, if a directory is specified, on disk, so that
+    the roadmap of a map that has already been seen is loaded instead of built.
+    """
+
+    # Snapshots kept in memory ({(fingerprint, margin, num_samples, connection_radius, sequence, seed): bytes},
+    # least recently used first)
+    stored = OrderedDict()
+    MAX_STORED = 16
+
+    def __init__(self, world_map, margin=0.2, num_samples=600, connection_radius=1.0, sequence='uniform', seed=None):
+
+        self.world_map = world_map
+        self.margin = margin
+        self.num_samples = num_samples
+        self.connection_radius = connection_radius
+        self.sequence = sequence
+        self.seed = seed
+
+        # Samples, their k-d tree and the candidate edges (pairs of nodes and costs)
+        self.coordinates = np.empty((0, 2))
+        self.index = None
+        self.edge_nodes = np.empty((0, 2), dtype=np.int64)
+        self.edge_costs = np.empty(0)
+
+        # Obstacles blocking nodes and edges ({node or edge: set(obstacle_id)}, only blocked ones)
+        self.node_blockers = {}
+        self.edge_blockers = {}
+
+        # Nodes and edges blocked by each obstacle ({obstacle_id: set(node or edge)})
+        self.obstacle_nodes = {}
+        self.obstacle_edges = {}
+
+        # Free edges of each node ({node: {neighbor: cost}})
+        self.adjacency = []
+
+        # Edges of each node ({node: [edge]})
+        self.node_edges = []
+
+        self.map_version = None
+
+    # ------------------------------ Construction ------------------------------ #
+
+    def build(self):
+        """
+        Sample the roadmap and compute the blockers of all its nodes and edges
+        """
+
+        sampler = Sampler(self.sequence, self.seed)
+        self.coordinates = sampler.uniform_points(self.num_samples, self.world_map.map_boundaries)
+        self.index = cKDTree(self.coordinates)
+
+        self.edge_nodes = self.index.query_pairs(self.get_radius(), output_type='ndarray').astype(np.int64).reshape(-1, 2)
+        offsets = self.coordinates[self.edge_nodes[:, 1]] - self.coordinates[self.edge_nodes[:, 0]]
+        self.edge_costs = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        self.node_edges = [[] for _ in range(self.num_samples)]
+        for edge, (a, b) in enumerate(self.edge_nodes.tolist()):
+            self.node_edges[a].append(edge)
+            self.node_edges[b].append(edge)
+
+        self.compute_blockers()
+
+    def get_radius(self):
+        """
+        Maximum length of the edges: the rewiring radius of RRT* for the number of samples
+        (see SamplingBased.rewiring_radius), capped to the connection radius
+        """
+        min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+        gamma = 2 * math.sqrt(1.5) * math.sqrt((max_x - min_x) * (max_y - min_y) / math.pi)
+        return min(self.connection_radius, gamma * math.sqrt(math.log(self.num_samples) / self.num_samples))
+
+    def expand(self, anchors, weights, count):
+        """
+        Add count samples around the anchor points (each one uniform in the square of side
+        twice the edge radius centered on an anchor drawn with the specified weights) and
+        their edges to the nodes within the radius. The samples only depend on the seed
+        and on the size of the roadmap, so a seeded roadmap expands the same way whether
+        it has been built or loaded. Returns the number of nodes added
+        """
+
+        radius = self.get_radius()
+        sampler = Sampler(seed=None if self.seed is None else [self.seed, len(self.coordinates)])
+        weights = np.asarray(weights, dtype=float)
+        choices = sampler.rng.choice(len(anchors), size=count, p=weights / weights.sum())
+        samples = np.asarray(anchors, dtype=float)[choices] + (sampler.unit_points(count) * 2 - 1) * radius
+        samples = samples[inside_bounds(samples, self.world_map.map_boundaries)]
+        if len(samples) == 0:
+            return 0
+
+        first_node, first_edge = len(self.coordinates), len(self.edge_nodes)
+        self.coordinates = np.concatenate([self.coordinates, samples])
+        self.index = cKDTree(self.coordinates)
+
+        # Edges of the new nodes to the old ones and to the new ones with a lower index
+        pairs = [(neighbor, node)
+                 for node, neighbors in enumerate(self.index.query_ball_point(samples, radius), first_node)
+                 for neighbor in neighbors if neighbor < node]
+        new_edges = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        offsets = self.coordinates[new_edges[:, 1]] - self.coordinates[new_edges[:, 0]]
+        self.edge_nodes = np.concatenate([self.edge_nodes, new_edges])
+        self.edge_costs = np.concatenate([self.edge_costs, np.hypot(offsets[:, 0], offsets[:, 1])])
+
+        self.node_edges.extend([] for _ in range(len(samples)))
+        self.adjacency.extend({} for _ in range(len(samples)))
+        for edge, (a, b) in enumerate(new_edges.tolist(), first_edge):
+            self.node_edges[a].append(edge)
+            self.node_edges[b].append(edge)
+
+        min_x, min_y = samples.min(axis=0) - radius - self.margin
+        max_x, max_y = samples.max(axis=0) + radius + self.margin
+        for obstacle_id in self.world_map.query_bounds((min_x, min_y, max_x, max_y)):
+            self.register_obstacle(obstacle_id, self.world_map.get_obstacle(obstacle_id).polygon,
+                                   first_node, first_edge)
+
+        for edge in range(first_edge, len(self.edge_nodes)):
+            self.restore_edge(edge)
+
+        return len(samples)
+
+    def compute_blockers(self):
+        """
+        Compute the blockers of all the nodes and edges from the obstacles of the map
+        """
+
+        self.map_version = self.world_map.version
+        self.node_blockers = {}
+        self.edge_blockers = {}
+        self.obstacle_nodes = {}
+        self.obstacle_edges = {}
+
+        for obstacle_id in self.world_map.obstacle_ids:
+            self.register_obstacle(obstacle_id, self.world_map.get_obstacle(obstacle_id).polygon)
+
+        self.adjacency = [{} for _ in range(len(self.coordinates))]
+        for edge in range(len(self.edge_nodes)):
+            self.restore_edge(edge)
+
+    def update(self):
+        """
+        Bring the roadmap up to date with the map. Returns True if something changed
+        """
+
+        if self.map_version == self.world_map.version:
+            return False
+
+        changes = self.world_map.changes_since(self.map_version)
+        if changes is None:
+            self.compute_blockers()
+            return True
+
+        for change in changes:
+            if change.kind == change.ADD:
+                obstacle = self.world_map.get_obstacle(change.obstacle_id)
+
+                # The obstacle might have been removed in the meantime
+                if obstacle is not None:
+                    for edge in self.register_obstacle(change.obstacle_id, obstacle.polygon):
+                        self.remove_edge(edge)
+            else:
+                self.unregister_obstacle(change.obstacle_id)
+
+        self.map_version = self.world_map.version
+        return True
+
+    # ------------------------------ Obstacles ------------------------------ #
+
+    def register_obstacle(self, obstacle_id, polygon, first_node=0, first_edge=0):
+        """
+        Add the obstacle to the blockers of the nodes and edges it collides with (only
+        the ones from first_node and first_edge on). Returns the edges that got blocked
+        (directly or through one of their nodes)
+        """
+
+        half_margin = self.margin / 2
+        min_x, min_y, max_x, max_y = polygon.get_bounds()
+        min_x, min_y, max_x, max_y = min_x - half_margin, min_y - half_margin, max_x + half_margin, max_y + half_margin
+
+        blocked = []
+
+        x, y = self.coordinates[first_node:, 0], self.coordinates[first_node:, 1]
+        nodes = np.nonzero((x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))[0] + first_node
+        for node in nodes.tolist():
+            if check_intersection(Polygon.point_buffer(self.get_point(node), half_margin), polygon):
+                self.node_blockers.setdefault(node, set()).add(obstacle_id)
+                self.obstacle_nodes.setdefault(obstacle_id, set()).add(node)
+                blocked.extend(self.node_edges[node])
+
+        starts = self.coordinates[self.edge_nodes[first_edge:, 0]]
+        ends = self.coordinates[self.edge_nodes[first_edge:, 1]]
+        edges = np.nonzero((np.maximum(starts[:, 0], ends[:, 0]) >= min_x) &
+                           (np.minimum(starts[:, 0], ends[:, 0]) <= max_x) &
+                           (np.maximum(starts[:, 1], ends[:, 1]) >= min_y) &
+                           (np.minimum(starts[:, 1], ends[:, 1]) <= max_y))[0] + first_edge
+        for edge in edges.tolist():
+            a, b = self.edge_nodes[edge].tolist()
+            segment = Segment(self.get_point(a), self.get_point(b))
+            buffer = Polygon.segment_buffer(segment, left_margin=half_margin, right_margin=half_margin)
+            if check_intersection(buffer, polygon):
+                self.edge_blockers.setdefault(edge, set()).add(obstacle_id)
+                self.obstacle_edges.setdefault(obstacle_id, set()).add(edge)
+                blocked.append(edge)
+
+        return blocked
+
+    def unregister_obstacle(self, obstacle_id):
+        """
+        Remove the obstacle from the blockers, restoring the nodes and edges that are free again
+        """
+
+        for node in self.obstacle_nodes.pop(obstacle_id, set()):
+            self.node_blockers[node].discard(obstacle_id)
+            if len(self.node_blockers[node]) == 0:
+                del self.node_blockers[node]
+                for edge in self.node_edges[node]:
+                    self.restore_edge(edge)
+
+        for edge in self.obstacle_edges.pop(obstacle_id, set()):
+            self.edge_blockers[edge].discard(obstacle_id)
+            if len(self.edge_blockers[edge]) == 0:
+                del self.edge_blockers[edge]
+                self.restore_edge(edge)
+
+    def restore_edge(self, edge):
+        a, b = self.edge_nodes[edge].tolist()
+        if edge not in self.edge_blockers and a not in self.node_blockers and b not in self.node_blockers:
+            cost = float(self.edge_costs[edge])
+            self.adjacency[a][b] = cost
+            self.adjacency[b][a] = cost
+
+    def remove_edge(self, edge):
+        a, b = self.edge_nodes[edge].tolist()
+        self.adjacency[a].pop(b, None)
+        self.adjacency[b].pop(a, None)
+
+    # ------------------------------ Queries ------------------------------ #
+
+    def get_point(self, node):
+        return Point(*self.coordinates[node].tolist())
+
+    def is_free(self, node):
+        return node not in self.node_blockers
+
+    def nearest_free_nodes(self, point, count):
+        """
+        Free nodes within the connection radius of the point, closest first (at most count)
+        """
+
+        distances, nodes = self.index.query([point.x, point.y], k=min(4 * count, len(self.coordinates)),
+                                            distance_upper_bound=self.connection_radius)
+        nodes = [int(node) for node, distance in zip(np.atleast_1d(nodes), np.atleast_1d(distances))
+                 if np.isfinite(distance) and self.is_free(int(node))]
+        return nodes[:count]
+
+    def component(self, nodes):
+        """
+        Nodes connected to the specified ones by free edges (them included)
+        """
+
+        reached = set(nodes)
+        frontier = list(reached)
+        while len(frontier) > 0:
+            for neighbor in self.adjacency[frontier.pop()]:
+                if neighbor not in reached:
+                    reached.add(neighbor)
+                    frontier.append(neighbor)
+        return reached
+
+    def get_edges(self):
+        """
+        Free edges of the roadmap, as (node, node) pairs
+        """
+
+        return [(a, b) for a, neighbors in enumerate(self.adjacency) for b in neighbors if a < b]
+
+    # ------------------------------ Storage ------------------------------ #
+
+    @staticmethod
+    def get_key(world_map, margin, num_samples, connection_radius, sequence, seed):
+        return world_map.fingerprint(), margin, num_samples, connection_radius, sequence, seed
+
+    @staticmethod
+    def get_file_name(directory, key):
+        fingerprint, margin, num_samples, connection_radius, sequence, seed = key
+        return os.path.join(directory, f'roadmap_{fingerprint}_{margin}_{num_samples}_{connection_radius}_'
+                                       f'{sequence}_{seed}.pickle')
+
+    def to_bytes(self):
+        return pickle.dumps({
+            'connection_radius': self.connection_radius,
+            'coordinates': self.coordinates,
+            'edge_nodes': self.edge_nodes,
+            'edge_costs': self.edge_costs,
+            'node_blockers': self.node_blockers,
+            'edge_blockers': self.edge_blockers,
+            'obstacle_nodes': self.obstacle_nodes,
+            'obstacle_edges': self.obstacle_edges
+        })
+
+    def from_bytes(self, data):
+        state = pickle.loads(data)
+        self.connection_radius = state['connection_radius']
+        self.coordinates = state['coordinates']
+        self.edge_nodes = state['edge_nodes']
+        self.edge_costs = state['edge_costs']
+        self.node_blockers = state['node_blockers']
+        self.edge_blockers = state['edge_blockers']
+        self.obstacle_nodes = state['obstacle_nodes']
+        self.obstacle_edges = state['obstacle_edges']
+        self.index = cKDTree(self.coordinates)
+
+        # The roadmap might have been expanded beyond num_samples nodes
+        self.node_edges = [[] for _ in range(len(self.coordinates))]
+        for edge, (a, b) in enumerate(self.edge_nodes.tolist()):
+            self.node_edges[a].append(edge)
+            self.node_edges[b].append(edge)
+
+        self.adjacency = [{} for _ in range(len(self.coordinates))]
+        for edge in range(len(self.edge_nodes)):
+            self.restore_edge(edge)
+
+        self.map_version = self.world_map.version
+
+    def store(self, directory=None):
+        """
+        Store a snapshot of the roadmap for the current content of the map
+        """
+
+        key = self.get_key(self.world_map, self.margin, self.num_samples, self.connection_radius,
+                           self.sequence, self.seed)
+        data = self.to_bytes()
+        self.remember(key, data)
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            with open(self.get_file_name(directory, key), 'wb') as file:
+                file.write(data)
+
+    @classmethod
+    def remember(cls, key, data):
+        cls.stored[key] = data
+        cls.stored.move_to_end(key)
+        while len(cls.stored) > cls.MAX_STORED:
+            cls.stored.popitem(last=False)
+
+    @classmethod
+    def load(cls, world_map, margin=0.2, num_samples=600, connection_radius=1.0, sequence='uniform', seed=None,
+             directory=None):
+        """
+        Roadmap for the map: loaded from memory or from disk if the map has already
+        been seen, built (and stored) otherwise
+        """
+
+        roadmap = cls(world_map, margin, num_samples, connection_radius, sequence, seed)
+        key = cls.get_key(world_map, margin, num_samples, connection_radius, sequence, seed)
+
+        data = cls.stored.get(key)
+        if data is None and directory is not None and os.path.exists(cls.get_file_name(directory, key)):
+            with open(cls.get_file_name(directory, key), 'rb') as file:
+                data = file.read()
+        if data is not None:
+            cls.remember(key, data)
+
+        if data is not None:
+            roadmap.from_bytes(data)
+        else:
+            roadmap.build()
+            roadmap.store(directory)
+
+        return roadmap
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of the results of the search algorithms, shared by the whole process.
+    A result is the path found (and, if store_draw_list is set, the final draw list) and is
+    keyed by algorithm class and parameters, fingerprint of the map (see Map.fingerprint)
+    and start and goal quantized to quantum, so that resetting a planner or loading again
+    a map that has already been solved returns the same path instantly. See
+    SearchAlgorithm.result_key for the algorithms that take part
+    """
+
+    def __init__(self, max_size=64, quantum=1e-3, store_draw_list=True):
+
+        self.max_size = max_size
+        self.quantum = quantum
+        self.store_draw_list = store_draw_list
+
+        # Results ({key: (start, goal, path, draw_list)}, least recently used first)
+        self.results = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, point):
+        return round(point.x / self.quantum), round(point.y / self.quantum)
+
+    def get(self, key):
+        """
+        Returns the (start, goal, path, draw_list) stored for the key, None if there is none
+        """
+
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
+
+    def put(self, key, start, goal, path, draw_list):
+        self.results[key] = (start, goal, list(path), list(draw_list) if self.store_draw_list else [])
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def clear(self):
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
@@ -0,0 +1,309 @@
+import math
+from abc import ABC, abstractmethod
+
+import numpy as np
+from scipy.stats import qmc
+
+
+class Sampler:
+    """
+    Source of the random numbers of a sampling-based planner. Points of the unit square
+    come either from a NumPy Generator (sequence='uniform') or from a scrambled Halton or
+    Sobol low-discrepancy sequence, which covers the map more evenly than independent
+    samples. Everything is generated in blocks of block_size values (a single vectorized
+    call) and served from a buffer, so there is no per-sample call to the generator.
+
+    The generator is seeded per planner: with the same seed a planner draws the same
+    samples after each reset (seed=None draws fresh entropy instead).
+    """
+
+    SEQUENCES = ('uniform', 'halton', 'sobol')
+
+    def __init__(self, sequence='uniform', seed=None, block_size=256):
+
+        if sequence not in self.SEQUENCES:
+            raise ValueError(f'Unknown sequence [{sequence}]')
+
+        self.sequence = sequence
+        self.seed = seed
+
+        # Sobol sequences keep their balance properties only for powers of 2
+        self.block_size = 2 ** math.ceil(math.log2(max(block_size, 2)))
+
+        self.rng = None
+        self.engine = None
+
+        # Prefetched points of the unit square (consumed from position on) and numbers in [0, 1)
+        self.points = np.empty((0, 2))
+        self.position = 0
+        self.numbers = []
+
+        self.reset()
+
+    def reset(self):
+        """
+        Restart the generator (and the sequence) from the seed
+        """
+        self.rng = np.random.default_rng(self.seed)
+        if self.sequence == 'halton':
+            self.engine = qmc.Halton(d=2, scramble=True, seed=self.rng)
+        elif self.sequence == 'sobol':
+            self.engine = qmc.Sobol(d=2, scramble=True, seed=self.rng)
+        else:
+            self.engine = None
+
+        self.points = np.empty((0, 2))
+        self.position = 0
+        self.numbers = []
+
+    def next_block(self):
+        if self.engine is None:
+            return self.rng.random((self.block_size, 2))
+        return self.engine.random(self.block_size)
+
+    def unit_points(self, count):
+        """
+        (count, 2) array with the next points of the unit square
+        """
+        blocks = [self.points[self.position:]]
+        available = len(blocks[0])
+        while available < count:
+            block = self.next_block()
+            blocks.append(block)
+            available += len(block)
+
+        points = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+        self.points = points
+        self.position = count
+        return points[:count]
+
+    def uniform_points(self, count, bounds):
+        """
+        (count, 2) array of points in the region (min_x, min_y, max_x, max_y)
+        """
+        min_x, min_y, max_x, max_y = bounds
+        return self.unit_points(count) * (max_x - min_x, max_y - min_y) + (min_x, min_y)
+
+    def random(self):
+        """
+        Uniform number in [0, 1), always from the generator (e.g. to choose between strategies)
+        """
+        if len(self.numbers) == 0:
+            self.numbers = self.rng.random(self.block_size).tolist()
+        return self.numbers.pop()
+
+    def integers(self, high):
+        return int(self.rng.integers(high))
+
+
+def ellipse_points(unit_points, focus_1, focus_2, cost):
+    """
+    Maps points of the unit square to points uniformly distributed in the ellipse with the
+    specified foci in which the sum of the distances from the foci is at most cost (the
+    informed subset of Informed RRT* and BIT*)
+    """
+
+    min_cost = focus_1.distance(focus_2)
+    semi_major_axis = cost / 2
+    semi_minor_axis = math.sqrt(max(cost ** 2 - min_cost ** 2, 0)) / 2
+    angle = math.atan2(focus_2.y - focus_1.y, focus_2.x - focus_1.x)
+
+    # Uniform points in the unit disk, scaled, rotated and translated to the ellipse
+    radii = np.sqrt(unit_points[:, 0])
+    thetas = 2 * np.pi * unit_points[:, 1]
+    x = semi_major_axis * radii * np.cos(thetas)
+    y = semi_minor_axis * radii * np.sin(thetas)
+    return np.column_stack([
+        (focus_1.x + focus_2.x) / 2 + x * math.cos(angle) - y * math.sin(angle),
+        (focus_1.y + focus_2.y) / 2 + x * math.sin(angle) + y * math.cos(angle)
+    ])
+
+
+def inside_bounds(points, bounds):
+    min_x, min_y, max_x, max_y = bounds
+    return ((points[:, 0] >= min_x) & (points[:, 0] <= max_x) &
+            (points[:, 1] >= min_y) & (points[:, 1] <= max_y))
+
+
+class SamplingStrategy(ABC):
+    """
+    Distribution of the points toward which a planner grows its tree. sample(planner)
+    returns the next point as an (x, y) tuple, using the Sampler of the planner.
+    Strategies can be combined (e.g. GoalBiased(Informed(Uniform()))) and replaced
+    through the sampling_strategy of SamplingBased
+    """
+
+    def reset(self):
+        pass
+
+    @abstractmethod
+    def sample(self, planner):
+        pass
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class BlockStrategy(SamplingStrategy):
+    """
+    Strategy whose points are generated in blocks by a vectorized generate(planner, count)
+    and served one at a time
+    """
+
+    def __init__(self):
+        self.buffer = []
+
+    def reset(self):
+        self.buffer = []
+
+    def sample(self, planner):
+        while len(self.buffer) == 0:
+            self.buffer = self.generate(planner, planner.sampler.block_size).tolist()[::-1]
+        return tuple(self.buffer.pop())
+
+    @abstractmethod
+    def generate(self, planner, count):
+        """
+        (n, 2) array of new points (n <= count, might be 0 if they were all rejected)
+        """
+        pass
+
+
+class Uniform(BlockStrategy):
+    """
+    Points uniformly distributed in the map
+    """
+
+    def generate(self, planner, count):
+        return planner.sampler.uniform_points(count, planner.world_map.map_boundaries)
+
+
+class GoalBiased(SamplingStrategy):
+    """
+    The goal with probability rate (the goal_sample_rate of the planner if not specified),
+    a point of the base strategy otherwise
+    """
+
+    def __init__(self, base, rate=None):
+        self.base = base
+        self.rate = rate
+
+    def reset(self):
+        self.base.reset()
+
+    def __repr__(self):
+        return f'GoalBiased({self.base!r}, rate={self.rate})'
+
+    def sample(self, planner):
+        rate = planner.goal_sample_rate if self.rate is None else self.rate
+        if planner.sampler.random() < rate:
+            goal = planner.world_map.goal
+            return goal.x, goal.y
+        return self.base.sample(planner)
+
+
+class Informed(BlockStrategy):
+    """
+    Points uniformly distributed in the informed ellipse (the region where the points
+    that can improve a path of the specified cost lie) once set_ellipse has been called,
+    points of the base strategy before that. Points outside the map are rejected
+    """
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+        self.focus_1 = None
+        self.focus_2 = None
+        self.cost = math.inf
+
+    def reset(self):
+        super().reset()
+        self.base.reset()
+        self.focus_1 = None
+        self.focus_2 = None
+        self.cost = math.inf
+
+    def __repr__(self):
+        return f'Informed({self.base!r})'
+
+    def set_ellipse(self, focus_1, focus_2, cost):
+        if (focus_1, focus_2, cost) != (self.focus_1, self.focus_2, self.cost):
+            self.focus_1 = focus_1
+            self.focus_2 = focus_2
+            self.cost = cost
+
+            # The prefetched points might lie outside the new ellipse
+            self.buffer = []
+
+    def sample(self, planner):
+        if math.isinf(self.cost):
+            return self.base.sample(planner)
+        return super().sample(planner)
+
+    def generate(self, planner, count):
+        points = ellipse_points(planner.sampler.unit_points(count), self.focus_1, self.focus_2, self.cost)
+        return points[inside_bounds(points, planner.world_map.map_boundaries)]
+
+
+class ObstacleBoundary(BlockStrategy):
+    """
+    Points close to the boundaries of the obstacles with probability rate, points of the
+    base strategy otherwise. Narrow passages and paths around obstacles need nodes close
+    to the obstacles, which uniform samples rarely hit. A point is drawn on an edge of an
+    obstacle (with probability proportional to its length) and moved away from it, on
+    either side, by a distance between margin / 2 and margin * 3 / 2
+    """
+
+    def __init__(self, base, rate=0.3):
+        super().__init__()
+        self.base = base
+        self.rate = rate
+
+        # Edges of the obstacles ((n, 4) array of x_1, y_1, x_2, y_2) and map version they refer to
+        self.edges = np.empty((0, 4))
+        self.map_version = None
+
+    def reset(self):
+        super().reset()
+        self.base.reset()
+        self.map_version = None
+
+    def __repr__(self):
+        return f'ObstacleBoundary({self.base!r}, rate={self.rate})'
+
+    def update_edges(self, world_map):
+        if self.map_version == world_map.version:
+            return
+
+        edges = []
+        for obstacle in world_map.obstacles:
+            vertices = obstacle.polygon.to_point_array()
+            edges.extend(start + end for start, end in zip(vertices, vertices[1:] + vertices[:1]))
+        self.edges = np.array(edges, dtype=float).reshape(-1, 4)
+        self.map_version = world_map.version
+        self.buffer = []
+
+    def sample(self, planner):
+        self.update_edges(planner.world_map)
+        if len(self.edges) == 0 or planner.sampler.random() >= self.rate:
+            return self.base.sample(planner)
+        return super().sample(planner)
+
+    def generate(self, planner, count):
+
+        offsets = self.edges[:, 2:] - self.edges[:, :2]
+        lengths = np.hypot(offsets[:, 0], offsets[:, 1])
+        cumulative = np.cumsum(lengths)
+
+        # Edge, position along the edge and distance from it of each point (straight from the
+        # generator: the low-discrepancy sequence, if any, is left to cover the map)
+        unit = planner.sampler.rng.random((count, 2))
+        edges = np.minimum(np.searchsorted(cumulative, unit[:, 0] * cumulative[-1], side='right'), len(lengths) - 1)
+        along = unit[:, 1]
+        sides = planner.sampler.rng.choice((-1.0, 1.0), count)
+        distances = planner.margin * planner.sampler.rng.uniform(0.5, 1.5, count)
+
+        normals = np.column_stack([-offsets[edges, 1], offsets[edges, 0]]) / np.maximum(lengths[edges], 1e-12)[:, None]
+        points = (self.edges[edges, :2] + along[:, None] * offsets[edges] +
+                  (sides * distances)[:, None] * normals)
+        return points[inside_bounds(points, planner.world_map.map_boundaries)]
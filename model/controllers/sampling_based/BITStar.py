@@ -0,0 +1,343 @@
+import heapq
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from model.controllers.sampling_based_algorithm import SamplingBased
+from model.controllers.indexed_heap import IndexedHeap
+from model.controllers.sampler import ellipse_points, inside_bounds
+from model.geometry.ellipse import Ellipse
+
+from model.geometry.point import Point
+
+
+class BITStar(SamplingBased):
+    """
+    Batch Informed Trees (BIT*, Gammell et al.). Samples are drawn in batches (inside
+    the informed ellipse once a path is known) and, together with the tree, they form
+    an implicit random geometric graph that is searched in order of estimated solution
+    cost, as in A*. Edges are queued with their heuristic cost and evaluated lazily:
+    the collision check of an edge only happens when it is popped from the edge queue,
+    so most of the edges are never checked at all. When the queue cannot improve the
+    current solution anymore a new batch starts: samples and vertices that cannot be
+    part of a better path are pruned and new samples are drawn.
+
+    Each iteration processes one edge. Vertices and samples are stored in NumPy arrays
+    (the Tree of SamplingBased and the samples buffer), the samples of a batch are
+    drawn with a single vectorized call and the obstacles near a vertex are queried
+    once, the first time one of its edges is checked, for all the edges leaving it.
+    """
+
+    # Kinds of target of an edge
+    SAMPLE = 0
+    VERTEX = 1
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 batch_size=100,
+                 search_radius=1.0,
+                 sequence='uniform',
+                 seed=None
+                 ):
+
+        self.batch_size = batch_size
+        self.search_radius = search_radius
+
+        # Unconnected samples of the batch, their cost-to-go heuristic and the vertex
+        # they became once connected to the tree (-1 if still unconnected)
+        self.samples = np.empty((0, 2))
+        self.sample_heuristics = np.empty(0)
+        self.sample_vertices = np.empty(0, dtype=np.int64)
+        self.sample_index = None
+
+        self.vertex_queue = IndexedHeap()
+
+        # Heap of (estimated solution cost, vertex, target kind, target)
+        self.edge_queue = []
+
+        # Vertices at the start of the batch (their edges to other vertices have already been considered)
+        self.old_vertices = set()
+
+        # Obstacle polygons near the vertices whose edges have been checked ({vertex: polygons})
+        self.obstacles_near = {}
+
+        self.radius = search_radius
+        self.goal_node = None
+        self.best_cost = math.inf
+        self.ellipse = None
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            goal_sample_rate=0,
+            sequence=sequence,
+            seed=seed
+        )
+
+    def pre_search(self):
+
+        self.set_root(self.start)
+
+        goal = self.world_map.goal
+        self.samples = np.array([[goal.x, goal.y]], dtype=float)
+        self.sample_heuristics = np.zeros(1)
+        self.sample_vertices = np.full(1, -1, dtype=np.int64)
+        self.sample_index = None
+
+        self.vertex_queue.clear()
+        self.edge_queue = []
+        self.old_vertices = set()
+        self.obstacles_near = {}
+
+        self.goal_node = None
+        self.best_cost = math.inf
+        self.ellipse = None
+
+    def can_run(self):
+        # The straight segment from start to goal can't be improved
+        return (self.current_iteration < self.max_iterations and
+                self.best_cost > self.start.distance(self.world_map.goal) + 1e-9)
+
+    # ------------------------------ Heuristics ------------------------------ #
+
+    def cost_to_come_heuristic(self, coordinates):
+        return np.hypot(coordinates[..., 0] - self.start.x, coordinates[..., 1] - self.start.y)
+
+    def cost_to_go_heuristic(self, coordinates):
+        goal = self.world_map.goal
+        return np.hypot(coordinates[..., 0] - goal.x, coordinates[..., 1] - goal.y)
+
+    # ------------------------------ Batches ------------------------------ #
+
+    def sample_batch(self, count):
+        """
+        Draw count samples, uniformly in the informed ellipse if a path is known,
+        in the whole map otherwise. Samples outside the map are discarded
+        """
+
+        bounds = self.world_map.map_boundaries
+
+        if math.isinf(self.best_cost):
+            return self.sampler.uniform_points(count, bounds)
+
+        samples = ellipse_points(self.sampler.unit_points(count), self.start, self.world_map.goal, self.best_cost)
+        return samples[inside_bounds(samples, bounds)]
+
+    def prune(self):
+        """
+        Remove the samples and the vertices that cannot be part of a path better than the
+        current one. The descendants of the removed vertices that could still be useful
+        are disconnected from the tree and become samples again
+        """
+
+        size = len(self.tree)
+        coordinates = self.tree.coordinates[:size]
+        estimates = self.cost_to_come_heuristic(coordinates) + self.cost_to_go_heuristic(coordinates)
+
+        # Tolerance for the rounding errors of the estimates of the points on the best path
+        # (e.g. when it is the straight segment from start to goal), whose vertices are kept anyway
+        removed = estimates > self.best_cost + 1e-9
+        if self.goal_node is not None:
+            removed[self.tree.get_branch(self.goal_node)] = False
+
+        self.tree.valid[:size] = ~removed
+        self.tree.propagate_invalid()
+        recycled = coordinates[~self.tree.valid[:size] & ~removed]
+
+        mapping = self.remove_invalid_nodes()
+        goal_samples = np.empty((0, 2))
+        if self.goal_node is not None:
+            if mapping[self.goal_node] >= 0:
+                self.goal_node = int(mapping[self.goal_node])
+            else:
+                # The goal is not in the tree anymore: it is a sample again
+                goal = self.world_map.goal
+                goal_samples = np.array([[goal.x, goal.y]], dtype=float)
+                self.goal_node = None
+                self.best_cost = math.inf
+                self.ellipse = None
+
+        # Unconnected samples are kept only if they can improve the solution, recycled
+        # vertices also if they are on a path as good as the current one
+        samples = self.samples[self.sample_vertices < 0]
+        estimates = self.cost_to_come_heuristic(samples) + self.cost_to_go_heuristic(samples)
+        recycled_estimates = self.cost_to_come_heuristic(recycled) + self.cost_to_go_heuristic(recycled)
+        self.samples = np.concatenate([samples[estimates < self.best_cost],
+                                       recycled[recycled_estimates <= self.best_cost + 1e-9],
+                                       goal_samples])
+
+    def new_batch(self):
+
+        if math.isinf(self.best_cost):
+            self.samples = self.samples[self.sample_vertices < 0]
+        else:
+            self.prune()
+
+        self.samples = np.concatenate([self.samples, self.sample_batch(self.batch_size)])
+        self.sample_heuristics = self.cost_to_go_heuristic(self.samples)
+        self.sample_vertices = np.full(len(self.samples), -1, dtype=np.int64)
+        self.sample_index = cKDTree(self.samples) if len(self.samples) > 0 else None
+
+        self.radius = self.rewiring_radius(self.search_radius, len(self.tree) + len(self.samples))
+        self.obstacles_near = {}
+        self.old_vertices = set(range(len(self.tree)))
+
+        self.edge_queue = []
+        self.vertex_queue.clear()
+        size = len(self.tree)
+        keys = self.tree.costs[:size] + self.cost_to_go_heuristic(self.tree.coordinates[:size])
+        for vertex, key in enumerate(keys.tolist()):
+            self.vertex_queue.push(vertex, key)
+
+    # ------------------------------ Search ------------------------------ #
+
+    def expand_vertex(self, vertex):
+        """
+        Queue the edges from the vertex to the samples and (only for the vertices
+        added in this batch) to the other vertices that could improve the solution
+        """
+
+        coordinates = self.tree.coordinates[vertex]
+        cost = self.tree.costs[vertex]
+        estimate = float(self.cost_to_come_heuristic(coordinates))
+        x, y = coordinates.tolist()
+
+        # Edges to the samples
+        if self.sample_index is not None:
+            samples = np.array(self.sample_index.query_ball_point(coordinates, self.radius), dtype=np.int64)
+            if len(samples) > 0:
+                samples = samples[self.sample_vertices[samples] < 0]
+                offsets = self.samples[samples] - coordinates
+                distances = np.hypot(offsets[:, 0], offsets[:, 1])
+                useful = estimate + distances + self.sample_heuristics[samples] < self.best_cost
+                keys = cost + distances + self.sample_heuristics[samples]
+                for sample, key in zip(samples[useful].tolist(), keys[useful].tolist()):
+                    heapq.heappush(self.edge_queue, (key, vertex, self.SAMPLE, sample))
+
+        # Edges to the other vertices (rewiring)
+        if vertex not in self.old_vertices:
+            parent = self.tree.parents[vertex]
+            neighbors = np.array([neighbor for neighbor in self.get_nodes_within(Point(x, y), self.radius)
+                                  if neighbor != vertex and neighbor != parent and
+                                  self.tree.parents[neighbor] != vertex], dtype=np.int64)
+            if len(neighbors) > 0:
+                offsets = self.tree.coordinates[neighbors] - coordinates
+                distances = np.hypot(offsets[:, 0], offsets[:, 1])
+                heuristics = self.cost_to_go_heuristic(self.tree.coordinates[neighbors])
+                useful = ((estimate + distances + heuristics < self.best_cost) &
+                          (cost + distances < self.tree.costs[neighbors]))
+                keys = cost + distances + heuristics
+                for neighbor, key in zip(neighbors[useful].tolist(), keys[useful].tolist()):
+                    heapq.heappush(self.edge_queue, (key, vertex, self.VERTEX, neighbor))
+
+    def check_edge_collision(self, vertex, point):
+        """
+        Collision check of an edge leaving the vertex. The obstacles within the search
+        radius of the vertex are queried once and used for all its edges
+        """
+
+        if vertex not in self.obstacles_near:
+            x, y = self.tree.coordinates[vertex].tolist()
+            self.obstacles_near[vertex] = self.get_obstacles_in_bounds((
+                x - self.radius - self.margin,
+                y - self.radius - self.margin,
+                x + self.radius + self.margin,
+                y + self.radius + self.margin
+            ))
+
+        return self.check_collision_with(self.obstacles_near[vertex], self.get_point(vertex), point)
+
+    def end_batch(self):
+        self.edge_queue = []
+        self.vertex_queue.clear()
+
+    def step_search(self):
+
+        if len(self.edge_queue) == 0 and len(self.vertex_queue) == 0:
+            self.new_batch()
+            return
+
+        # Expand the vertices that could lead to better edges than the best queued one
+        while len(self.vertex_queue) > 0 and (len(self.edge_queue) == 0 or
+                                              self.vertex_queue.top_priority() <= self.edge_queue[0][0]):
+            vertex, key = self.vertex_queue.pop()
+            if key >= self.best_cost:
+                break
+            self.expand_vertex(vertex)
+
+        # No queued edge can improve the solution: the batch is over
+        if len(self.edge_queue) == 0 or self.edge_queue[0][0] >= self.best_cost:
+            self.end_batch()
+            return
+
+        key, vertex, kind, target = heapq.heappop(self.edge_queue)
+
+        if kind == self.SAMPLE and self.sample_vertices[target] >= 0:
+            kind, target = self.VERTEX, int(self.sample_vertices[target])
+
+        if kind == self.SAMPLE:
+            target_point = Point(*self.samples[target].tolist())
+            heuristic = self.sample_heuristics[target]
+        else:
+            target_point = self.get_point(target)
+            heuristic = self.distance_to_goal(target)
+
+        cost = self.tree.costs[vertex] + self.tree.distance(vertex, target_point)
+        if cost + heuristic >= self.best_cost:
+            return
+        if kind == self.VERTEX and cost >= self.tree.costs[target]:
+            return
+
+        # Lazy collision check
+        if self.check_edge_collision(vertex, target_point):
+            return
+
+        if kind == self.VERTEX:
+            self.set_parent(target, vertex)
+        else:
+            node = self.add_node(target_point, vertex)
+            self.sample_vertices[target] = node
+            self.vertex_queue.push(node, cost + heuristic)
+            if target_point == self.world_map.goal:
+                self.goal_node = node
+
+        if self.goal_node is not None and self.tree.costs[self.goal_node] < self.best_cost:
+            self.best_cost = float(self.tree.costs[self.goal_node])
+            self.ellipse = Ellipse.from_path_points(self.start, self.world_map.goal, self.best_cost)
+
+        self.update_draw_list()
+
+    def post_search(self):
+
+        if self.goal_node is not None:
+            self.path = self.extract_branch(self.goal_node)[:-1] + [self.world_map.goal]
+
+
+if __name__ == '__main__':
+
+    from model.geometry.circle import Circle
+    from model.world.map.map_builder import MapBuilder
+
+    # Regression check: when the best path is the straight segment from start to goal, the
+    # rounding errors of the estimates must not prune its vertices (the path would lose the start)
+    np.random.seed(1)
+    world_map = MapBuilder().set_obs_count(40).set_map_boundaries((-5.0, -5.0, 5.0, 5.0)).build()
+    world_map.generate([Circle(0, 0, 0.5)])
+    world_map.set_goal(Point(3, 0), clearance=0.2)
+
+    bit_star = BITStar(world_map, Point(0, 0), seed=3)
+    while not bit_star.has_terminated():
+        bit_star.step()
+    bit_star.step()
+
+    assert bit_star.has_path() and bit_star.path[0] == Point(0, 0), bit_star.path
+    print(f'Path: {bit_star.path}')
@@ -1,24 +1,11 @@
 from model.controllers.sampling_based_algorithm import SamplingBased
-from model.controllers.graph import Node
-from model.controllers.graph import Edge
+from model.controllers.sampler import Uniform
 
 from model.geometry.point import Point
 
 import numpy as np
 
 
-class VNode(Node):
-    def __init__(self, point, parent=None, cost=0, heuristic=0, valid=True):
-        super().__init__(point, parent, cost, heuristic)
-        self.valid = valid
-
-    def __str__(self):
-        return f'VNode ({self.point}, {"v" if self.valid else "n"})'
-
-    def __repr__(self):
-        return self.__str__()
-
-
 class DynamicRRT(SamplingBased):
     """
     Dynamic RRT (RRT with basic replanning). This algorithm is a simple
@@ -39,7 +26,9 @@ class DynamicRRT(SamplingBased):
                  max_iterations=5000,
                  goal_sample_rate=0.05,
                  step_length=0.2,
-                 waypoint_sampling_rate=0.5
+                 waypoint_sampling_rate=0.5,
+                 sequence='uniform',
+                 seed=None
                  ):
 
         self.step_length = step_length
@@ -57,15 +46,21 @@ class DynamicRRT(SamplingBased):
         # or we need to look for updates
         self.need_for_path = True
 
-        # We inherit the node and edge lists from the SamplingBased class
+        # We inherit the tree (and its valid flags) from the SamplingBased class
 
-        self.waypoints = []  # Cached nodes
+        self.waypoints = []  # Cached points
 
-        self.path_nodes = []  # Equivalent to path, but containing nodes
+        self.path_nodes = []  # Indices of the nodes of the tree in the path (the goal is not included)
 
-        # Number of obstacles. This will be used to check if something has
-        # changed and we need to trim the tree/update the path
-        self.num_obstacles = len(world_map.obstacles)
+        # Version of the map the tree refers to. The changes after it (map journal) tell
+        # which obstacles have been added and where, so that only the edges of the tree
+        # around them need to be checked
+        self.map_version = world_map.version
+
+        # Nodes invalidated by the last changes and number of nodes removed from the tree but
+        # still in its arrays (the tree is compacted when they are more than the remaining ones)
+        self.removed_nodes = []
+        self.num_removed = 0
 
         # Uniform with the interface (it expects the path to contain points)
         # self.path_wrapper = PathWrapper()
@@ -77,19 +72,23 @@ class DynamicRRT(SamplingBased):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=True,
-            goal_sample_rate=goal_sample_rate
+            goal_sample_rate=goal_sample_rate,
+            sequence=sequence,
+            seed=seed,
+            sampling_strategy=Uniform()  # Goal and waypoints are chosen by generate_random_node
         )
 
     def pre_search(self):
 
-        self.nodes = [VNode(self.start)]
-        self.edges = []
+        self.set_root(self.start)
 
         self.waypoints = []
         self.path_nodes = []
         self.need_for_path = True
         self.goal_reached = False
-        self.num_obstacles = len(self.world_map.obstacles)
+        self.map_version = self.world_map.version
+        self.removed_nodes = []
+        self.num_removed = 0
 
     def step_search(self):
 
@@ -103,19 +102,12 @@ class DynamicRRT(SamplingBased):
 
             self.world_map.enable()  # Ensure map changes are enabled
 
-            # Changes occurred (different number of obstacles)
-            if self.num_obstacles != len(self.world_map.obstacles):
-
-                # Update the number of obstacles in the map
-                self.num_obstacles = len(self.world_map.obstacles)
+            # Changes occurred (new version of the map)
+            if self.map_version != self.world_map.version:
 
-                # Invalidate the nodes by iterating through the edges and checking
-                # where a collision happened
+                # Invalidate the subtrees below the edges that collide with the new obstacles
                 self.invalidate_nodes()
 
-                # Propagate the invalid flag from parent to child
-                self.trim()
-
                 # Extract waypoints from the invalidated portion of the nodes_path
                 self.extract_waypoints()
 
@@ -123,6 +115,9 @@ class DynamicRRT(SamplingBased):
                 if self.is_path_invalid():
                     self.need_for_path = True
 
+                # Remove the invalid nodes
+                self.trim()
+
         # Update drawing list
         self.update_draw_list()
 
@@ -130,161 +125,150 @@ class DynamicRRT(SamplingBased):
 
         node_rand = self.generate_random_node()
         node_near = self.nearest_neighbor(node_rand)
-        node_new = self.new_state(node_near, node_rand)
+        point_new = self.new_state(node_near, node_rand)
 
-        if node_new and not self.check_collision(node_near.point, node_new.point):
-            self.nodes.append(node_new)
-            self.edges.append(Edge(node_near, node_new))
-            dist = node_new.point.distance(self.world_map.goal)
+        if not self.check_collision(self.get_point(node_near), point_new):
+            node_new = self.add_node(point_new, node_near)
+            dist = point_new.distance(self.world_map.goal)
 
             if dist <= self.step_length:
                 self.extract_path(node_new)
 
     def generate_random_node(self):
         """
-        Return a ValidNode (VNode) instead of a Node. ValidNodes only have
-        a boolean attribute that indicates whether they are valid or not.
+        Returns the point where the tree should grow to: the goal, one of the
+        cached waypoints or a random point of the map
         """
 
-        p = np.random.random()
+        p = self.sampler.random()
 
         if p < self.goal_sample_rate:
-            return VNode(Point(self.world_map.goal.x, self.world_map.goal.y))
+            return Point(self.world_map.goal.x, self.world_map.goal.y)
         elif self.goal_sample_rate <= p < self.waypoint_sample_rate and len(self.waypoints) > 0:
-            waypoint_index = np.random.randint(0, len(self.waypoints))
-            waypoint = self.waypoints[waypoint_index]
-            self.waypoints.pop(waypoint_index)
-            return waypoint
+            waypoint_index = self.sampler.integers(len(self.waypoints))
+            return self.waypoints.pop(waypoint_index)
         else:
-            x = np.random.uniform(self.world_map.map_boundaries[0], self.world_map.map_boundaries[2])
-            y = np.random.uniform(self.world_map.map_boundaries[1], self.world_map.map_boundaries[3])
-            return VNode(Point(x, y))
-
-    def nearest_neighbor(self, n):
-        """
-        Returns the nearest node to the one passed as argument
-        """
+            return Point(*self.sampling_strategy.sample(self))
 
-        return min(self.nodes, key=lambda nd: nd.point.distance(n.point))
-
-    def new_state(self, node_start, node_end):
+    def new_state(self, node_start, point_end):
         """
-        Given two nodes (each containing a point), returns a new node
-        with a point that is distant from the start node at maximum
-        step_length and that has the start node as parent
+        Given a node of the tree and a point, returns a new point that is
+        distant from the node at maximum step_length
         """
 
-        dist, theta = self.get_distance_and_angle(node_start, node_end)
-
-        dist = min(self.step_length, dist)
-        new_x = node_start.point.x + dist * np.cos(theta)
-        new_y = node_start.point.y + dist * np.sin(theta)
-
-        # new_y = round(new_y / self.search_step, 2) * self.search_step
-        # new_x = round(new_x / self.search_step, 2) * self.search_step
-
-        node_new = VNode(Point(new_x, new_y))
-        node_new.parent = node_start
-
-        return node_new
+        return self.steer(node_start, point_end, self.step_length)
 
     def extract_path(self, node):
         """
-        Sets the goal_reached boolean to True and returns a path,
-        that is a list of Points. We start from the goal and we go
-        back to the start point, then we reverse the path
+        Sets the goal_reached boolean to True and stores the nodes of the
+        path, from the root of the tree to the node that reached the goal
         """
 
         self.goal_reached = True
         self.need_for_path = False
 
-        self.path_nodes = [VNode(self.world_map.goal)]
-        node_now = node
-
-        # Iterate back from the goal to the start node
-        while node_now.parent is not None:
-            node_now = node_now.parent
-            self.path_nodes.append(node_now)
-
-        # Reverse the path
-        self.path_nodes = self.path_nodes[::-1]
+        self.path_nodes = self.tree.get_branch(node)
 
     def invalidate_nodes(self):
         """
-        Check where there is an obstacle between two nodes and
-        set them as invalid
+        Check where there is an obstacle between two nodes and set the node below
+        it, together with its subtree, as invalid. Only the edges around the obstacles
+        added since the last check are tested (removed obstacles cannot invalidate
+        anything); if the map journal cannot tell what changed, all the edges are checked
         """
 
-        for edge in self.edges:
-            if self.check_collision(edge.parent_node.point, edge.child_node.point):
-                edge.child_node.valid = False
+        changes = self.world_map.changes_since(self.map_version)
+        self.map_version = self.world_map.version
 
-    def invalidate_path(self):
+        if changes is None:
+            coordinates = self.tree.coordinates
+            parents, children = self.tree.get_edges()
+            blocked = [child for parent, child in zip(parents.tolist(), children.tolist())
+                       if self.check_collision(Point(*coordinates[parent]), Point(*coordinates[child]))]
+        else:
+            blocked = []
+            for change in changes:
+                obstacle = self.world_map.get_obstacle(change.obstacle_id) if change.kind == change.ADD else None
+
+                # The obstacle might have been removed in the meantime
+                if obstacle is None:
+                    continue
+
+                for child in self.get_edges_in_bounds(change.bounds):
+                    parent = int(self.tree.parents[child])
+                    if self.check_collision_with([obstacle.polygon], self.get_point(parent), self.get_point(child)):
+                        blocked.append(child)
+
+        # Propagate the invalid flag from parent to child through the child lists and
+        # detach the invalid subtrees from the rest of the tree
+        for child in blocked:
+            if self.tree.valid[child]:
+                subtree = self.tree.get_subtree(child)
+                self.tree.valid[subtree] = False
+                self.tree.detach(child)
+                self.removed_nodes.extend(subtree)
+
+    def get_edges_in_bounds(self, bounds):
         """
-        Invalidate the Point path
+        Child nodes of the edges of the tree whose bounds overlap the region (enlarged by
+        the margin of the collision check). Edges are at most step_length long, so their
+        child nodes are found with a query of the spatial index of the nodes
         """
 
-        # Find the first invalid node in the nodes_path
-        first_invalid_node = None
-        for node in self.path_nodes:
-            if not node.valid:
-                first_invalid_node = node
-                break
+        min_x, min_y, max_x, max_y = bounds
+        half_margin = self.margin / 2
+        min_x, min_y, max_x, max_y = min_x - half_margin, min_y - half_margin, max_x + half_margin, max_y + half_margin
 
-        invalid_point_in_path_index = -1
-        for i, point in enumerate(self.path):
-            if point == first_invalid_node.point:
-                invalid_point_in_path_index = i
-                break
+        center = Point((min_x + max_x) / 2, (min_y + max_y) / 2)
+        radius = np.hypot(max_x - min_x, max_y - min_y) / 2 + self.step_length
+        children = np.array(self.nearest_neighbors.within_radius(center, radius), dtype=np.int64)
+        if len(children) == 0:
+            return []
 
-        self.path = self.path[:invalid_point_in_path_index]
+        parents = self.tree.parents[children]
+        children, parents = children[parents >= 0], parents[parents >= 0]
+        starts, ends = self.tree.coordinates[parents], self.tree.coordinates[children]
+        overlap = ((np.maximum(starts[:, 0], ends[:, 0]) >= min_x) & (np.minimum(starts[:, 0], ends[:, 0]) <= max_x) &
+                   (np.maximum(starts[:, 1], ends[:, 1]) >= min_y) & (np.minimum(starts[:, 1], ends[:, 1]) <= max_y))
+        return children[overlap & self.tree.valid[children]].tolist()
 
     def is_path_invalid(self):
         """
         Check whether the path is invalid or not
         """
 
-        for node in self.path_nodes:
-            if not node.valid:
-                return True
-        return False
+        return not np.all(self.tree.valid[self.path_nodes])
 
     def trim(self):
         """
-        Propagate the invalid flag from parent to child
+        Remove the invalid nodes (the invalid flag has already been propagated from
+        parent to child): they are detached from the tree and dropped from the spatial
+        index, and the tree arrays are only compacted when they are mostly made of
+        removed nodes (the indices of the nodes in the path are updated then)
         """
 
-        for node in self.nodes:
-
-            # If the node has a parent and the parent is not valid
-            if node.parent is not None and not node.parent.valid:
+        for node in self.removed_nodes:
+            self.nearest_neighbors.remove(node)
+        self.num_removed += len(self.removed_nodes)
+        self.removed_nodes = []
 
-                # Set also the child as invalid
-                node.valid = False
+        self.path_nodes = [node for node in self.path_nodes if self.tree.valid[node]]
 
-        self.nodes = [node for node in self.nodes if node.valid]
-        self.edges = [Edge(node.parent, node) for node in self.nodes[1:len(self.nodes)]]
+        if self.num_removed > len(self.tree) - self.num_removed:
+            mapping = self.remove_invalid_nodes()
+            self.path_nodes = [int(mapping[node]) for node in self.path_nodes]
+            self.num_removed = 0
 
     def extract_waypoints(self):
-
         """
-        self.waypoints = [VNode(self.world_map.goal)]
-        node_now = node
-
-        while node_now.parent is not None:
-            node_now = node_now.parent
-            self.waypoints.append(node_now)
-
-        # Trim the path to the last valid point
-        self.waypoints = self.waypoints[:self.waypoints.index(self.start_node)]
-
-        self.waypoints = self.waypoints[::-1]
+        Cache the invalidated nodes of the path, they will be used
+        to grow the tree along the old path
         """
 
-        self.waypoints = [node for node in self.path_nodes if not node.valid]
+        self.waypoints = [self.get_point(node) for node in self.path_nodes if not self.tree.valid[node]]
 
     def post_search(self):
 
         # Create the real path
         if not self.need_for_path:
-            self.path = [node.point for node in self.path_nodes]
+            self.path = self.extract_branch(self.path_nodes[-1]) + [self.world_map.goal]
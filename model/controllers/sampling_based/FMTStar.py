@@ -0,0 +1,180 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from model.controllers.sampling_based_algorithm import SamplingBased
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class FMTStar(SamplingBased):
+    """
+    Fast Marching Tree (FMT*, Janson et al.). All the samples are drawn at once and
+    the r-disk neighborhoods of all of them are computed with a single k-d tree query.
+    The tree then grows like a wavefront, in order of cost-to-come (lazy dynamic
+    programming): the open node with the lowest cost is expanded and each unvisited
+    sample near it is connected to the open neighbor that reaches it with the lowest
+    cost. Only that edge is collision checked; if it is blocked the sample is simply
+    tried again later, from another open node. This needs far fewer collision checks
+    than RRT*, which checks every edge of each neighborhood.
+
+    Samples inside the obstacles are discarded up front with a vectorized point in
+    polygon test. Each iteration expands one node; the search ends when the goal is expanded.
+    """
+
+    # Indices of start and goal among the samples
+    START = 0
+    GOAL = 1
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 num_samples=1000,
+                 search_radius=1.0,
+                 sequence='uniform',
+                 seed=None
+                 ):
+
+        self.num_samples = num_samples
+        self.search_radius = search_radius
+        self.radius = search_radius
+
+        # Samples (start and goal included), their r-disk neighbors, their cost-to-come
+        # and the node of the tree they correspond to (-1 if not connected yet)
+        self.samples = np.empty((0, 2))
+        self.neighbors = []
+        self.costs = np.empty(0)
+        self.tree_nodes = np.empty(0, dtype=np.int64)
+
+        # Sample sets of FMT*: unvisited samples and open samples (frontier of the tree)
+        self.unvisited = np.empty(0, dtype=bool)
+        self.open = np.empty(0, dtype=bool)
+        self.open_set = IndexedHeap()
+
+        self.goal_reached = False
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            goal_sample_rate=0,
+            sequence=sequence,
+            seed=seed
+        )
+
+    def pre_search(self):
+
+        goal = self.world_map.goal
+
+        samples = self.sampler.uniform_points(self.num_samples, self.world_map.map_boundaries)
+        self.samples = np.concatenate([
+            [[self.start.x, self.start.y], [goal.x, goal.y]],
+            samples[~self.inside_obstacles(samples)]
+        ])
+        count = len(self.samples)
+
+        self.radius = self.rewiring_radius(self.search_radius, count)
+        self.neighbors = [np.array(neighbors, dtype=np.int64)
+                          for neighbors in cKDTree(self.samples).query_ball_point(self.samples, self.radius)]
+
+        self.costs = np.full(count, np.inf)
+        self.tree_nodes = np.full(count, -1, dtype=np.int64)
+        self.unvisited = np.ones(count, dtype=bool)
+        self.open = np.zeros(count, dtype=bool)
+        self.open_set.clear()
+        self.goal_reached = False
+
+        self.costs[self.START] = 0
+        self.tree_nodes[self.START] = self.set_root(self.start)
+        self.unvisited[self.START] = False
+        self.open[self.START] = True
+        self.open_set.push(self.START, 0)
+
+    def inside_obstacles(self, samples):
+        """
+        Boolean mask of the samples that lie inside an obstacle (even-odd rule)
+        """
+
+        inside = np.zeros(len(samples), dtype=bool)
+        x, y = samples[:, 0], samples[:, 1]
+        for obstacle in self.world_map.obstacles:
+            vertices = np.array([[point.x, point.y] for point in obstacle.polygon.points])
+            min_x, min_y = vertices.min(axis=0)
+            max_x, max_y = vertices.max(axis=0)
+            candidates = np.nonzero(~inside & (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))[0]
+            if len(candidates) == 0:
+                continue
+
+            crossings = np.zeros(len(candidates), dtype=bool)
+            for (x_1, y_1), (x_2, y_2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+                if y_1 == y_2:
+                    continue
+                straddle = (y[candidates] > y_1) != (y[candidates] > y_2)
+                x_cross = x_1 + (y[candidates] - y_1) * (x_2 - x_1) / (y_2 - y_1)
+                crossings ^= straddle & (x[candidates] < x_cross)
+            inside[candidates[crossings]] = True
+
+        return inside
+
+    def can_run(self):
+        return (not self.goal_reached and len(self.open_set) > 0 and
+                self.current_iteration < self.max_iterations)
+
+    def get_sample(self, sample):
+        return Point(*self.samples[sample].tolist())
+
+    def step_search(self):
+
+        node, _ = self.open_set.pop()
+
+        if node == self.GOAL:
+            self.goal_reached = True
+            return
+
+        near = self.neighbors[node]
+        near = near[self.unvisited[near]]
+
+        polygons = None
+        opened = []
+        for sample in near.tolist():
+
+            # Open neighbor that reaches the sample with the lowest cost
+            candidates = self.neighbors[sample]
+            candidates = candidates[self.open[candidates]]
+            offsets = self.samples[candidates] - self.samples[sample]
+            costs = self.costs[candidates] + np.hypot(offsets[:, 0], offsets[:, 1])
+            best = int(np.argmin(costs))
+            parent = int(candidates[best])
+
+            # The obstacles are queried once for all the edges checked in this iteration:
+            # the parents are within the radius of the samples, which are within the radius of the node
+            if polygons is None:
+                x, y = self.samples[node].tolist()
+                extent = 2 * self.radius + self.margin
+                polygons = self.get_obstacles_in_bounds((x - extent, y - extent, x + extent, y + extent))
+
+            if not self.check_collision_with(polygons, self.get_sample(parent), self.get_sample(sample)):
+                self.costs[sample] = costs[best]
+                self.tree_nodes[sample] = self.add_node(self.get_sample(sample), self.tree_nodes[parent])
+                opened.append(sample)
+
+        for sample in opened:
+            self.unvisited[sample] = False
+            self.open[sample] = True
+            self.open_set.push(sample, self.costs[sample])
+
+        self.open[node] = False
+
+        if len(opened) > 0:
+            self.update_draw_list()
+
+    def post_search(self):
+
+        if self.goal_reached:
+            self.path = self.extract_branch(self.tree_nodes[self.GOAL])[:-1] + [self.world_map.goal]
@@ -1,16 +1,25 @@
-import random
+import math
 
 from model.controllers.sampling_based_algorithm import SamplingBased
-from model.controllers.graph import Node
+from model.controllers.sampler import GoalBiased, Informed, Uniform
 from model.geometry.ellipse import Ellipse
 
-from model.geometry.segment import Segment
 from model.geometry.point import Point
-import math
 import numpy as np
 
 
 class InformedRRTStar(SamplingBased):
+    """
+    Informed RRT* (Gammell et al.). It grows an RRT* tree with uniform samples until a
+    path is found; from then on samples are drawn (in batches, see Informed) only inside
+    the informed ellipse, whose foci are start and goal and whose major axis is the cost
+    of the best path c_best. The ellipse shrinks each time the path improves. Every
+    prune_interval iterations the nodes whose heuristic f-value (distance from the start
+    plus distance to the goal) exceeds c_best, which cannot be part of a better path,
+    are removed from the tree with their subtrees, so the size of the tree stays bounded
+    while the path improves. The rewiring radius is computed for the area of the ellipse,
+    where the nodes are, rather than for the area of the map.
+    """
 
     def __init__(self,
                  world_map,
@@ -21,180 +30,192 @@ class InformedRRTStar(SamplingBased):
                  search_radius=0.5,
                  max_iterations=1000,
                  goal_sample_rate=0.05,
+                 prune_interval=100,
+                 sequence='uniform',
+                 seed=None
                  ):
-        super().__init__(world_map, start, margin, iterations_per_step, max_iterations)
 
         self.step_length = step_length
         self.search_radius = search_radius
-        self.goal_sample_rate = goal_sample_rate
-        self.ellipse = None
-        self.need_for_path = True
+        self.prune_interval = prune_interval
 
-    def heuristic(self, point):
-        return 0
+        # Samples in the informed ellipse once a path is known (uniform before)
+        self.informed = Informed(Uniform())
 
-    def pre_search(self):
-
-        self.nodes = [Node(self.start)]
-        self.edges = []
-        self.need_for_path = True
+        # Nodes that can reach the goal, the one with the best path and its cost (c_best)
+        self.goal_candidates = []
+        self.goal_node = None
+        self.best_cost = math.inf
         self.ellipse = None
 
-    def step_search(self):
-
-        if self.need_for_path:
-            self.step_planning()
-        else:
-            self.step_replanning()
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            goal_sample_rate=goal_sample_rate,
+            sequence=sequence,
+            seed=seed,
+            sampling_strategy=GoalBiased(self.informed)
+        )
 
-    def step_planning(self):
-        node_rand = self.generate_random_node()
-        node_near = self.nearest_neighbor(node_rand)
-        node_new = self.new_state(node_near, node_rand)
+    def pre_search(self):
 
-        if node_new and not self.check_collision(node_near.point, node_new.point):
-            neighbor_index = self.find_neighborhood(node_new)
+        self.set_root(self.start)
+        self.goal_candidates = []
+        self.goal_node = None
+        self.best_cost = math.inf
+        self.ellipse = None
 
-            self.nodes.append(node_new)
+    def warm_start(self, start_moved, goal_moved):
+        """
+        The tree grows from the start: if just the goal moved, it is kept while the informed
+        ellipse (whose foci are start and goal) is computed again from the nodes that reach
+        the new goal
+        """
 
-            if neighbor_index:
-                self.choose_parent(node_new, neighbor_index)
-                self.rewire(node_new, neighbor_index)
+        if start_moved:
+            return False
 
-            dist = self.distance_to_goal(node_new)
+        self.informed.reset()
+        self.goal_node = None
+        self.best_cost = math.inf
+        self.ellipse = None
 
-            if dist <= self.step_length:
-                self.extract_path(node_new)
+        goal = self.world_map.goal
+        self.goal_candidates = [node for node in self.get_nodes_within(goal, self.step_length)
+                                if not self.check_collision(self.get_point(node), goal)]
+        self.update_best_cost()
+        return True
 
-            self.update_draw_list()
+    def step_search(self):
 
-    def step_replanning(self):
-        node_rand = self.generate_random_node_replanning()
+        node_rand = self.generate_random_node()
         node_near = self.nearest_neighbor(node_rand)
-        node_new = self.new_state(node_near, node_rand)
+        point_new = self.new_state(node_near, node_rand)
 
-        if node_new and not self.check_collision(node_near.point, node_new.point):
-            neighbor_index = self.find_neighborhood(node_new)
+        if not self.check_collision(self.get_point(node_near), point_new):
+            neighbors = self.find_neighborhood(point_new)
 
-            self.nodes.append(node_new)
+            parent = self.choose_parent(point_new, neighbors) if neighbors else node_near
+            node_new = self.add_node(point_new, parent)
 
-            if neighbor_index:
-                self.choose_parent(node_new, neighbor_index)
-                self.rewire(node_new, neighbor_index)
+            if neighbors:
+                self.rewire(node_new, neighbors)
 
-            dist = self.distance_to_goal(node_new)
+            if (self.distance_to_goal(node_new) <= self.step_length and
+                    not self.check_collision(point_new, self.world_map.goal)):
+                self.goal_candidates.append(node_new)
 
-            if dist <= self.step_length:
-                self.extract_path(node_new)
+            # Rewiring might have improved the path as well
+            self.update_best_cost()
 
             self.update_draw_list()
 
-    def generate_random_node_replanning(self):
-        if self.path_nodes:
-            if self.ellipse is None:
-                focus1 = self.path_nodes[0]
-                focus2 = self.world_map.goal
-                self.ellipse = Ellipse.from_path_points(focus1, focus2, focus1.distance(focus2) + 2)
-
-            random_node_inside_ellipse = Node(Point.from_dict(self.ellipse.generate_point_inside()))
-            return random_node_inside_ellipse
+        if not math.isinf(self.best_cost) and self.current_iteration % self.prune_interval == 0:
+            self.prune()
+
+    def update_best_cost(self):
+        """
+        Update c_best (and the ellipse) with the cheapest path through the goal candidates
+        """
+
+        if len(self.goal_candidates) == 0:
+            return
+
+        candidates = np.array(self.goal_candidates)
+        goal = self.world_map.goal
+        offsets = self.tree.coordinates[candidates] - (goal.x, goal.y)
+        costs = self.tree.costs[candidates] + np.hypot(offsets[:, 0], offsets[:, 1])
+        best = int(np.argmin(costs))
+
+        if costs[best] < self.best_cost:
+            self.best_cost = float(costs[best])
+            self.goal_node = int(candidates[best])
+            self.informed.set_ellipse(self.start, goal, self.best_cost)
+            self.ellipse = Ellipse.from_path_points(self.start, goal, self.best_cost)
+
+    def prune(self):
+        """
+        Remove the nodes whose f-value exceeds c_best, together with their subtrees
+        (vectorized; the nodes of the best path are always kept)
+        """
+
+        size = len(self.tree)
+        coordinates = self.tree.coordinates[:size]
+        goal = self.world_map.goal
+        estimates = (np.hypot(coordinates[:, 0] - self.start.x, coordinates[:, 1] - self.start.y) +
+                     np.hypot(coordinates[:, 0] - goal.x, coordinates[:, 1] - goal.y))
+
+        # Tolerance for the rounding errors of the costs of the nodes of the best path
+        keep = estimates <= self.best_cost + 1e-9
+        if np.all(keep):
+            return
+
+        self.tree.valid[:size] = keep
+        self.tree.propagate_invalid()
+        mapping = self.remove_invalid_nodes()
+
+        self.goal_candidates = [int(mapping[node]) for node in self.goal_candidates if mapping[node] >= 0]
+        self.goal_node = int(mapping[self.goal_node])
+        self.update_draw_list()
 
     def post_search(self):
-        if not self.need_for_path:
-            self.path = [point for point in self.path_nodes]
+        if self.goal_node is not None:
+            self.extract_path(self.goal_node)
 
     def check_collision(self, point_start, point_end):
         if point_start == point_end:
             return False
         return super().check_collision(point_start, point_end)
 
-    def search_goal_parent(self):
-        dist_list = [self.distance_to_goal(n) for n in self.nodes]
-        node_index = [i for i in range(len(dist_list)) if dist_list[i] <= self.search_radius]
-
-        if len(node_index) > 0:
-            cost_list = [dist_list[i] + self.compute_cost(self.nodes[i]) for i in node_index
-                         if not self.nodes[i].point == self.world_map.goal and
-                         not self.check_collision(self.nodes[i].point, self.world_map.goal)]
-            return node_index[int(np.argmin(cost_list))]
-        return -1
-
-    def find_neighborhood(self, node_new):
-        dist_table = [np.hypot(nd.point.x - node_new.point.x, nd.point.y - node_new.point.y) for nd in self.nodes]
-        dist_table_index = [ind for ind in range(len(dist_table)) if dist_table[ind] <= self.search_radius and
-                            not node_new.point == self.world_map.goal and
-                            not self.check_collision(node_new.point, self.nodes[ind].point)]
-
-        return dist_table_index
-
-    def has_path(self):
-        return len(self.path) > 0 and self.path[-1] == self.world_map.goal
-
-    def nearest_neighbor(self, n):
-        return min(self.nodes, key=lambda nd: nd.point.distance(n.point))
-
-    def new_state(self, node_start, node_end):
-        dist, theta = self.get_distance_and_angle(node_start, node_end)
-
-        dist = min(self.step_length, dist)
-        new_x = node_start.point.x + dist * np.cos(theta)
-        new_y = node_start.point.y + dist * np.sin(theta)
-
-        node_new = Node(Point(new_x, new_y))
-        node_new.parent = node_start
-
-        return node_new
+    def find_neighborhood(self, point_new):
+        """
+        Nodes within the rewiring radius of the new point that can be connected to it
+        """
+        if point_new == self.world_map.goal:
+            return []
+
+        radius = self.rewiring_radius(self.search_radius, area=self.sampling_area())
+        neighbors = self.get_nodes_within(point_new, radius)
+        collisions = self.check_collisions(point_new, [self.get_point(node) for node in neighbors])
+        return [node for node, collision in zip(neighbors, collisions) if not collision]
+
+    def sampling_area(self):
+        """
+        Area where the nodes are sampled: the informed ellipse, once it is smaller than the map
+        """
+        min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+        area = (max_x - min_x) * (max_y - min_y)
+        if self.ellipse is not None:
+            area = min(area, math.pi * self.ellipse.a * self.ellipse.b)
+        return area
+
+    def new_state(self, node_start, point_end):
+        return self.steer(node_start, point_end, self.step_length)
 
     def extract_path(self, node_end):
-        self.need_for_path = False
-        self.path_nodes = [self.world_map.goal]
-        node_now = node_end
-
-        while node_now.parent is not None:
-            node_now = node_now.parent
-            self.path_nodes.append(Point(node_now.point.x, node_now.point.y))
-
-        self.path_nodes = self.path_nodes[::-1]
-
-    def choose_parent(self, node_new, neighbor_index):
-        cost = [self.get_new_cost(self.nodes[i], node_new) for i in neighbor_index]
-        cost_min_index = neighbor_index[int(np.argmin(cost))]
-        node_new.parent = self.nodes[cost_min_index]
-
-    def rewire(self, node_new, neighbor_index):
-        for i in neighbor_index:
-            node_neighbor = self.nodes[i]
-
-            if self.compute_cost(node_neighbor) > self.get_new_cost(node_new, node_neighbor):
-                node_neighbor.parent = node_new
-
-    def get_new_cost(self, node_start, node_end):
-        dist, _ = self.get_distance_and_angle(node_start, node_end)
-        return self.compute_cost(node_start) + dist
-
-    @staticmethod
-    def get_distance_and_angle(node_start, node_end):
-        dx = node_end.point.x - node_start.point.x
-        dy = node_end.point.y - node_start.point.y
-        return node_start.point.distance(node_end.point), np.arctan2(dy, dx)
-
-    @staticmethod
-    def compute_cost(node):
-        n = node
-        cost = 0.0
-        while n.parent:
-            cost += n.point.distance(n.parent.point)
-            n = n.parent
-        return cost
-
-    def generate_random_node(self):
-        if np.random.random() > self.goal_sample_rate:
-            x = np.random.uniform(-2 * self.world_map.obs_max_dist, 0) + self.world_map.obs_max_dist
-            y = np.random.uniform(-2 * self.world_map.obs_max_dist, 0) + self.world_map.obs_max_dist
-        else:
-            x, y = self.world_map.goal
-
-        return Node(Point(x, y))
-
-    def distance_to_goal(self, node):
-        return node.point.distance(self.world_map.goal)
+        self.path = self.extract_branch(node_end) + [self.world_map.goal]
+
+    def choose_parent(self, point_new, neighbors):
+        """
+        Returns the neighbor through which the new point is reached with the lowest cost
+        """
+        neighbors = np.array(neighbors)
+        offsets = self.tree.coordinates[neighbors] - (point_new.x, point_new.y)
+        cost = self.tree.costs[neighbors] + np.hypot(offsets[:, 0], offsets[:, 1])
+        return int(neighbors[np.argmin(cost)])
+
+    def rewire(self, node_new, neighbors):
+        neighbors = np.array(neighbors)
+        offsets = self.tree.coordinates[neighbors] - self.tree.coordinates[node_new]
+        new_costs = self.tree.costs[node_new] + np.hypot(offsets[:, 0], offsets[:, 1])
+
+        # Costs are checked again before rewiring, since rewiring a node lowers
+        # the cost of its descendants as well
+        improved = new_costs < self.tree.costs[neighbors]
+        for node_neighbor, new_cost in zip(neighbors[improved].tolist(), new_costs[improved].tolist()):
+            if new_cost < self.tree.costs[node_neighbor]:
+                self.set_parent(node_neighbor, node_new)
@@ -0,0 +1,236 @@
+import weakref
+
+from model.controllers.sampling_based_algorithm import SamplingBased
+from model.controllers.probabilistic_roadmap import ProbabilisticRoadmap
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class PRM(SamplingBased):
+    """
+    Multi-query probabilistic roadmap planner. The roadmap (ProbabilisticRoadmap)
+    only depends on the map: it is shared by all the instances planning on the same
+    map with the same settings, updated incrementally when
+    obstacles are added or removed, and stored by map fingerprint (in memory and,
+    if roadmap_directory is set, on disk) so that a map that has already been seen
+    does not need a new roadmap. A query only connects start and goal to the
+    closest free nodes and runs A* on the roadmap, so resets and goal changes cost
+    a graph search instead of a new tree. The samples come from the Sampler of the
+    planner settings (sequence and seed), so a seeded roadmap is reproducible.
+
+    When a query fails the roadmap is expanded (the expansion step of the classic
+    PRM): expansion_samples new samples are added around the nodes the query
+    reached from the start and from the goal, favoring the ones with few neighbors
+    (the border of the free space they see), and the query runs again, at most
+    max_expansions times. The expanded roadmap is stored like an updated one.
+
+    With lazy collision evaluation the connections of start and goal to the roadmap
+    are assumed free and only the ones on the path found by A* are checked; if one
+    of them collides A* runs again without it.
+
+    The nodes expanded by A* are stored in the tree of SamplingBased (each one
+    child of the node it was reached from), which is drawn on screen.
+    """
+
+    START = 'start'
+    GOAL = 'goal'
+
+    # Roadmaps shared between instances
+    # ({world_map: {(margin, num_samples, connection_radius, sequence, seed): roadmap}})
+    shared_roadmaps = weakref.WeakKeyDictionary()
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=10,
+                 max_iterations=5000,
+                 num_samples=600,
+                 connection_radius=1.0,
+                 num_connections=10,
+                 roadmap_directory=None,
+                 lazy_collision=False,
+                 max_expansions=5,
+                 expansion_samples=150,
+                 sequence='uniform',
+                 seed=None
+                 ):
+
+        self.num_samples = num_samples
+        self.connection_radius = connection_radius
+        self.num_connections = num_connections
+        self.roadmap_directory = roadmap_directory
+        self.max_expansions = max_expansions
+        self.expansion_samples = expansion_samples
+
+        self.roadmap = None
+
+        # Expansions of the roadmap for the current query
+        self.expansions = 0
+
+        # Roadmap nodes reachable from the start and nodes from which the goal is reachable ({node: cost})
+        self.start_edges = {}
+        self.goal_edges = {}
+
+        # A* state: cost-to-come and parent of each generated node, node of the tree of each expanded one
+        self.open_set = IndexedHeap()
+        self.costs = {}
+        self.parents = {}
+        self.tree_nodes = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            goal_sample_rate=0,
+            lazy_collision=lazy_collision,
+            sequence=sequence,
+            seed=seed
+        )
+
+    def get_roadmap(self):
+        roadmaps = self.shared_roadmaps.setdefault(self.world_map, {})
+        key = (self.margin, self.num_samples, self.connection_radius, self.sampler.sequence, self.sampler.seed)
+        if key not in roadmaps:
+            roadmaps[key] = ProbabilisticRoadmap.load(self.world_map, *key, directory=self.roadmap_directory)
+        return roadmaps[key]
+
+    def pre_search(self):
+
+        self.roadmap = self.get_roadmap()
+
+        # Keep a snapshot of the updated roadmap for the new content of the map
+        if self.roadmap.update():
+            self.roadmap.store(self.roadmap_directory)
+
+        self.expansions = 0
+        self.start_query()
+
+    def warm_start(self, start_moved, goal_moved):
+        # The roadmap is kept anyway: only the query starts again, and the connections
+        # already evaluated lazily are not checked again
+        self.pre_search()
+        return True
+
+    def start_query(self):
+
+        self.start_edges = self.connect(self.start)
+        self.goal_edges = self.connect(self.world_map.goal)
+
+        self.open_set = IndexedHeap()
+        self.costs = {self.START: 0}
+        self.parents = {self.START: None}
+        self.tree_nodes = {}
+
+        self.set_root(self.start)
+        self.open_set.push(self.START, self.heuristic(self.start))
+
+    def connect(self, point):
+        """
+        Closest free nodes of the roadmap that can be reached from the point with a straight line ({node: cost})
+        """
+
+        nodes = self.roadmap.nearest_free_nodes(point, self.num_connections)
+        points = [self.roadmap.get_point(node) for node in nodes]
+
+        if self.lazy_collision:
+            return {node: point.distance(node_point)
+                    for node, node_point in zip(nodes, points) if self.lazy_edge(point, node_point)}
+
+        return {node: point.distance(node_point)
+                for node, node_point, collision in zip(nodes, points, self.check_collisions(point, points))
+                if not collision}
+
+    def get_point(self, node):
+        if node == self.START:
+            return self.start
+        if node == self.GOAL:
+            return self.world_map.goal
+        return self.roadmap.get_point(node)
+
+    def heuristic(self, point):
+        return point.distance(self.world_map.goal)
+
+    def get_edges(self, node):
+        """
+        Edges leaving the node in the roadmap extended with start and goal. Returns {node: cost}
+        """
+
+        if node == self.START:
+            edges = dict(self.start_edges)
+            distance = self.start.distance(self.world_map.goal)
+            if distance <= self.connection_radius:
+                if self.lazy_collision:
+                    collision = not self.lazy_edge(self.start, self.world_map.goal)
+                else:
+                    collision = self.check_collision(self.start, self.world_map.goal)
+                if not collision:
+                    edges[self.GOAL] = distance
+            return edges
+
+        edges = dict(self.roadmap.adjacency[node])
+        if node in self.goal_edges:
+            edges[self.GOAL] = self.goal_edges[node]
+        return edges
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path() and self.current_iteration < self.max_iterations
+
+    def step_search(self):
+
+        current, _ = self.open_set.pop()
+
+        parent = self.parents[current]
+        if parent is None:
+            self.tree_nodes[current] = 0
+        else:
+            self.tree_nodes[current] = self.add_node(self.get_point(current), self.tree_nodes[parent])
+
+        if current == self.GOAL:
+            # Goal reached, reconstruct the path
+            path = self.extract_branch(self.tree_nodes[current])[:-1] + [self.world_map.goal]
+
+            # Lazy collision evaluation: query again if a connection to the roadmap collides
+            if self.lazy_collision and self.evaluate_path(path) is not None:
+                self.start_query()
+                return
+
+            self.path = path
+            return
+
+        for neighbor, cost in self.get_edges(current).items():
+            if neighbor in self.tree_nodes:
+                continue
+
+            new_cost = self.costs[current] + cost
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = current
+                self.open_set.push(neighbor, new_cost + self.heuristic(self.get_point(neighbor)))
+
+        self.update_draw_list()
+
+        if len(self.open_set) == 0 and self.expansions < self.max_expansions:
+            self.expand_roadmap()
+
+    def expand_roadmap(self):
+        """
+        Add samples around the nodes reached by the failed query from the start (the ones
+        it expanded) and from the goal (its component of the roadmap), with weights
+        inversely proportional to their degree, then query again
+        """
+
+        reached = [node for node in self.tree_nodes if node not in (self.START, self.GOAL)]
+        nodes = sorted(set(reached) | self.roadmap.component(self.goal_edges))
+        anchors = [(self.start.x, self.start.y), (self.world_map.goal.x, self.world_map.goal.y)]
+        anchors.extend(self.roadmap.coordinates[nodes].tolist())
+        weights = [1, 1] + [1 / (1 + len(self.roadmap.adjacency[node])) for node in nodes]
+
+        self.expansions += 1
+        if self.roadmap.expand(anchors, weights, self.expansion_samples) > 0:
+            self.roadmap.store(self.roadmap_directory)
+        self.start_query()
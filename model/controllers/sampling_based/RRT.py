@@ -1,10 +1,7 @@
 from model.controllers.sampling_based_algorithm import SamplingBased
-from model.controllers.graph import Node
 
 from model.geometry.point import Point
 
-import numpy as np
-
 
 class RRT(SamplingBased):
     def __init__(self,
@@ -15,6 +12,10 @@ class RRT(SamplingBased):
                  max_iterations=5000,
                  goal_sample_rate=0.05,
                  step_length=0.2,
+                 lazy_collision=False,
+                 sequence='uniform',
+                 seed=None,
+                 sampling_strategy=None
                  ):
 
         self.step_length = step_length
@@ -28,28 +29,110 @@ class RRT(SamplingBased):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=False,
-            goal_sample_rate=goal_sample_rate
+            goal_sample_rate=goal_sample_rate,
+            lazy_collision=lazy_collision,
+            sequence=sequence,
+            seed=seed,
+            sampling_strategy=sampling_strategy
         )
 
     def pre_search(self):
 
-        self.node_new = Node(self.start)
-        self.nodes = [self.node_new]
-        self.new_node_to_goal_dist = self.node_new.point.distance(self.world_map.goal)
+        self.node_new = self.set_root(self.start)
+        self.new_node_to_goal_dist = self.distance_to_goal(self.node_new)
+
+    def warm_start(self, start_moved, goal_moved):
+        """
+        The tree grows from the start: if just the goal moved, it is kept and the search
+        goes on from its node closest to the new goal
+        """
+
+        if start_moved:
+            return False
+
+        self.node_new = self.nearest_neighbor(self.world_map.goal)
+        self.new_node_to_goal_dist = self.distance_to_goal(self.node_new)
+
+        if self.lazy_collision and self.new_node_to_goal_dist <= self.step_length:
+            self.evaluate_branch(self.node_new)
+        return True
 
     def step_search(self):
 
         node_rand = self.generate_random_node()
         node_near = self.nearest_neighbor(node_rand)
-        self.node_new = self.new_state(node_near, node_rand)
 
-        if self.node_new and not self.check_collision(node_near.point, self.node_new.point):
-            self.nodes.append(self.node_new)
+        # With lazy collision evaluation, the edge leading to a node is checked before the
+        # tree grows from it, so that branches don't spread through the obstacles
+        if self.lazy_collision and not self.evaluate_edge(node_near):
+            return
+
+        point_new = self.new_state(node_near, node_rand)
+
+        if self.lazy_collision:
+            collision = not self.lazy_edge(self.get_point(node_near), point_new)
+        else:
+            collision = self.check_collision(self.get_point(node_near), point_new)
+
+        if not collision:
+            self.node_new = self.add_node(point_new, node_near)
             self.new_node_to_goal_dist = self.distance_to_goal(self.node_new)
 
+            if self.lazy_collision and self.new_node_to_goal_dist <= self.step_length:
+                self.evaluate_branch(self.node_new)
+
             # Update drawing list
             self.update_draw_list()
 
+    def evaluate_branch(self, node):
+        """
+        Lazy collision evaluation of the branch that reached the goal, including its last
+        edge to the goal. If one of the edges of the branch collides, the subtree below it
+        is removed (if just the edge to the goal collides, the node is kept) and the search
+        goes on. Returns True if the branch is free
+        """
+
+        branch = self.tree.get_branch(node)
+        points = [self.get_point(index) for index in branch]
+        if points[-1] != self.world_map.goal:
+            self.lazy_edge(points[-1], self.world_map.goal)
+            points.append(self.world_map.goal)
+
+        collision = self.evaluate_path(points)
+        if collision is None:
+            return True
+
+        if collision + 1 < len(branch):
+            self.remove_subtree(branch[collision + 1])
+        self.node_new = 0
+        self.new_node_to_goal_dist = float('inf')
+        return False
+
+    def evaluate_edge(self, node):
+        """
+        Lazy collision evaluation of the edge from the parent of the node. If it collides,
+        the subtree below it is removed. Returns True if the edge is free
+        """
+
+        parent = self.tree.get_parent(node)
+        if parent is None or self.evaluate_path([self.get_point(parent), self.get_point(node)]) is None:
+            return True
+
+        self.remove_subtree(node)
+        return False
+
+    def remove_subtree(self, node):
+        self.tree.valid[node] = False
+        self.tree.propagate_invalid()
+        mapping = self.remove_invalid_nodes()
+
+        # The last node added might have been removed
+        if mapping[self.node_new] < 0:
+            self.node_new = 0
+            self.new_node_to_goal_dist = float('inf')
+        else:
+            self.node_new = int(mapping[self.node_new])
+
     def can_run(self):
         """
         Algorithm terminates when:
@@ -70,33 +153,17 @@ class RRT(SamplingBased):
         )
 
     def post_search(self):
-        self.extract_path(self.node_new)
+        # With lazy collision evaluation, publish the branch only if it reached the goal and
+        # it is free (the iterations might have run out before)
+        if self.lazy_collision and not (self.new_node_to_goal_dist <= self.step_length and
+                                        self.evaluate_branch(self.node_new)):
+            self.path = []
+            return
 
-    def nearest_neighbor(self, n):
-        return min(self.nodes, key=lambda nd: nd.point.distance(n.point))
-
-    def new_state(self, node_start, node_end):
-        dist, theta = self.get_distance_and_angle(node_start, node_end)
-
-        dist = min(self.step_length, dist)
-        new_x = node_start.point.x + dist * np.cos(theta)
-        new_y = node_start.point.y + dist * np.sin(theta)
-
-        # new_y = round(new_y / self.search_step, 2) * self.search_step
-        # new_x = round(new_x / self.search_step, 2) * self.search_step
-
-        node_new = Node(Point(new_x, new_y))
-        node_new.parent = node_start
+        self.extract_path(self.node_new)
 
-        return node_new
+    def new_state(self, node_start, point_end):
+        return self.steer(node_start, point_end, self.step_length)
 
     def extract_path(self, node):
-
-        self.path = [self.world_map.goal]
-        node_now = node
-
-        while node_now.parent is not None:
-            node_now = node_now.parent
-            self.path.append(Point(node_now.point.x, node_now.point.y))
-
-        self.path = self.path[::-1]
+        self.path = self.extract_branch(node) + [self.world_map.goal]
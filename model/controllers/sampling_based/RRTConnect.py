@@ -0,0 +1,162 @@
+from model.controllers.sampling_based_algorithm import SamplingBased
+from model.controllers.nearest_neighbors import NearestNeighborIndex
+from model.controllers.tree import Tree
+
+from model.geometry.point import Point
+
+import math
+
+
+class RRTConnect(SamplingBased):
+    """
+    RRT-Connect (Kuffner and LaValle). Two trees are grown, one from the start and
+    one from the goal. At each iteration the active tree is extended of one step
+    towards a random point, then the other tree greedily grows towards the new node
+    (connect step) until it reaches it or it is blocked by an obstacle; finally the
+    roles of the trees are swapped. The search ends as soon as the trees meet, which
+    usually takes far fewer iterations than waiting for a single tree to sample the
+    goal, especially through narrow passages.
+
+    The active tree is always self.tree (with its spatial index), so all the tree
+    operations of SamplingBased apply to it; swap_trees exchanges it with the other one.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 step_length=0.2,
+                 sequence='uniform',
+                 seed=None,
+                 sampling_strategy=None
+                 ):
+
+        self.step_length = step_length
+
+        # Inactive tree and its spatial index
+        self.other_tree = Tree()
+        self.other_nearest_neighbors = NearestNeighborIndex()
+
+        # True if the active tree is the one grown from the goal
+        self.swapped = False
+
+        # Nodes where the trees meet (index in the start tree, index in the goal tree)
+        self.connection = None
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            goal_sample_rate=0,
+            sequence=sequence,
+            seed=seed,
+            sampling_strategy=sampling_strategy
+        )
+
+    def swap_trees(self):
+        self.tree, self.other_tree = self.other_tree, self.tree
+        self.nearest_neighbors, self.other_nearest_neighbors = self.other_nearest_neighbors, self.nearest_neighbors
+        self.swapped = not self.swapped
+
+    def get_trees(self):
+        return [self.tree, self.other_tree]
+
+    def pre_search(self):
+
+        if self.swapped:
+            self.swap_trees()
+
+        self.connection = None
+
+        self.swap_trees()
+        self.set_root(self.world_map.goal)
+        self.swap_trees()
+        self.set_root(self.start)
+
+    def can_run(self):
+        return self.connection is None and self.current_iteration < self.max_iterations
+
+    def step_search(self):
+
+        point_rand = self.generate_random_node()
+        node_new = self.extend(point_rand)
+
+        if node_new is not None:
+            node_other = self.connect(self.get_point(node_new))
+
+            if node_other is not None:
+                self.connection = (node_other, node_new) if self.swapped else (node_new, node_other)
+
+        self.swap_trees()
+        self.update_draw_list()
+
+    def extend(self, point):
+        """
+        Grow the active tree of one step towards the point. Returns the index
+        of the new node (None if the step is blocked by an obstacle)
+        """
+
+        node_near = self.nearest_neighbor(point)
+        point_new = self.steer(node_near, point, self.step_length)
+
+        if self.check_collision(self.get_point(node_near), point_new):
+            return None
+
+        return self.add_node(point_new, node_near)
+
+    def connect(self, point):
+        """
+        Greedily grow the inactive tree towards the point, one step at a time, until it
+        is reached or an obstacle is met. All the steps are checked with a single batched
+        collision query. Returns the index of the node of the inactive tree that reached
+        the point (None if the point has not been reached)
+        """
+
+        self.swap_trees()
+
+        node = self.nearest_neighbor(point)
+        point_near = self.get_point(node)
+        distance = point_near.distance(point)
+
+        # Intermediate points, step_length apart, from the nearest node to the point (included)
+        num_steps = max(1, math.ceil(distance / self.step_length))
+        points = [Point(point_near.x + (point.x - point_near.x) * k / num_steps,
+                        point_near.y + (point.y - point_near.y) * k / num_steps)
+                  for k in range(1, num_steps)] + [point]
+
+        # The segment to a point covers the ones to the previous points, so the
+        # first collision marks the end of the free prefix
+        collisions = self.check_collisions(point_near, points)
+        reached = True
+        for point_step, collision in zip(points, collisions):
+            if collision:
+                reached = False
+                break
+            node = self.add_node(point_step, node)
+
+        self.swap_trees()
+
+        return node if reached else None
+
+    def post_search(self):
+
+        if self.connection is None:
+            return
+
+        node_start, node_goal = self.connection
+
+        if self.swapped:
+            self.swap_trees()
+
+        # The meeting point is in both trees: drop it from the branch of the goal tree
+        start_branch = self.extract_branch(node_start)
+        self.swap_trees()
+        goal_branch = self.extract_branch(node_goal)[::-1]
+        self.swap_trees()
+
+        self.path = [self.start] + start_branch[1:] + goal_branch[1:-1] + [self.world_map.goal]
@@ -1,7 +1,5 @@
 from model.controllers.sampling_based_algorithm import SamplingBased
-from model.controllers.graph import Node
 
-from model.geometry.segment import Segment
 from model.geometry.point import Point
 
 import numpy as np
@@ -18,6 +16,9 @@ class RRTStar(SamplingBased):
                  goal_sample_rate=0.05,
                  step_length=0.2,
                  search_radius=0.5,
+                 sequence='uniform',
+                 seed=None,
+                 sampling_strategy=None
                  ):
 
         self.step_length = step_length
@@ -30,37 +31,52 @@ class RRTStar(SamplingBased):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=False,
-            goal_sample_rate=goal_sample_rate
+            goal_sample_rate=goal_sample_rate,
+            sequence=sequence,
+            seed=seed,
+            sampling_strategy=sampling_strategy
         )
 
     def pre_search(self):
 
-        self.nodes = [Node(self.start)]
-        self.edges = []
+        self.set_root(self.start)
+
+    def warm_start(self, start_moved, goal_moved):
+        """
+        The tree grows from the start: if just the goal moved, it is kept. When it already
+        reaches the new goal the path is extracted right away, otherwise it grows again
+        """
+
+        if start_moved:
+            return False
+
+        if self.search_goal_parent() is not None:
+            self.current_iteration = self.max_iterations
+        return True
 
     def step_search(self):
 
         node_rand = self.generate_random_node()
         node_near = self.nearest_neighbor(node_rand)
-        node_new = self.new_state(node_near, node_rand)
+        point_new = self.new_state(node_near, node_rand)
 
-        if node_new and not self.check_collision(node_near.point, node_new.point):
+        if not self.check_collision(self.get_point(node_near), point_new):
 
-            neighbor_index = self.find_neighborhood(node_new)
+            neighbors = self.find_neighborhood(point_new)
 
-            self.nodes.append(node_new)
+            parent = self.choose_parent(point_new, neighbors) if neighbors else node_near
+            node_new = self.add_node(point_new, parent)
 
-            if neighbor_index:
-                self.choose_parent(node_new, neighbor_index)
-                self.rewire(node_new, neighbor_index)
+            if neighbors:
+                self.rewire(node_new, neighbors)
 
             self.update_draw_list()
 
     def post_search(self):
 
-        index = self.search_goal_parent()
-        if index > 0:
-            self.extract_path(self.nodes[index])
+        node = self.search_goal_parent()
+        if node is not None:
+            self.extract_path(node)
 
     def check_collision(self, point_start, point_end):
         if point_start == point_end:
@@ -68,74 +84,57 @@ class RRTStar(SamplingBased):
         return super().check_collision(point_start, point_end)
 
     def search_goal_parent(self):
-        dist_list = [self.distance_to_goal(n) for n in self.nodes]
-        node_index = [i for i in range(len(dist_list)) if dist_list[i] <= self.search_radius]
+        """
+        Returns the node within search_radius from the goal that can reach it
+        with the lowest cost (None if there is no such node)
+        """
 
-        if len(node_index) > 0:
-            cost_list = [dist_list[i] + self.compute_cost(self.nodes[i]) for i in node_index
-                         if not self.nodes[i].point == self.world_map.goal and
-                         not self.check_collision(self.nodes[i].point, self.world_map.goal)]
-            return node_index[int(np.argmin(cost_list))]
+        candidates = [node for node in self.get_nodes_within(self.world_map.goal, self.search_radius)
+                      if not self.get_point(node) == self.world_map.goal and
+                      not self.check_collision(self.get_point(node), self.world_map.goal)]
 
-        # return len(self.vertex) - 1
-        return -1
+        if len(candidates) > 0:
+            return min(candidates, key=lambda node: self.compute_cost(node) + self.distance_to_goal(node))
 
-    def find_neighborhood(self, node_new):
+        return None
 
-        # n = len(self.nodes) + 1
-        # r = min(self.search_radius * np.sqrt((np.log(n) / n)), self.discretization_step)
-        r = self.search_radius
+    def find_neighborhood(self, point_new):
+        """
+        Nodes within the rewiring radius of the new point that can be connected to it
+        """
+        if point_new == self.world_map.goal:
+            return []
 
-        dist_table = [np.hypot(nd.point.x - node_new.point.x, nd.point.y - node_new.point.y) for nd in self.nodes]
-        dist_table_index = [ind for ind in range(len(dist_table)) if dist_table[ind] <= r and
-                            not node_new.point == self.world_map.goal and
-                            not self.check_collision(node_new.point, self.nodes[ind].point)]
-
-        return dist_table_index
+        neighbors = self.get_nodes_within(point_new, self.rewiring_radius(self.search_radius))
+        collisions = self.check_collisions(point_new, [self.get_point(node) for node in neighbors])
+        return [node for node, collision in zip(neighbors, collisions) if not collision]
 
     def has_path(self):
         return len(self.path) > 0 and self.path[-1] == self.world_map.goal
 
-    def nearest_neighbor(self, n):
-        return min(self.nodes, key=lambda nd: nd.point.distance(n.point))
-
-    def new_state(self, node_start, node_end):
-        dist, theta = self.get_distance_and_angle(node_start, node_end)
-
-        dist = min(self.step_length, dist)
-        new_x = node_start.point.x + dist * np.cos(theta)
-        new_y = node_start.point.y + dist * np.sin(theta)
-
-        # new_y = round(new_y / self.search_step, 2) * self.search_step
-        # new_x = round(new_x / self.search_step, 2) * self.search_step
-
-        node_new = Node(Point(new_x, new_y))
-        node_new.parent = node_start
-
-        return node_new
+    def new_state(self, node_start, point_end):
+        return self.steer(node_start, point_end, self.step_length)
 
     def extract_path(self, node_end):
-        self.path = [Point(self.world_map.goal[0], self.world_map.goal[1])]
-        node_now = node_end
-
-        while node_now.parent is not None:
-            node_now = node_now.parent
-            self.path.append(Point(node_now.point.x, node_now.point.y))
-
-        self.path = self.path[::-1]
-
-    def choose_parent(self, node_new, neighbor_index):
-        cost = [self.get_new_cost(self.nodes[i], node_new) for i in neighbor_index]
-        cost_min_index = neighbor_index[int(np.argmin(cost))]
-        node_new.parent = self.nodes[cost_min_index]
-
-    def rewire(self, node_new, neighbor_index):
-        for i in neighbor_index:
-            node_neighbor = self.nodes[i]
-
-            if self.compute_cost(node_neighbor) > self.get_new_cost(node_new, node_neighbor):
-                node_neighbor.parent = node_new
-
-    def get_new_cost(self, node_start, node_end):
-        dist, _ = self.get_distance_and_angle(node_start, node_end)
-        return self.compute_cost(node_start) + dist
+        self.path = self.extract_branch(node_end) + [self.world_map.goal]
+
+    def choose_parent(self, point_new, neighbors):
+        """
+        Returns the neighbor through which the new point is reached with the lowest cost
+        """
+        neighbors = np.array(neighbors)
+        offsets = self.tree.coordinates[neighbors] - (point_new.x, point_new.y)
+        cost = self.tree.costs[neighbors] + np.hypot(offsets[:, 0], offsets[:, 1])
+        return int(neighbors[np.argmin(cost)])
+
+    def rewire(self, node_new, neighbors):
+        neighbors = np.array(neighbors)
+        offsets = self.tree.coordinates[neighbors] - self.tree.coordinates[node_new]
+        new_costs = self.tree.costs[node_new] + np.hypot(offsets[:, 0], offsets[:, 1])
+
+        # Costs are checked again before rewiring, since rewiring a node lowers
+        # the cost of its descendants as well
+        improved = new_costs < self.tree.costs[neighbors]
+        for node_neighbor, new_cost in zip(neighbors[improved].tolist(), new_costs[improved].tolist()):
+            if new_cost < self.tree.costs[node_neighbor]:
+                self.set_parent(node_neighbor, node_new)
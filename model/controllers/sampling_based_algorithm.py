@@ -1,9 +1,13 @@
 from abc import abstractmethod
-import numpy as np
+import math
 from model.controllers.search_algorithm import SearchAlgorithm
+from model.controllers.nearest_neighbors import NearestNeighborIndex
+from model.controllers.sampler import Sampler, GoalBiased, Uniform
+from model.controllers.tree import Tree
+from model.geometry.intersection import check_intersection
+from model.geometry.polygon import Polygon
 from model.geometry.segment import Segment
 from model.geometry.point import Point
-from model.controllers.graph import Node
 
 
 class SamplingBased(SearchAlgorithm):
@@ -16,13 +20,24 @@ class SamplingBased(SearchAlgorithm):
                  max_iterations=5000,
                  dynamic=False,
                  goal_sample_rate=0.05,
+                 lazy_collision=False,
+                 sequence='uniform',  # Source of the samples: 'uniform', 'halton' or 'sobol'
+                 seed=None,  # Seed of the generator of the samples (None for a random one)
+                 sampling_strategy=None,  # Distribution of the samples (goal-biased uniform if None)
                  ):
 
-        self.nodes = []
-        self.edges = []
+        # Tree of the samples (struct of arrays, nodes are referenced by index)
+        self.tree = Tree()
+
+        # Spatial index of the nodes of the tree
+        self.nearest_neighbors = NearestNeighborIndex()
 
         self.goal_sample_rate = goal_sample_rate
 
+        # Random numbers of the planner and distribution of the points toward which the tree grows
+        self.sampler = Sampler(sequence, seed)
+        self.sampling_strategy = GoalBiased(Uniform()) if sampling_strategy is None else sampling_strategy
+
         super().__init__(
             world_map,
             start,
@@ -30,46 +45,196 @@ class SamplingBased(SearchAlgorithm):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=dynamic,
+            lazy_collision=lazy_collision
         )
 
-    @staticmethod
-    def get_distance_and_angle(node_start, node_end):
-        dx = node_end.point.x - node_start.point.x
-        dy = node_end.point.y - node_start.point.y
-        return node_start.point.distance(node_end.point), np.arctan2(dy, dx)
-
-    @staticmethod
-    def compute_cost(node):
-        n = node
-        cost = 0.0
-        while n.parent:
-            cost += n.point.distance(n.parent.point)
-            n = n.parent
-        return cost
+    def get_distance_and_angle(self, index, point):
+        """
+        Distance and direction from the node of the tree to the point
+        """
+        x, y = self.tree.coordinates[index].tolist()
+        dx = point.x - x
+        dy = point.y - y
+        return math.hypot(dx, dy), math.atan2(dy, dx)
+
+    def steer(self, index, point, step_length):
+        """
+        Point at most step_length away from the node of the tree, in the direction of the point
+        """
+        dist, theta = self.get_distance_and_angle(index, point)
+
+        dist = min(step_length, dist)
+        x, y = self.tree.coordinates[index].tolist()
+        return Point(x + dist * math.cos(theta), y + dist * math.sin(theta))
+
+    def compute_cost(self, index):
+        return float(self.tree.costs[index])
+
+    def get_point(self, index):
+        return self.tree.get_point(index)
+
+    def set_parent(self, index, parent):
+        """
+        Attach the node to a new parent, keeping the cost-to-come of the nodes up to date
+        (the cost difference is propagated to the whole subtree of the node)
+        """
+        self.tree.set_parent(index, parent)
+
+    def rewiring_radius(self, max_radius, n=None, area=None):
+        """
+        Radius of the neighborhood of a new node in RRT*: gamma * (log(n) / n)^(1/d), capped
+        to max_radius. gamma is the lower bound that keeps RRT* asymptotically optimal for
+        the area where the nodes are sampled (the map unless specified), so the expected
+        number of neighbors only grows as log(n). n defaults to the number of nodes of the
+        tree, new node included
+        """
+        if n is None:
+            n = len(self.tree) + 1
+        n = max(n, 2)
+        if area is None:
+            min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+            area = (max_x - min_x) * (max_y - min_y)
+        gamma = 2 * math.sqrt(1.5) * math.sqrt(area / math.pi)
+        return min(max_radius, gamma * math.sqrt(math.log(n) / n))
+
+    def get_obstacles_in_bounds(self, bounds):
+        """
+        Polygons of the obstacles intersecting the region (min_x, min_y, max_x, max_y)
+        """
+        return [self.world_map.get_obstacle(obstacle_id).polygon
+                for obstacle_id in self.world_map.query_bounds(bounds)]
+
+    def check_collision_with(self, polygons, start, end):
+        """
+        check_collision only against the specified obstacle polygons
+        """
+        if start == end or len(polygons) == 0:
+            return False
+
+        half_margin = self.margin / 2
+        buffer = Polygon.segment_buffer(Segment(start, end), left_margin=half_margin, right_margin=half_margin)
+        return any(check_intersection(buffer, polygon) for polygon in polygons)
+
+    def check_collisions(self, start, ends):
+        """
+        Batched check_collision from one point to many others. The map is queried once for
+        the region covering all the segments and each segment is only tested against the
+        obstacles found there. Returns a list of booleans (True if there is a collision)
+        """
+        if len(ends) == 0:
+            return []
+
+        polygons = self.get_obstacles_in_bounds((
+            min(start.x, min(end.x for end in ends)) - self.margin,
+            min(start.y, min(end.y for end in ends)) - self.margin,
+            max(start.x, max(end.x for end in ends)) + self.margin,
+            max(start.y, max(end.y for end in ends)) + self.margin
+        ))
+        return [self.check_collision_with(polygons, start, end) for end in ends]
+
+    @property
+    def draw_list(self):
+        """
+        Points and branches of the trees. The list is built from the arrays of the
+        trees only when it is read (once per frame), not at every iteration
+        """
+        if self.draw_list_outdated:
+            self.draw_list_outdated = False
+            self._draw_list = []
+            for tree in self.get_trees():
+                size = len(tree)
+                coordinates = tree.coordinates[:size].tolist()
+                valid = tree.valid[:size].tolist()
+
+                self._draw_list.extend(Point(x, y) for (x, y), is_valid in zip(coordinates, valid) if is_valid)
+                parents, children = tree.get_edges()
+                self._draw_list.extend(Segment(coordinates[parent], coordinates[child])
+                                       for parent, child in zip(parents.tolist(), children.tolist()))
+
+        return self._draw_list
+
+    @draw_list.setter
+    def draw_list(self, draw_list):
+        self._draw_list = draw_list
+        self.draw_list_outdated = False
 
     def update_draw_list(self):
-        # Overload the method to empty the draw_list first, getting rid of old segments.
-        self.draw_list = []
-        for node in self.nodes:
-            self.draw_list.append(node.point)
-            if node.parent is not None and node.parent.point is not None:
-                self.draw_list.append(Segment(node.parent.point, node.point))
+        self.draw_list_outdated = True
+
+    def get_trees(self):
+        """
+        Trees grown by the algorithm (drawn on screen)
+        """
+        return [self.tree]
 
     def generate_random_node(self):
-        if np.random.random() > self.goal_sample_rate:
-            x = np.random.uniform(self.world_map.map_boundaries[0], self.world_map.map_boundaries[2])
-            y = np.random.uniform(self.world_map.map_boundaries[1], self.world_map.map_boundaries[3])
-        else:
-            x, y = self.world_map.goal
+        """
+        Returns the point where the tree should grow to
+        """
+        return Point(*self.sampling_strategy.sample(self))
+
+    def distance_to_goal(self, index):
+        return self.tree.distance(index, self.world_map.goal)
+
+    def set_root(self, point):
+        """
+        Empty the tree and add its root. Returns the index of the root
+        """
+        self.tree.clear()
+        self.nearest_neighbors.clear()
+        return self.add_node(point)
+
+    def add_node(self, point, parent=-1):
+        """
+        Add a node in the point, child of the specified parent. Returns its index
+        """
+        index = self.tree.add(point, parent)
+        self.nearest_neighbors.add(index, point)
+        return index
+
+    def remove_invalid_nodes(self):
+        """
+        Remove the invalid nodes from the tree (their valid descendants become roots).
+        Returns the array mapping the old indices to the new ones (-1 for the removed nodes)
+        """
+        mapping = self.tree.compact()
+        size = len(self.tree)
+        self.nearest_neighbors.load(range(size), self.tree.coordinates[:size])
+        return mapping
+
+    def nearest_neighbor(self, point):
+        """
+        Returns the index of the node of the tree closest to the point
+        """
+        return self.nearest_neighbors.nearest(point)
+
+    def get_nodes_within(self, point, radius):
+        """
+        Returns the indices of the nodes of the tree whose distance from the point is not greater than the radius
+        """
+        return self.nearest_neighbors.within_radius(point, radius)
+
+    def extract_branch(self, index):
+        """
+        Points of the tree from the root to the node
+        """
+        return [self.tree.get_point(node) for node in self.tree.get_branch(index)]
 
-        return Node(Point(x, y))
+    def is_deterministic(self):
+        # The same samples are drawn only if the generator is seeded
+        return self.sampler.seed is not None
 
-    def distance_to_goal(self, node):
-        return node.point.distance(self.world_map.goal)
+    def parameters(self):
+        parameters = super().parameters()
+        parameters.update(sequence=self.sampler.sequence, seed=self.sampler.seed,
+                          sampling_strategy=repr(self.sampling_strategy))
+        return parameters
 
     def reset(self):
-        self.nodes = []
-        self.edges = []
+        self.tree.clear()
+        self.nearest_neighbors.clear()
+        self.sampler.reset()
+        self.sampling_strategy.reset()
         super().reset()
 
     @abstractmethod
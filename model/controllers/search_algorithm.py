@@ -1,6 +1,8 @@
+import inspect
 import random
 from abc import ABC, abstractmethod
 
+from model.controllers.result_cache import ResultCache
 from model.geometry.segment import Segment
 from model.geometry.polygon import Polygon
 
@@ -20,6 +22,12 @@ class SearchAlgorithm(ABC):
     sa.post_search()
     """
 
+    # Results of the searches shared by all the algorithms (None disables the cache)
+    result_cache = ResultCache()
+
+    # Entries of to_dict that describe the state of the search rather than the algorithm
+    STATE_KEYS = ('current_iteration', 'collision_checks', 'avoided_checks', 'cached_result')
+
     def __init__(self,
                  world_map,
                  start,
@@ -27,6 +35,7 @@ class SearchAlgorithm(ABC):
                  iterations_per_step=1,  # Iterations of the algorithm per step performed
                  max_iterations=5000,  # Maximum iterations available
                  dynamic=False,  # Dynamic algorithm
+                 lazy_collision=False,  # Check only the edges of candidate paths (see evaluate_path)
                  ):
 
         # Map
@@ -63,6 +72,23 @@ class SearchAlgorithm(ABC):
         self.current_iteration = 0
         self.max_iterations = max_iterations
 
+        # Lazy collision evaluation (Lazy PRM / LazySP): the search assumes that the edges it
+        # generates are free (lazy_edge) and only the edges of the candidate paths are checked
+        # (evaluate_path). If one of them collides the algorithm searches again without it.
+        # Edges assumed free and result of the checks performed ({edge: collision})
+        self.lazy_collision = lazy_collision
+        self.lazy_edges = set()
+        self.evaluated_edges = {}
+
+        # Version of the map the search data refers to (see retarget)
+        self.search_map_version = self.get_map_version()
+
+        # Key of the search in the result cache, whether the path was taken from there and whether
+        # the search reused the data of the previous one (its result is then not stored, see retarget)
+        self.result_key = None
+        self.cached_result = False
+        self.warm_started = False
+
         # Perform the pre-search steps
         self.pre_search()
 
@@ -93,12 +119,139 @@ class SearchAlgorithm(ABC):
         # Reset draw list
         self.draw_list = []
 
+        # Forget the edges evaluated lazily, the map might have changed
+        self.lazy_edges = set()
+        self.evaluated_edges = {}
+        self.search_map_version = self.get_map_version()
+
+        self.result_key = None
+        self.cached_result = False
+        self.warm_started = False
+
         # Perform pre search
         self.pre_search()
 
         # Reset available iterations
         self.current_iteration = 0
 
+    def get_map_version(self):
+        return self.world_map.version if self.world_map is not None else None
+
+    def retarget(self, start=None, goal=None):
+        """
+        Plan again after the start and/or the goal moved (the new goal has already been set
+        on the map), reusing the search data when the algorithm can (see warm_start) and
+        resetting it otherwise. Algorithms that don't handle map changes are always reset
+        if the map changed since the search started
+        """
+
+        start_moved = start is not None and start != self.start
+        goal_moved = goal is not None
+        if start is not None:
+            self.start = start
+
+        if not self.dynamic and self.get_map_version() != self.search_map_version:
+            self.reset()
+            return
+
+        # Start a new search loop, keeping the search data
+        self.enable_map_changes()
+        self.post_search_performed = False
+        self.path = []
+        self.current_iteration = 0
+        self.result_key = None
+        self.cached_result = False
+
+        # The result of a warm search depends on the previous one: the same search from
+        # scratch might find a different path, so it is not stored in the result cache
+        self.warm_started = True
+
+        if not self.warm_start(start_moved, goal_moved):
+            self.reset()
+
+    def warm_start(self, start_moved, goal_moved):
+        """
+        Adapt the search data to the new start and/or goal. Returns False if they can't
+        be reused (the algorithm is then reset), which is the default
+        """
+        return False
+
+    def is_deterministic(self):
+        """
+        True if the algorithm always finds the same path for the same map, start and goal
+        """
+        return True
+
+    def parameters(self):
+        """
+        Settings of the algorithm: the entries of to_dict that don't depend on the search and
+        the arguments of the constructor stored in attributes with the same name
+        """
+
+        parameters = {key: value for key, value in self.to_dict().items() if key not in self.STATE_KEYS}
+        for name in inspect.signature(type(self).__init__).parameters:
+            if name in ('self', 'world_map', 'start') or not hasattr(self, name):
+                continue
+            value = getattr(self, name)
+            if value is None or isinstance(value, (bool, int, float, str)):
+                parameters[name] = value
+        return parameters
+
+    def get_result_key(self):
+        """
+        Key of the search in the result cache: parameters of the algorithm, content of the map
+        and quantized start and goal. None if the result is not cached, that is for dynamic
+        algorithms (they keep searching after the path is found) and for the algorithms that
+        are not deterministic
+        """
+
+        if (self.result_cache is None or self.world_map is None or self.world_map.goal is None or
+                self.dynamic or not self.is_deterministic()):
+            return None
+
+        return (tuple(sorted(self.parameters().items())), self.world_map.fingerprint(),
+                self.result_cache.quantize(self.start), self.result_cache.quantize(self.world_map.goal))
+
+    def load_result(self):
+        """
+        Take the path (and the draw list) from the result cache if the same search has
+        already been performed. Returns True in that case
+        """
+
+        self.result_key = self.get_result_key()
+        result = self.result_cache.get(self.result_key) if self.result_key is not None else None
+        if result is None:
+            return False
+
+        start, goal, path, draw_list = result
+        self.path = list(path)
+
+        # The path should start and end exactly in start and goal, not just in the same cells
+        if len(self.path) > 0 and self.path[0] == start:
+            self.path[0] = self.start
+        if len(self.path) > 0 and self.path[-1] == goal:
+            self.path[-1] = self.world_map.goal
+
+        self.draw_list = list(draw_list)
+        self.cached_result = True
+        self.post_search_performed = True
+        return True
+
+    def store_result(self):
+        # The path must go from the start to the goal: the robot might have already consumed
+        # part of a path published before the end of the search
+        if (self.result_key is not None and self.result_cache is not None and not self.warm_started and
+                (len(self.path) == 0 or self.path[0] == self.start)):
+            self.result_cache.put(self.result_key, self.start, self.world_map.goal, self.path, self.draw_list)
+
+    def update_start(self, point):
+        """
+        Called by the controller each time the robot reaches a point of the path.
+        Incremental algorithms can use this to move their start point while the
+        robot advances and replan from there; the others have nothing to do
+        """
+        pass
+
     def smooth(self):
         """
         Used to smooth the path and eliminate unnecessary detours.
@@ -122,6 +275,45 @@ class SearchAlgorithm(ABC):
         intersecting_obstacles_ids = self.world_map.query_polygon(buffer)
         return len(intersecting_obstacles_ids) > 0
 
+    @staticmethod
+    def edge_key(start, end):
+        start, end = (start.x, start.y), (end.x, end.y)
+        return (start, end) if start <= end else (end, start)
+
+    def lazy_edge(self, start, end):
+        """
+        Lazy collision evaluation: the edge from start to end is assumed free and is not
+        checked now. Returns False if it is already known to collide (the search should
+        skip it), True otherwise
+        """
+        key = self.edge_key(start, end)
+        self.lazy_edges.add(key)
+        return not self.evaluated_edges.get(key, False)
+
+    def evaluate_path(self, path):
+        """
+        Lazy collision evaluation of a candidate path (list of points): its edges assumed
+        free with lazy_edge are checked from the start on, each one at most once (the
+        other edges have already been checked by the algorithm). Returns the position i
+        of the first edge (path[i], path[i + 1]) in collision, None if the path is free
+        """
+        for i in range(len(path) - 1):
+            key = self.edge_key(path[i], path[i + 1])
+            if key not in self.lazy_edges:
+                continue
+            if key not in self.evaluated_edges:
+                self.evaluated_edges[key] = self.check_collision(path[i], path[i + 1])
+            if self.evaluated_edges[key]:
+                return i
+        return None
+
+    @property
+    def avoided_checks(self):
+        """
+        Number of edges assumed free that never had to be checked
+        """
+        return len(self.lazy_edges) - len(self.evaluated_edges)
+
     def has_path(self):
         """
         Return True if the algorithm has found a path. A path is a list of points
@@ -143,7 +335,7 @@ class SearchAlgorithm(ABC):
         return self.current_iteration < self.max_iterations
 
     def has_terminated(self):
-        return not self.can_run()
+        return self.cached_result or not self.can_run()
 
     def pre_search(self):
         """
@@ -181,6 +373,12 @@ class SearchAlgorithm(ABC):
         if not self.dynamic and self.map_changes_enabled:
             self.disable_map_changes()
 
+            # The map can't change from now on: the same search might have been performed already
+            self.load_result()
+
+        if self.cached_result:
+            return
+
         for _ in range(self.iterations_per_step):
 
             # If the algorithm has not yet terminated (while search time/space remaining)
@@ -201,6 +399,7 @@ class SearchAlgorithm(ABC):
                     # Perform post search
                     self.post_search()
                     self.post_search_performed = True
+                    self.store_result()
 
                     # Disable map changes: when the path is done, we can't change the environment
                     self.disable_map_changes()
@@ -208,14 +407,23 @@ class SearchAlgorithm(ABC):
         # At this point we either have a path or an empty list
 
     def to_dict(self):
-        return {
+        data = {
             "class": self.__class__.__name__,
             "margin": self.margin,
             "current_iteration": self.current_iteration,
             "max_iterations": self.max_iterations,
-            "iterations_per_step": self.iterations_per_step
+            "iterations_per_step": self.iterations_per_step,
+            "lazy_collision": self.lazy_collision,
+            "cached_result": self.cached_result
         }
 
+        # Only the lazy evaluation keeps track of the edges it checks
+        if self.lazy_collision:
+            data["collision_checks"] = len(self.evaluated_edges)
+            data["avoided_checks"] = self.avoided_checks
+
+        return data
+
 
 class TestSearchAlgorithm(SearchAlgorithm):
     """
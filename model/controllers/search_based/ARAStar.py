@@ -0,0 +1,191 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class ARAStar(SearchBased):
+    """
+    Anytime Repairing A* (Likhachev, Gordon & Thrun). The search runs a sequence of
+    weighted A* searches with priority g + epsilon * h, starting from a large
+    epsilon and decreasing it after each search. Each search returns a path whose
+    cost is at most epsilon times the optimal one, so a first path is available
+    very early and the robot can start moving while the path gets better.
+
+    Searches reuse the previous one: the cost and parent of each node are kept,
+    and the nodes whose cost has been lowered after their expansion (inconsistent
+    nodes) are stored aside and moved back in the open set for the next search.
+
+    The search goes backwards from the goal to the start, so that each node knows
+    its path to the goal. Since the robot moves along the published path, each
+    search aims for the point the robot is heading to instead of the original
+    start, and the improved path is published from there.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2,
+                 initial_epsilon=2.5,
+                 epsilon_decrease=0.5,
+                 ):
+
+        self.initial_epsilon = initial_epsilon
+        self.epsilon_decrease = epsilon_decrease
+
+        # Current inflation factor of the heuristic
+        self.epsilon = initial_epsilon
+
+        # Suboptimality bound of the published path (None if there is no path yet)
+        self.path_epsilon = None
+
+        self.start_index = None
+        self.goal_index = None
+
+        # Cost-to-goal and parent (next node towards the goal) of each generated node
+        self.costs = {}
+        self.parents = {}
+
+        # Nodes whose cost changed after being expanded in the current search
+        self.inconsistent_set = set()
+
+        # True when no further improvement is possible
+        self.done = False
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        self.start_index = self.point_to_index(self.start)
+        self.goal_index = self.point_to_index(self.world_map.goal)
+
+        self.epsilon = self.initial_epsilon
+        self.path_epsilon = None
+        self.done = False
+
+        self.costs = {self.goal_index: 0}
+        self.parents = {self.goal_index: None}
+        self.edge_costs = {}
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.inconsistent_set = set()
+
+        self.open_set.push(self.goal_index, self.fvalue(self.goal_index))
+
+    def heuristic(self, index):
+        return self.octile_distance(index, self.start_index)
+
+    def fvalue(self, index):
+        return self.costs.get(index, float('inf')) + self.epsilon * self.heuristic(index)
+
+    def can_run(self):
+        return self.current_iteration < self.max_iterations and not self.done
+
+    def is_deterministic(self):
+        # Each search aims for the point the robot is heading to, so the result depends on how
+        # far the robot went along the published path (and the path misses the part it covered)
+        return False
+
+    def is_search_over(self):
+        """
+        The current search is over when no node in the open set can
+        improve the path to the start
+        """
+        return len(self.open_set) == 0 or self.fvalue(self.start_index) <= self.open_set.top_priority()
+
+    def step_search(self):
+
+        if self.is_search_over():
+
+            self.extract_path()
+
+            # The path is optimal or there is no path at all
+            if self.epsilon <= 1 or self.start_index not in self.costs:
+                self.done = True
+                return
+
+            self.start_next_search()
+            return
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        for neighbor in self.get_lattice_neighbors(current):
+            new_cost = self.costs[current] + self.edge_cost(current, neighbor)
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = current
+                if neighbor not in self.closed_set:
+                    self.open_set.push(neighbor, self.fvalue(neighbor))
+                else:
+                    self.inconsistent_set.add(neighbor)
+
+        # Update draw list
+        self.draw_list.append(self.get_view(self.index_to_point(current)))
+
+    def start_next_search(self):
+        """
+        Decrease epsilon and move the inconsistent nodes back in the open set
+        """
+
+        self.epsilon = max(1.0, self.epsilon - self.epsilon_decrease)
+
+        # Aim for the point the robot is heading to
+        if len(self.path) > 0:
+            self.start_index = self.point_to_index(self.path[0])
+
+        open_nodes = list(self.open_set) + list(self.inconsistent_set)
+        self.open_set.clear()
+        for index in open_nodes:
+            self.open_set.push(index, self.fvalue(index))
+
+        self.inconsistent_set = set()
+        self.closed_set = set()
+        self.draw_list = []
+
+    def extract_path(self):
+        """
+        Follow the parents to the goal, starting from the point the robot is
+        heading to (or from the start if we don't have a path yet). Nodes of the
+        previous path are never removed from the tree, so the robot does not
+        have to go back when the path improves
+        """
+
+        origin = self.path[0] if len(self.path) > 0 else self.start
+        index = self.point_to_index(origin)
+
+        # The robot is already heading to the goal
+        if index == self.goal_index and len(self.path) > 0:
+            return
+
+        if index not in self.costs:
+            origin, index = self.start, self.start_index
+            if index not in self.costs:
+                return
+
+        path = [origin]
+        current = self.parents[index]
+        while current is not None:
+            path.append(self.index_to_point(current))
+            current = self.parents[current]
+
+        # Change the point from the center of the cell that contains the goal to the goal itself
+        if len(path) > 1:
+            path[-1] = self.world_map.goal
+        else:
+            path.append(self.world_map.goal)
+
+        self.path = path
+        self.path_epsilon = self.epsilon
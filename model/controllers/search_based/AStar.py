@@ -14,9 +14,16 @@ class AStar(SearchBased):
                  margin=0.2, 
                  iterations_per_step=1,
                  max_iterations=5000,
-                 discretization_step=0.2
+                 discretization_step=0.2,
+                 lazy_collision=False
                  ):
-        
+
+        # With lazy collision evaluation, True once the edge leading to the goal node has been checked
+        self.path_evaluated = False
+
+        # Nodes already expanded ({point: node}), reused when the goal moves
+        self.expanded = {}
+
         super().__init__(
             world_map, 
             start, 
@@ -24,7 +31,8 @@ class AStar(SearchBased):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=False,
-            discretization_step=discretization_step
+            discretization_step=discretization_step,
+            lazy_collision=lazy_collision
         )
 
     def pre_search(self):
@@ -35,16 +43,58 @@ class AStar(SearchBased):
 
         self.open_set.put((start_node.cost + start_node.heuristic, start_node))  # Priority queue with f(n) as priority
 
+        self.expanded = {}
+        self.path_evaluated = False
+
+    def warm_start(self, start_moved, goal_moved):
+        """
+        The costs of the nodes only depend on the start: if just the goal moved, the open set
+        is sorted again with the new heuristic and the search goes on from there. The node of
+        the cell that contains the new goal is expanded again if it already was
+        """
+
+        if start_moved:
+            return False
+
+        nodes = [node for _, node in self.open_set.queue]
+        nodes += [node for node in self.expanded.values() if self.cell_contains(node.point, self.world_map.goal)]
+
+        self.open_set = PriorityQueue()
+        for node in nodes:
+            node.heuristic = self.heuristic(node.point)
+            self.open_set.put((node.cost + node.heuristic, node))
+
+        self.path_evaluated = False
+        return True
+
     def heuristic(self, point):
         return point.distance(self.world_map.goal)
 
     def can_run(self):
         # Termination condition is that the highest priority element (nearest to the goal) is the goal itself
-        return not self.open_set.empty() and not self.cell_contains(self.open_set.queue[0][1].point, self.world_map.goal)
+        # (with lazy collision evaluation, once the path to it has been checked)
+        if self.open_set.empty():
+            return False
+        if not self.cell_contains(self.open_set.queue[0][1].point, self.world_map.goal):
+            return True
+        return self.lazy_collision and not self.path_evaluated
 
     def step_search(self):
 
+        if self.lazy_collision:
+
+            # Drop the copies of nodes already expanded and the ones whose edge collides
+            while not self.evaluate_node(self.open_set.queue[0][1]):
+                self.open_set.get()
+                if self.open_set.empty():
+                    return
+
+            if self.cell_contains(self.open_set.queue[0][1].point, self.world_map.goal):
+                self.path_evaluated = True
+                return
+
         current_node = self.open_set.get()[1]
+        self.expanded[current_node.point] = current_node
 
         """
         if current_node.point == self.world_map.goal:
@@ -56,6 +106,16 @@ class AStar(SearchBased):
         # Expand the current node and add its neighbors to the frontier
         neighbors = self.get_neighbors(current_node.point)
         for neighbor in neighbors:
+
+            # With lazy collision evaluation a node is queued once for each of its
+            # parents (see evaluate_node), but it is drawn only the first time
+            drawn = False
+            if self.lazy_collision:
+                if neighbor in self.expanded:
+                    continue
+                drawn = neighbor in self.generated_neighbors
+                self.generated_neighbors.add(neighbor)
+
             new_cost = current_node.cost + current_node.point.distance(neighbor)
             new_heuristic = self.heuristic(neighbor)
             new_node = Node(neighbor, parent=current_node, cost=new_cost, heuristic=new_heuristic)
@@ -63,19 +123,35 @@ class AStar(SearchBased):
             self.open_set.put((priority, new_node))
 
             # Update draw list
-            self.draw_list.append(self.get_view(neighbor))
+            if not drawn:
+                self.draw_list.append(self.get_view(neighbor))
+
+    def evaluate_node(self, node):
+        """
+        Lazy collision evaluation (lazy weighted A*): the edge from the parent is only checked
+        when the node is about to be expanded, so each edge is checked at most once and no
+        search is thrown away. Returns False if the node should be dropped, that is if it
+        has already been expanded from another parent or if its edge collides
+        """
+
+        if self.expanded.get(node.point, node) is not node:
+            return False
+        return node.parent is None or self.evaluate_path([node.parent.point, node.point]) is None
 
     def post_search(self):
-        self.reconstruct_path(self.open_set.queue[0][1])
+        # The open set is empty if the goal can't be reached
+        if not self.open_set.empty():
+            self.reconstruct_path(self.open_set.queue[0][1])
 
     def reconstruct_path(self, goal_node):
         # Reconstruct the path by backtracking through the parent pointers
         self.path = []
         current_node = goal_node
 
-        # Change the point from the center of the cell that contains the goal to the goal itself
-        current_node.point = self.world_map.goal
-
         while current_node is not None:
             self.path.insert(0, current_node.point)
             current_node = current_node.parent
+
+        # Change the point from the center of the cell that contains the goal to the goal itself
+        # (the node is left as it is, the search might go on from it after a goal change)
+        self.path[-1] = self.world_map.goal
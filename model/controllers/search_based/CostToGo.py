@@ -0,0 +1,106 @@
+import weakref
+
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.cost_to_go_field import CostToGoField
+
+from model.geometry.point import Point
+
+
+class CostToGo(SearchBased):
+    """
+    Backward Dijkstra from the goal (CostToGoField). The search stops as soon as
+    the cost of the start cell is final and the path is read by steepest descent.
+    The field is shared by all the instances planning on the same map with the
+    same discretization step and margin, and it is only recomputed when the goal
+    or the map changes: resetting the planner from a new start (or planning
+    for another robot heading to the same goal) reuses the cells already settled
+    and often produces the path right away.
+    """
+
+    # Fields shared between instances ({world_map: {(discretization_step, margin): field}})
+    shared_fields = weakref.WeakKeyDictionary()
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=10,
+                 max_iterations=5000,
+                 discretization_step=0.2
+                 ):
+
+        self.field = None
+        self.start_index = None
+
+        # True when the start can't reach the goal
+        self.unreachable = False
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def get_field(self):
+        fields = self.shared_fields.setdefault(self.world_map, {})
+        key = (self.discretization_step, self.margin)
+        if key not in fields:
+            fields[key] = CostToGoField(self.world_map, self.discretization_step, self.margin)
+        return fields[key]
+
+    def pre_search(self):
+
+        self.field = self.get_field()
+        self.field.update()
+
+        self.start_index = self.point_to_index(self.start)
+        self.unreachable = False
+
+    def heuristic(self, point):
+        """
+        Cost-to-go of the cell containing the point, if already known
+        """
+        return self.field.cost(self.point_to_index(point))
+
+    def can_run(self):
+        return self.current_iteration < self.max_iterations and not self.has_path() and not self.unreachable
+
+    def step_search(self):
+
+        # Another instance sharing the field might have reset it
+        self.field.update()
+
+        if self.field.is_settled(self.start_index):
+            self.extract_path()
+            self.unreachable = not self.has_path()
+            return
+
+        if self.field.complete:
+            # The search is over and the start has not been reached
+            self.unreachable = True
+            return
+
+        # Update draw list
+        for index in self.field.expand(1):
+            self.draw_list.append(self.get_view(self.index_to_point(index)))
+
+    def extract_path(self):
+
+        indices = self.field.descend(self.start_index)
+        if indices is None:
+            return
+
+        path = [self.index_to_point(index) for index in indices]
+
+        # Use the actual start and goal instead of the centers of their cells
+        path[0] = self.start
+        if len(path) > 1:
+            path[-1] = self.world_map.goal
+        else:
+            path.append(self.world_map.goal)
+
+        self.path = path
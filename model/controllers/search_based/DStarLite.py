@@ -0,0 +1,291 @@
+import numpy as np
+
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class DStarLite(SearchBased):
+    """
+    D* Lite (Koenig & Likhachev). Like Dynamic A*, the search goes backwards from
+    the goal to the start, so that the cost-to-goal g of each cell stays valid
+    while the robot moves. Each cell also has a one-step lookahead value rhs;
+    a cell is inconsistent when g != rhs and only inconsistent cells are kept in
+    the priority queue. When the map journal reports a change, only the cells
+    at the endpoints of the affected edges are updated and the search repairs the
+    inconsistencies they introduce. As the robot advances, the start is moved and
+    the key modifier km keeps the priorities already in the queue valid without
+    reordering it.
+
+    Unlike the other algorithms, the path is published as soon as the start is
+    consistent and the robot moves while the algorithm keeps looking for changes.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=4,
+                 max_iterations=5000,
+                 discretization_step=0.2,
+                 ):
+
+        # Cost-to-goal and one-step lookahead values, one for each cell of the lattice
+        self.g = None
+        self.rhs = None
+
+        # Lattice indices of the first cell (used to index the arrays)
+        self.index_offset = None
+
+        self.start_index = None
+        self.goal_index = None
+
+        # Start index at the time of the last key modifier update
+        self.last_index = None
+
+        # Key modifier
+        self.km = 0
+
+        # Version of the map the costs refer to
+        self.map_version = world_map.version
+
+        # True when the path has to be (re)published
+        self.path_outdated = True
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=True,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        min_i, min_j, max_i, max_j = self.get_index_boundaries()
+        self.index_offset = (min_i, min_j)
+
+        self.g = np.full((max_i - min_i + 1, max_j - min_j + 1), np.inf)
+        self.rhs = np.full((max_i - min_i + 1, max_j - min_j + 1), np.inf)
+
+        self.start_index = self.clip_index(self.point_to_index(self.start))
+        self.goal_index = self.clip_index(self.point_to_index(self.world_map.goal))
+        self.last_index = self.start_index
+
+        self.km = 0
+        self.edge_costs = {}
+        self.map_version = self.world_map.version
+        self.path_outdated = True
+
+        # The open set contains the inconsistent cells
+        self.open_set = IndexedHeap()
+
+        self.set_rhs(self.goal_index, 0)
+        self.open_set.push(self.goal_index, self.calculate_key(self.goal_index))
+
+    def warm_start(self, start_moved, goal_moved):
+        # The search goes backward from the goal: a new start is handled as a move of the robot
+        self.update_start(self.start)
+        if goal_moved:
+            self.update_goal(self.world_map.goal)
+        self.path_outdated = True
+        return True
+
+    def clip_index(self, index):
+        min_i, min_j, max_i, max_j = self.get_index_boundaries()
+        return min(max(index[0], min_i), max_i), min(max(index[1], min_j), max_j)
+
+    def get_g(self, index):
+        return self.g[index[0] - self.index_offset[0], index[1] - self.index_offset[1]]
+
+    def set_g(self, index, value):
+        self.g[index[0] - self.index_offset[0], index[1] - self.index_offset[1]] = value
+
+    def get_rhs(self, index):
+        return self.rhs[index[0] - self.index_offset[0], index[1] - self.index_offset[1]]
+
+    def set_rhs(self, index, value):
+        self.rhs[index[0] - self.index_offset[0], index[1] - self.index_offset[1]] = value
+
+    def heuristic(self, index):
+        """
+        Distance between the start and the cell
+        """
+        return np.hypot(index[0] - self.start_index[0], index[1] - self.start_index[1]) * self.discretization_step
+
+    def calculate_key(self, index):
+        value = min(self.get_g(index), self.get_rhs(index))
+        return value + self.heuristic(index) + self.km, value
+
+    def update_vertex(self, index):
+
+        if index != self.goal_index:
+            self.set_rhs(index, min(
+                [self.edge_cost(index, neighbor) + self.get_g(neighbor) for neighbor in self.get_lattice_neighbors(index)]
+            ))
+
+        if index in self.open_set:
+            self.open_set.remove(index)
+
+        if self.get_g(index) != self.get_rhs(index):
+            self.open_set.push(index, self.calculate_key(index))
+
+    def is_consistent(self):
+        """
+        The path is valid when no inconsistent cell can lower the cost of the start. The
+        first components of the keys are compared with a tolerance: the heuristic and the
+        sums of move costs are computed differently, so cells on the same shortest path
+        can get first components that only differ by rounding, and the tie must be
+        broken by the second component
+        """
+
+        if len(self.open_set) == 0:
+            return True
+
+        if self.get_rhs(self.start_index) != self.get_g(self.start_index):
+            return False
+
+        top_k1, top_k2 = self.open_set.top_priority()
+        start_k1, start_k2 = self.calculate_key(self.start_index)
+        return top_k1 > start_k1 + 1e-9 or (top_k1 >= start_k1 - 1e-9 and top_k2 >= start_k2)
+
+    def compute_shortest_path_step(self):
+        """
+        Single iteration of the ComputeShortestPath loop of D* Lite
+        """
+
+        index, k_old = self.open_set.top()
+        k_new = self.calculate_key(index)
+
+        if k_old < k_new:
+            self.open_set.push(index, k_new)
+
+        elif self.get_g(index) > self.get_rhs(index):
+            self.set_g(index, self.get_rhs(index))
+            self.open_set.remove(index)
+            for neighbor in self.get_lattice_neighbors(index):
+                self.update_vertex(neighbor)
+
+            # Update draw list
+            self.draw_list.append(self.get_view(self.index_to_point(index)))
+
+        else:
+            self.set_g(index, np.inf)
+            for neighbor in self.get_lattice_neighbors(index) + [index]:
+                self.update_vertex(neighbor)
+
+    def process_map_changes(self):
+        """
+        Read the map journal and update the cells at the endpoints of the edges
+        crossing each added or removed obstacle
+        """
+
+        changes = self.world_map.changes_since(self.map_version)
+        self.map_version = self.world_map.version
+
+        # The journal can't tell what changed, the whole map should be considered
+        if changes is None:
+            changes_bounds = [self.world_map.map_boundaries]
+        else:
+            changes_bounds = [change.bounds for change in changes]
+
+        modified = set()
+        for bounds in changes_bounds:
+            for index_1, index_2 in self.get_edges_in_bounds(bounds):
+                self.edge_costs.pop((index_1, index_2), None)
+                modified.add(index_1)
+                modified.add(index_2)
+
+        for index in modified:
+            self.update_vertex(index)
+
+        self.path_outdated = True
+
+    def update_start(self, point):
+
+        index = self.clip_index(self.point_to_index(point))
+        if index == self.start_index:
+            return
+
+        # Update the key modifier as soon as the start moves, so that every key
+        # computed from now on is consistent with the ones already in the queue
+        self.start_index = index
+        self.km += np.hypot(self.last_index[0] - index[0], self.last_index[1] - index[1]) * self.discretization_step
+        self.last_index = index
+
+    def update_goal(self, point):
+        """
+        Make the cell containing the point the root of the search. It is like moving
+        the zero cost edge that links the goal to a virtual sink: the old goal and the
+        new one become inconsistent and the search repairs the costs as it does after a
+        change of the map (keys don't depend on the goal, so the queue stays valid)
+        """
+
+        index = self.clip_index(self.point_to_index(point))
+        if index == self.goal_index:
+            return
+
+        old_goal_index = self.goal_index
+        self.goal_index = index
+
+        self.set_rhs(index, 0)
+        self.update_vertex(index)
+        self.update_vertex(old_goal_index)
+
+    def extract_path(self):
+        """
+        Follow the cheapest neighbors from the start to the goal. The start
+        is not part of the path since the robot has already reached it
+        """
+
+        self.path = []
+
+        if self.get_g(self.start_index) == np.inf:
+            return
+
+        path = []
+        visited = {self.start_index}
+        current = self.start_index
+        while current != self.goal_index:
+            current = min(self.get_lattice_neighbors(current),
+                          key=lambda neighbor: self.edge_cost(current, neighbor) + self.get_g(neighbor))
+
+            # Ties between cells with the same cost could make us go back and forth
+            if current in visited or self.get_g(current) == np.inf:
+                return
+            visited.add(current)
+            path.append(self.index_to_point(current))
+
+        # Change the point from the center of the cell that contains the goal to the goal itself
+        if len(path) > 0:
+            path[-1] = self.world_map.goal
+        else:
+            path.append(self.world_map.goal)
+
+        self.path = path
+
+    def can_run(self):
+        # The algorithm keeps looking for changes until the robot reaches the goal
+        return self.current_iteration < self.max_iterations and self.start_index != self.goal_index
+
+    def step_search(self):
+
+        # Changes occurred (the map has a different version)
+        if self.map_version != self.world_map.version:
+            self.process_map_changes()
+
+        if not self.is_consistent():
+            self.compute_shortest_path_step()
+
+        elif self.path_outdated:
+            self.extract_path()
+            self.path_outdated = False
+
+            # Keep only the cells that are still inconsistent
+            self.update_draw_list()
+
+    def update_draw_list(self):
+        self.draw_list = [self.get_view(self.index_to_point(index)) for index in self.open_set]
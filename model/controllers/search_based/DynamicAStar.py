@@ -18,8 +18,7 @@ class State(Enum):
 class Step(Enum):
     PLANNING = 0
     REPLANNING = 1
-    UPDATING_COST = 2
-    DONE = 3
+    DONE = 2
 
 
 class Node:
@@ -78,12 +77,9 @@ class DynamicAStar(SearchBased):
         self.goal_node = None
 
         # Enum used to know if we need a path (planning), if we had a path and
-        # we need to modify it (replanning) or if we need to update the costs
+        # we need to repair it (replanning) or if we are done
         self.algorithm_step = None
 
-        self.replanning_current_node = None  # This will come in handy later ;)
-        self.cost_updated = False  # This too ;)
-
         # Whenever we have a path and self.has_path() returns True, the robot
         # will start moving towards the goal. We want instead the robot to move
         # only when the iterations are expired so we can add obstacles to the map.
@@ -91,9 +87,9 @@ class DynamicAStar(SearchBased):
         # from the temp path to the real one only once the iterations are expired.
         self.temp_path = None
 
-        # Number of obstacles. This will be used to check if something has
-        # changed and we need to trim the tree/update the path
-        self.num_obstacles = len(world_map.obstacles)
+        # Version of the map the costs refer to. This will be used to query the
+        # map journal for the obstacles that have been added or removed since
+        self.map_version = world_map.version
 
         # We already have open and visited sets (open_set, closed_set respectively)
         # in the interface. The open set contains nodes that are candidates for
@@ -135,39 +131,68 @@ class DynamicAStar(SearchBased):
     def get_from_grid(self, point):
         return self.grid[(point.x, point.y)]
 
+    def get_nearest_node(self, point):
+        """
+        Approximate the point to the nearest cell
+        """
+        nearest_x = round(round(point.x / self.discretization_step) * self.discretization_step, 2)
+        nearest_y = round(round(point.y / self.discretization_step) * self.discretization_step, 2)
+        return self.get_from_grid(Point(nearest_x, nearest_y))
+
     def pre_search(self):
 
+        self.initialize_grid()
+        self.start_node = self.get_nearest_node(self.start)
+        self.seed()
+
+    def seed(self):
+        """
+        Forget the costs of all the nodes and start the wavefront from the node of the goal
+        """
+
+        for node in self.grid.values():
+            node.state = State.NEW
+            node.k = 0.0
+            node.h = float('inf')
+            node.parent = None
+
         # Initialize the sets
         self.open_set = set()
         self.closed_set = set()
 
         self.algorithm_step = Step.PLANNING
 
-        self.replanning_current_node = None
-        self.cost_updated = False
-
-        # Number of obstacles. This will be used to check if something has
-        # changed and we need to trim the tree/update the path
-        self.num_obstacles = len(self.world_map.obstacles)
+        # Costs are computed on the current version of the map
+        self.map_version = self.world_map.version
 
         self.temp_path = []
 
-        self.initialize_grid()
-        self.start_node = self.get_from_grid(self.start)
-
-        # Approximate the goal node to the nearest cell
-        goal = self.world_map.goal
-        nearest_x = round(round(goal.x / self.discretization_step) * self.discretization_step, 2)
-        nearest_y = round(round(goal.y / self.discretization_step) * self.discretization_step, 2)
-        goal_nearest_point = Point(nearest_x, nearest_y)
-
         # Set goal node's h value to 0
-        self.goal_node = self.get_from_grid(goal_nearest_point)
+        self.goal_node = self.get_nearest_node(self.world_map.goal)
         self.goal_node.h = 0
 
         # Insert goal node into open set
         self.insert(self.goal_node, 0)
 
+    def warm_start(self, start_moved, goal_moved):
+        """
+        The search goes backward from the goal: while the goal stays in the same cell, the
+        costs to the goal are still valid and the path is extracted from the node of the
+        new start as soon as it is closed. If the goal moved to another cell, the wavefront
+        is started again from it on the same grid
+        """
+
+        if goal_moved and self.get_nearest_node(self.world_map.goal) is not self.goal_node:
+            self.seed()
+
+        self.start_node = self.get_nearest_node(self.start)
+        if self.start_node.state == State.CLOSED:
+            self.extract_path()
+            self.algorithm_step = Step.DONE
+        else:
+            self.algorithm_step = Step.PLANNING
+        return True
+
     def delete(self, node):
         """
         Remove a node from the open set
@@ -227,6 +252,10 @@ class DynamicAStar(SearchBased):
         # Reset the path
         self.temp_path = []
 
+        # The goal is not reachable from the start
+        if self.start_node.h == float('inf'):
+            return
+
         current_point = self.start_node
         while current_point is not None:
             self.temp_path.append(current_point.point)
@@ -244,18 +273,56 @@ class DynamicAStar(SearchBased):
                 if not (i == 0 and j == 0):
                     x = round(node.point.x + i * self.discretization_step, 2)
                     y = round(node.point.y + j * self.discretization_step, 2)
-                    if (self.world_map.map_boundaries[0] <= x < self.world_map.map_boundaries[2] and
-                            self.world_map.map_boundaries[1] <= y < self.world_map.map_boundaries[3]):
+                    if self.is_inside_boundaries(x, y):
                         neighbor_node = self.grid[(x, y)]
                         if not self.check_collision(node.point, neighbor_node.point):
                             neighbors.add(neighbor_node)
         return neighbors
 
-    def is_temp_path_invalid(self):
-        for i in range(1, len(self.temp_path)):
-            if self.check_collision(self.temp_path[i - 1], self.temp_path[i]):
-                return True
-        return False
+    def is_inside_boundaries(self, x, y):
+        return (self.world_map.map_boundaries[0] <= x < self.world_map.map_boundaries[2] and
+                self.world_map.map_boundaries[1] <= y < self.world_map.map_boundaries[3])
+
+    def get_modified_nodes(self, bounds):
+        """
+        Returns the nodes at the endpoints of the grid edges whose cost might have
+        changed due to an obstacle with the specified bounds being added or removed
+        (see SearchBased.get_edges_in_bounds)
+        """
+
+        nodes = set()
+        for edge in self.get_edges_in_bounds(bounds):
+            for index in edge:
+                point = self.index_to_point(index)
+                x, y = round(point.x, 2), round(point.y, 2)
+                if self.is_inside_boundaries(x, y):
+                    nodes.add(self.grid[(x, y)])
+
+        return nodes
+
+    def process_map_changes(self):
+        """
+        Read the map journal and mark the nodes around each added or removed
+        obstacle as modified. Returns True if some costs need to be updated
+        """
+
+        changes = self.world_map.changes_since(self.map_version)
+        self.map_version = self.world_map.version
+
+        # The journal can't tell what changed, the whole map should be considered
+        if changes is None:
+            changes_bounds = [self.world_map.map_boundaries]
+        else:
+            changes_bounds = [change.bounds for change in changes]
+
+        modified_nodes = set()
+        for bounds in changes_bounds:
+            modified_nodes |= self.get_modified_nodes(bounds)
+
+        for node in modified_nodes:
+            self.modify_cost(node)
+
+        return len(self.open_set) > 0
 
     def step_search(self):
         """
@@ -276,58 +343,28 @@ class DynamicAStar(SearchBased):
                 # We don't need to further search for the path
                 self.algorithm_step = Step.DONE
 
-        # We have the path, we start checking for wmap updates
+        # We have the path, we start checking for map updates
         elif self.algorithm_step == Step.DONE:
 
             self.world_map.enable()  # Ensure map changes are enabled
 
-            # Changes occurred (different number of obstacles)
-            if self.num_obstacles != len(self.world_map.obstacles):
+            # Changes occurred (the map has a different version)
+            if self.map_version != self.world_map.version:
 
-                # Update the number of obstacles in the map
-                self.num_obstacles = len(self.world_map.obstacles)
-
-                # Check if the path is invalid
-                if self.is_temp_path_invalid():
+                # Only the edges crossing the added/removed obstacles are affected
+                if self.process_map_changes():
                     self.algorithm_step = Step.REPLANNING
-                    self.closed_set = set()
-                    self.temp_path = []
 
         elif self.algorithm_step == Step.REPLANNING:
-            """
-            s = self.start_node
-            while s != self.goal_node:
-                if self.check_collision(s.point, s.parent.point):
-                    self.modify(s)
-                    continue
-                s = s.parent
-    
-            self.extract_path()
-            """
 
             self.world_map.disable()
 
-            if self.replanning_current_node is None:
-                self.replanning_current_node = self.start_node
-
-            elif self.replanning_current_node != self.goal_node:
-                if self.check_collision(self.replanning_current_node.point, self.replanning_current_node.parent.point):
-                    self.modify_cost(self.replanning_current_node)
-                    self.algorithm_step = Step.UPDATING_COST
-                else:
-                    self.replanning_current_node = self.replanning_current_node.parent
-
-            elif self.replanning_current_node == self.goal_node:
+            # Propagate the cost changes until the start node is consistent again
+            k_min = self.planning() if self.open_set else -1
+            if k_min == -1 or k_min >= self.start_node.h:
                 self.extract_path()
-                self.replanning_current_node = None
                 self.algorithm_step = Step.DONE
 
-        elif self.algorithm_step == Step.UPDATING_COST:
-
-            k_min = self.planning()
-            if k_min >= self.replanning_current_node.h:
-                self.algorithm_step = Step.REPLANNING
-
         # Update drawing list
         self.update_draw_list()
 
@@ -392,17 +429,6 @@ class DynamicAStar(SearchBased):
 
         return self.get_k_min()
 
-    def replanning(self):
-
-        s = self.start_node
-        while s != self.goal_node:
-            if self.check_collision(s.point, s.parent.point):
-                self.modify(s)
-                continue
-            s = s.parent
-
-        self.extract_path()
-
     def modify(self, node):
         """
         Start processing from the node
@@ -417,12 +443,17 @@ class DynamicAStar(SearchBased):
 
     def modify_cost(self, s):
         """
-        If the node is in the closed set, put it into open set.
-        Since cost may be changed between s - s.parent, calc cost(s, s.p) again
+        If the node has already been visited, put it (back) into the open set.
+        Since cost may be changed between s - s.parent, calc cost(s, s.p) again;
+        the node will then propagate both cost increases and decreases to its
+        neighbors when processed
         """
 
-        if s.state == State.CLOSED:
-            self.insert(s, s.parent.h + self.cost(s, s.parent))
+        if s.state != State.NEW:
+            if s.parent is None:
+                self.insert(s, s.h)
+            else:
+                self.insert(s, s.parent.h + self.cost(s, s.parent))
 
     def update_draw_list(self):
         # Overload the method to empty the draw_list first, getting rid of old segments.
@@ -0,0 +1,196 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.cluster_graph import ClusterGraph
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class HPAStar(SearchBased):
+    """
+    Hierarchical Path-Finding A* (Botea, Müller & Schaeffer). The lattice is divided
+    into clusters connected through a few entrance cells along their borders and
+    the paths between the entrances of each cluster are precomputed (ClusterGraph).
+    To plan, the start and the goal are connected to the entrances of their
+    clusters and A* runs on the resulting abstract graph, which has a few nodes per
+    cluster instead of one per cell. The abstract path is then refined by joining
+    the cached lattice paths of its edges and shortened with straight lines.
+
+    The abstract graph only depends on the map, so it is kept across resets and,
+    when obstacles are added or removed, only the clusters they touch are updated:
+    moving the goal only costs the connection of start and goal and a search on
+    the small abstract graph.
+
+    Going through the entrances makes the refined path zigzag: on cluttered maps it
+    can be almost half again as long as the optimal lattice path. The shortcut pass
+    (shortcut_path) replaces each stretch that can be covered by a straight line
+    with the line (checked with check_collision), which removes most of the detour.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2,
+                 cluster_size=10
+                 ):
+
+        self.cluster_size = cluster_size
+        self.cluster_graph = None
+
+        self.start_index = None
+        self.goal_index = None
+
+        # Edges connecting the start to the nodes of its cluster and the nodes
+        # of the goal cluster to the goal ({index: (cost, path)})
+        self.start_edges = {}
+        self.goal_edges = {}
+
+        # Cost-to-come and parent (previous node and lattice path from it) of each generated node
+        self.costs = {}
+        self.parents = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        # The abstract graph does not depend on start and goal: keep it and update the changed clusters
+        if self.cluster_graph is None or self.cluster_graph.world_map is not self.world_map:
+            self.cluster_graph = ClusterGraph(self.world_map, self.discretization_step, self.margin, self.cluster_size)
+        else:
+            self.cluster_graph.update()
+
+        self.start_index = self.point_to_index(self.start)
+        self.goal_index = self.point_to_index(self.world_map.goal)
+
+        self.connect_start_and_goal()
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.costs = {self.start_index: 0}
+        self.parents = {self.start_index: None}
+
+        self.open_set.push(self.start_index, self.heuristic(self.start_index))
+
+    def connect_start_and_goal(self):
+        """
+        Connect start and goal to the abstract nodes of their clusters
+        (and to each other, if they are in the same cluster)
+        """
+
+        graph = self.cluster_graph
+        start_cluster = graph.get_cluster(self.start_index)
+        goal_cluster = graph.get_cluster(self.goal_index)
+
+        targets = set(graph.cluster_nodes.get(start_cluster, set()))
+        if start_cluster == goal_cluster:
+            targets.add(self.goal_index)
+        self.start_edges = graph.search_cluster(self.start_index, targets)
+
+        # Moves are symmetric: search from the goal and reverse the paths
+        self.goal_edges = {
+            index: (cost, path[::-1])
+            for index, (cost, path) in graph.search_cluster(self.goal_index, graph.cluster_nodes.get(goal_cluster, set())).items()
+        }
+
+    def heuristic(self, index):
+        return self.octile_distance(index, self.goal_index)
+
+    def get_abstract_edges(self, index):
+        """
+        Edges leaving a node of the abstract graph extended with start and goal.
+        Returns a list of (index, cost, path)
+        """
+
+        edges = []
+
+        if index == self.start_index:
+            edges.extend((other, cost, path) for other, (cost, path) in self.start_edges.items())
+
+        if index in self.cluster_graph.transitions:
+            edges.extend(self.cluster_graph.get_edges(index))
+
+        if index in self.goal_edges:
+            cost, path = self.goal_edges[index]
+            edges.append((self.goal_index, cost, path))
+
+        return [edge for edge in edges if edge[0] != index]
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path()
+
+    def step_search(self):
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        # Update draw list (abstract nodes only)
+        self.draw_list.append(self.get_view(self.index_to_point(current)))
+
+        if current == self.goal_index:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path()
+            return
+
+        for neighbor, cost, path in self.get_abstract_edges(current):
+            if neighbor in self.closed_set:
+                continue
+
+            new_cost = self.costs[current] + cost
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = (current, path)
+                self.open_set.push(neighbor, new_cost + self.heuristic(neighbor))
+
+    def reconstruct_path(self):
+        """
+        Refine the abstract path by joining the lattice paths of its edges
+        """
+
+        segments = []
+        current = self.goal_index
+        while self.parents[current] is not None:
+            current, path = self.parents[current]
+            segments.append(path)
+
+        indices = [self.start_index]
+        for path in segments[::-1]:
+            indices.extend(path[1:])
+
+        path = [self.index_to_point(index) for index in indices]
+
+        # Use the actual start and goal instead of the centers of their cells
+        path[0] = self.start
+        if len(path) > 1:
+            path[-1] = self.world_map.goal
+        else:
+            path.append(self.world_map.goal)
+
+        self.path = self.shortcut_path(path)
+
+    def shortcut_path(self, path):
+        """
+        From each point of the path go straight to the farthest of the following points
+        that can be reached without collisions, checking them in order (the edges
+        of the path itself are free, so each point can at least reach the next one)
+        """
+
+        shortcut = [path[0]]
+        current = 0
+        while current < len(path) - 1:
+            following = current + 1
+            while following + 1 < len(path) and not self.check_collision(path[current], path[following + 1]):
+                following += 1
+            shortcut.append(path[following])
+            current = following
+
+        return shortcut
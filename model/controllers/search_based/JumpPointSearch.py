@@ -0,0 +1,233 @@
+from queue import PriorityQueue
+
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.lattice_graph import LatticeGraph
+from model.controllers.graph import Node
+
+from model.geometry.point import Point
+
+
+class JumpPointSearch(SearchBased):
+    """
+    Jump Point Search (Harabor & Grastien) is A* on a uniform-cost 8-connected
+    grid where the neighbors of a node are pruned according to the direction we
+    came from: only the cells that can't be reached optimally without passing
+    through the current one (natural and forced neighbors) are considered.
+    Instead of adding them to the open set, we then jump along their direction
+    until we find a cell with forced neighbors (a jump point) or the goal.
+    Only jump points are added to the open set, so the number of expansions is
+    much smaller than A* while the paths have the same cost.
+
+    The search works on the edges of the lattice (LatticeGraph), which are blocked
+    by the obstacles exactly as the edges of A* are (see SearchBased.edge_cost).
+    Since an obstacle might block some edges of a cell and not others, the pruning
+    rules are applied to the edges: a neighbor is pruned if it can be reached from
+    the previous cell, without passing through the current one, with a path of free
+    edges that is not longer (shorter, after a diagonal move) than the one through
+    the current cell. The cells between two jump points are connected by free edges
+    along a straight line, so the path can be made of jump points only.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2
+                 ):
+
+        self.lattice_graph = None
+
+        self.start_index = None
+        self.goal_index = None
+
+        # Cost of the best path found so far to each jump point
+        self.costs = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        # The edges do not depend on start and goal: keep the ones already evaluated
+        if self.lattice_graph is None or self.lattice_graph.world_map is not self.world_map:
+            self.lattice_graph = LatticeGraph(self.world_map, self.discretization_step, self.margin)
+        else:
+            self.lattice_graph.update()
+
+        self.start_index = self.point_to_index(self.start)
+        self.goal_index = self.point_to_index(self.world_map.goal)
+
+        self.open_set = PriorityQueue()
+        self.closed_set = set()
+        self.costs = {self.start_index: 0}
+
+        start_node = Node(self.start_index, cost=0, heuristic=self.heuristic(self.start_index))
+        self.open_set.put((start_node.cost + start_node.heuristic, start_node))
+
+    def heuristic(self, index):
+        return self.octile_distance(index, self.goal_index)
+
+    def is_free(self, index_1, index_2):
+        return self.lattice_graph.is_edge_free(index_1, index_2)
+
+    def can_run(self):
+        return not self.open_set.empty() and not self.has_path()
+
+    def step_search(self):
+
+        _, current_node = self.open_set.get()
+
+        # Outdated entry, the jump point has already been expanded with a lower cost
+        if current_node.point in self.closed_set:
+            return
+        self.closed_set.add(current_node.point)
+
+        if current_node.point == self.goal_index:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path(current_node)
+            return
+
+        for neighbor in self.get_pruned_neighbors(current_node):
+
+            jump_point = self.jump(neighbor, current_node.point)
+            if jump_point is None or jump_point in self.closed_set:
+                continue
+
+            new_cost = current_node.cost + self.octile_distance(current_node.point, jump_point)
+            if new_cost < self.costs.get(jump_point, float('inf')):
+                self.costs[jump_point] = new_cost
+                new_node = Node(jump_point, parent=current_node, cost=new_cost, heuristic=self.heuristic(jump_point))
+                self.open_set.put((new_node.cost + new_node.heuristic, new_node))
+
+                # Update draw list (jump points only)
+                self.draw_list.append(self.get_view(self.index_to_point(jump_point)))
+
+    @staticmethod
+    def direction(index, parent_index):
+        di = index[0] - parent_index[0]
+        dj = index[1] - parent_index[1]
+        return (di > 0) - (di < 0), (dj > 0) - (dj < 0)
+
+    @staticmethod
+    def adjacent_cells(index):
+        i, j = index
+        return [(i + di, j + dj) for di in range(-1, 2) for dj in range(-1, 2) if not (di == 0 and dj == 0)]
+
+    @staticmethod
+    def move_length(index_1, index_2):
+        return 2 ** 0.5 if index_1[0] != index_2[0] and index_1[1] != index_2[1] else 1
+
+    def is_pruned(self, previous, index, neighbor):
+        """
+        True if the neighbor of the cell can be reached from the previous cell, without
+        passing through the cell, with a path that is not longer (shorter if the move from
+        the previous cell is diagonal) than the one through the cell
+        """
+
+        if neighbor == previous:
+            return True
+
+        through = self.move_length(previous, index) + self.move_length(index, neighbor)
+        alternative = float('inf')
+
+        if max(abs(neighbor[0] - previous[0]), abs(neighbor[1] - previous[1])) == 1:
+            if self.is_free(previous, neighbor):
+                alternative = self.move_length(previous, neighbor)
+
+        for middle in self.adjacent_cells(index):
+            if (middle == previous or middle == neighbor or
+                    max(abs(middle[0] - previous[0]), abs(middle[1] - previous[1])) != 1 or
+                    max(abs(middle[0] - neighbor[0]), abs(middle[1] - neighbor[1])) != 1):
+                continue
+            if self.is_free(previous, middle) and self.is_free(middle, neighbor):
+                alternative = min(alternative, self.move_length(previous, middle) + self.move_length(middle, neighbor))
+
+        if previous[0] != index[0] and previous[1] != index[1]:
+            return alternative < through - 1e-9
+        return alternative <= through + 1e-9
+
+    @staticmethod
+    def natural_neighbors(index, di, dj):
+        i, j = index
+        if di != 0 and dj != 0:
+            return [(i + di, j + dj), (i + di, j), (i, j + dj)]
+        return [(i + di, j + dj)]
+
+    def get_pruned_neighbors(self, node):
+        """
+        Neighbors of the node, connected to it by a free edge, that are not pruned given
+        the direction we came from (natural and forced neighbors)
+        """
+
+        neighbors = [neighbor for neighbor in self.adjacent_cells(node.point) if self.is_free(node.point, neighbor)]
+
+        # Start node: all the neighbors we can move to
+        if node.parent is None:
+            return neighbors
+
+        di, dj = self.direction(node.point, node.parent.point)
+        previous = (node.point[0] - di, node.point[1] - dj)
+        return [neighbor for neighbor in neighbors if not self.is_pruned(previous, node.point, neighbor)]
+
+    def has_forced_neighbors(self, index, di, dj):
+        """
+        True if a neighbor of the cell, reached moving in the direction (di, dj), other
+        than the natural ones is not pruned
+        """
+
+        previous = (index[0] - di, index[1] - dj)
+        natural = self.natural_neighbors(index, di, dj)
+        return any(neighbor not in natural and self.is_free(index, neighbor) and
+                   not self.is_pruned(previous, index, neighbor)
+                   for neighbor in self.adjacent_cells(index))
+
+    def jump(self, index, parent_index):
+        """
+        Move from the parent towards the index until we find a jump point (returned)
+        or a blocked edge (None is returned). The edge from the parent to the index is free
+        """
+
+        di, dj = self.direction(index, parent_index)
+        i, j = index
+
+        while True:
+            if (i, j) == self.goal_index or self.has_forced_neighbors((i, j), di, dj):
+                return i, j
+
+            # When moving diagonally, we must check for horizontal/vertical jump points
+            if di != 0 and dj != 0:
+                if ((self.is_free((i, j), (i + di, j)) and self.jump((i + di, j), (i, j)) is not None) or
+                        (self.is_free((i, j), (i, j + dj)) and self.jump((i, j + dj), (i, j)) is not None)):
+                    return i, j
+
+            if not self.is_free((i, j), (i + di, j + dj)):
+                return None
+
+            i, j = i + di, j + dj
+
+    def reconstruct_path(self, goal_node):
+        """
+        Reconstruct the path by backtracking through the parent pointers. Consecutive
+        jump points are connected by straight or diagonal lines, so we don't need
+        the cells in between
+        """
+
+        path = [self.world_map.goal]
+        current_node = goal_node.parent
+
+        # The start node is replaced by the actual start of the robot
+        while current_node is not None and current_node.parent is not None:
+            path.append(self.index_to_point(current_node.point))
+            current_node = current_node.parent
+        path.append(self.start)
+
+        self.path = path[::-1]
@@ -0,0 +1,158 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.point import Point
+
+
+class LazyThetaStar(SearchBased):
+    """
+    Lazy Theta* (Nash, Koenig & Tovey) is an any-angle variant of A*: the parent
+    of a node is not required to be one of its neighbors on the lattice, so the
+    path is made of straight segments between the few points where it needs to
+    turn instead of a staircase of cells.
+
+    When a neighbor is generated we optimistically assume it is visible from the
+    parent of the current node and we link it directly to it. The line of sight
+    (the collision check between the two points) is only verified when the node
+    is expanded; if it is blocked, the node falls back to the best of its already
+    expanded neighbors. This way we perform one line of sight check per expanded
+    node instead of one for each generated neighbor.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2
+                 ):
+
+        self.start_index = None
+        self.goal_index = None
+
+        # Cost-to-come and parent of each generated node
+        self.costs = {}
+        self.parents = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        self.start_index = self.point_to_index(self.start)
+        self.goal_index = self.point_to_index(self.world_map.goal)
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+
+        self.costs = {self.start_index: 0}
+        self.parents = {self.start_index: None}
+
+        self.open_set.push(self.start_index, self.heuristic(self.start_index))
+
+    def get_point(self, index):
+        """
+        Point corresponding to the node. The start node is the actual start of
+        the robot, which is not necessarily the center of its cell
+        """
+        if index == self.start_index:
+            return self.start
+        return self.index_to_point(index)
+
+    def heuristic(self, index):
+        return self.get_point(index).distance(self.world_map.goal)
+
+    def distance(self, index_1, index_2):
+        return self.get_point(index_1).distance(self.get_point(index_2))
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path()
+
+    def set_vertex(self, index):
+        """
+        Verify the line of sight between the node and its parent. If it is blocked,
+        link the node to the expanded neighbor that gives the lowest cost among the
+        ones it can actually reach. Returns False if there is no such neighbor
+        """
+
+        parent = self.parents[index]
+        if parent is None or not self.check_collision(self.get_point(parent), self.get_point(index)):
+            return True
+
+        candidates = sorted(
+            [neighbor for neighbor in self.get_lattice_neighbors(index) if neighbor in self.closed_set],
+            key=lambda neighbor: self.costs[neighbor] + self.distance(neighbor, index)
+        )
+
+        # Check the candidates lazily, from the most promising one
+        for neighbor in candidates:
+            if not self.check_collision(self.get_point(neighbor), self.get_point(index)):
+                self.parents[index] = neighbor
+                self.costs[index] = self.costs[neighbor] + self.distance(neighbor, index)
+                return True
+
+        return False
+
+    def step_search(self):
+
+        current, _ = self.open_set.pop()
+
+        # The node is not reachable through any of the expanded nodes
+        if not self.set_vertex(current):
+            del self.costs[current]
+            del self.parents[current]
+            return
+
+        self.closed_set.add(current)
+
+        # Update draw list
+        self.draw_list.append(self.get_view(self.get_point(current)))
+
+        if current == self.goal_index:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path(current)
+            return
+
+        # Path 2 of Theta*: assume the neighbors are visible from the parent of the current node
+        parent = self.parents[current]
+        source = current if parent is None else parent
+
+        for neighbor in self.get_lattice_neighbors(current):
+            if neighbor in self.closed_set:
+                continue
+
+            new_cost = self.costs[source] + self.distance(source, neighbor)
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = source
+                self.open_set.push(neighbor, new_cost + self.heuristic(neighbor))
+
+    def reconstruct_path(self, goal_index):
+        """
+        Reconstruct the path by backtracking through the parent pointers
+        """
+
+        path = []
+        current = goal_index
+        while current is not None:
+            path.append(self.get_point(current))
+            current = self.parents[current]
+        path = path[::-1]
+
+        # Change the point from the center of the cell that contains the goal to
+        # the goal itself, if the goal is visible from the previous point
+        if path[-1] != self.world_map.goal:
+            if len(path) > 1 and not self.check_collision(path[-2], self.world_map.goal):
+                path[-1] = self.world_map.goal
+            else:
+                path.append(self.world_map.goal)
+
+        self.path = path
@@ -0,0 +1,212 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.free_space_quadtree import FreeSpaceQuadTree
+from model.controllers.indexed_heap import IndexedHeap
+from model.controllers.lattice_graph import LatticeGraph
+
+from model.geometry.point import Point
+
+
+class QuadTreeDecomposition(SearchBased):
+    """
+    A* over an adaptive cell decomposition of the free space (FreeSpaceQuadTree):
+    large cells in open areas and small cells (down to discretization_step) near
+    the obstacles. The nodes of the search are the free cells and the path goes
+    from a cell to the next one through the midpoint of their shared side, so it
+    is collision free without further checks. On sparse maps the graph has far
+    fewer nodes than the lattice and the draw list contains one polygon per
+    expanded cell instead of one per lattice tile.
+
+    A minimum size cell that is only partly free is treated as occupied, so the
+    decomposition can miss the passages narrower than a few cells. When the search
+    over the cells fails (or the start or the goal is in an occupied cell) it falls
+    back to A* on the lattice, with the edges of the other lattice planners
+    (LatticeGraph): the algorithm finds a path whenever they do.
+
+    The decomposition, its adjacency graph and the lattice edges are kept across
+    resets and only rebuilt (or updated) when the map version changes.
+    """
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2
+                 ):
+
+        self.decomposition = None
+        self.lattice_graph = None
+
+        # True once the search has fallen back to the lattice
+        self.on_lattice = False
+        self.start_index = None
+        self.goal_index = None
+
+        self.start_cell = None
+        self.goal_cell = None
+
+        # Cost-to-come, parent (previous cell and portal) and position of each generated cell
+        self.costs = {}
+        self.parents = {}
+        self.positions = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        # The decomposition does not depend on start and goal
+        if (self.decomposition is None or self.decomposition.world_map is not self.world_map or
+                self.decomposition.is_outdated()):
+            self.decomposition = FreeSpaceQuadTree(self.world_map, self.margin, self.discretization_step)
+
+        self.start_cell = self.decomposition.locate(self.start)
+        self.goal_cell = self.decomposition.locate(self.world_map.goal)
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.costs = {}
+        self.parents = {}
+        self.positions = {}
+        self.on_lattice = False
+
+        # Start or goal in an occupied cell
+        if self.start_cell is None or self.goal_cell is None:
+            self.start_lattice_search()
+            return
+
+        start_id = self.start_cell.cell_id
+        self.costs[start_id] = 0
+        self.parents[start_id] = None
+        self.positions[start_id] = self.start
+        self.open_set.push(start_id, self.heuristic(self.start))
+
+    def heuristic(self, point):
+        return point.distance(self.world_map.goal)
+
+    def get_position(self, cell_id):
+        """
+        Point used to represent the cell: the goal for the goal cell, the center otherwise
+        """
+        if cell_id == self.goal_cell.cell_id:
+            return self.world_map.goal
+        return self.decomposition.cells[cell_id].center
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path()
+
+    def step_search(self):
+
+        if self.on_lattice:
+            self.step_lattice_search()
+            return
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        # Update draw list
+        self.draw_list.append(self.decomposition.cells[current].as_polygon())
+
+        if current == self.goal_cell.cell_id:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path()
+            return
+
+        position = self.positions[current]
+        for neighbor, portal in self.decomposition.adjacency[current]:
+            if neighbor in self.closed_set:
+                continue
+
+            neighbor_position = self.get_position(neighbor)
+            new_cost = self.costs[current] + position.distance(portal) + portal.distance(neighbor_position)
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = (current, portal)
+                self.positions[neighbor] = neighbor_position
+                self.open_set.push(neighbor, new_cost + self.heuristic(neighbor_position))
+
+        # No path through the free cells
+        if len(self.open_set) == 0:
+            self.start_lattice_search()
+
+    def start_lattice_search(self):
+        """
+        Restart the search from the start on the lattice. The edges do not depend on
+        start and goal: keep the ones already evaluated
+        """
+
+        if self.lattice_graph is None or self.lattice_graph.world_map is not self.world_map:
+            self.lattice_graph = LatticeGraph(self.world_map, self.discretization_step, self.margin)
+        else:
+            self.lattice_graph.update()
+
+        self.on_lattice = True
+        self.start_index = self.point_to_index(self.start)
+        self.goal_index = self.point_to_index(self.world_map.goal)
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.costs = {self.start_index: 0}
+        self.parents = {self.start_index: None}
+        self.open_set.push(self.start_index, self.octile_distance(self.start_index, self.goal_index))
+
+    def step_lattice_search(self):
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        # Update draw list
+        self.draw_list.append(self.get_view(self.index_to_point(current)))
+
+        if current == self.goal_index:
+            # Goal reached, reconstruct the path
+            self.reconstruct_lattice_path()
+            return
+
+        for neighbor, cost in self.lattice_graph.get_neighbors(current):
+            if neighbor in self.closed_set:
+                continue
+
+            new_cost = self.costs[current] + cost
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = current
+                self.open_set.push(neighbor, new_cost + self.octile_distance(neighbor, self.goal_index))
+
+    def reconstruct_path(self):
+
+        path = []
+        current = self.goal_cell.cell_id
+        while self.parents[current] is not None:
+            path.append(self.positions[current])
+            current, portal = self.parents[current]
+            path.append(portal)
+        path.append(self.start)
+
+        path = path[::-1]
+
+        # Start and goal in the same cell
+        if len(path) == 1:
+            path.append(self.world_map.goal)
+
+        self.path = path
+
+    def reconstruct_lattice_path(self):
+
+        # The start and goal cells are replaced by the actual start and goal
+        path = [self.world_map.goal]
+        current = self.parents[self.goal_index]
+        while current is not None and self.parents[current] is not None:
+            path.append(self.index_to_point(current))
+            current = self.parents[current]
+        path.append(self.start)
+
+        self.path = path[::-1]
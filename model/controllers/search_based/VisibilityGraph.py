@@ -0,0 +1,132 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.visibility_graph import ObstacleVisibilityGraph
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.segment import Segment
+from model.geometry.point import Point
+
+
+class VisibilityGraph(SearchBased):
+    """
+    Exact shortest path among the (inflated) obstacles: A* on the visibility graph
+    of the obstacle vertices (ObstacleVisibilityGraph) extended with start and goal.
+
+    The graph is kept across resets and updated incrementally from the map journal,
+    so adding or removing an obstacle only touches the edges it affects and
+    moving the goal only requires to connect the new start and goal to the graph.
+    """
+
+    START = 'start'
+    GOAL = 'goal'
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2
+                 ):
+
+        self.visibility_graph = None
+
+        # Nodes visible from start and goal ({node: cost})
+        self.start_edges = {}
+        self.goal_edges = {}
+
+        # Cost-to-come and parent of each generated node
+        self.costs = {}
+        self.parents = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        # The graph does not depend on start and goal: keep it and apply the changes of the map
+        if self.visibility_graph is None or self.visibility_graph.world_map is not self.world_map:
+            self.visibility_graph = ObstacleVisibilityGraph(self.world_map, self.margin)
+        else:
+            self.visibility_graph.update()
+
+        self.start_edges = self.visibility_graph.connect_point(self.start)
+        self.goal_edges = self.visibility_graph.connect_point(self.world_map.goal)
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.costs = {self.START: 0}
+        self.parents = {self.START: None}
+
+        self.open_set.push(self.START, self.heuristic(self.start))
+
+    def get_point(self, node):
+        if node == self.START:
+            return self.start
+        if node == self.GOAL:
+            return self.world_map.goal
+        return Point(*self.visibility_graph.nodes[node])
+
+    def heuristic(self, point):
+        return point.distance(self.world_map.goal)
+
+    def get_edges(self, node):
+        """
+        Edges leaving the node in the graph extended with start and goal. Returns {node: cost}
+        """
+
+        if node == self.START:
+            edges = dict(self.start_edges)
+            if self.visibility_graph.is_visible(self.start, self.world_map.goal):
+                edges[self.GOAL] = self.start.distance(self.world_map.goal)
+            return edges
+
+        edges = dict(self.visibility_graph.edges[node])
+        if node in self.goal_edges:
+            edges[self.GOAL] = self.goal_edges[node]
+        return edges
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path()
+
+    def step_search(self):
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        if current == self.GOAL:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path()
+            return
+
+        for neighbor, cost in self.get_edges(current).items():
+            if neighbor in self.closed_set:
+                continue
+
+            new_cost = self.costs[current] + cost
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = current
+                self.open_set.push(neighbor, new_cost + self.heuristic(self.get_point(neighbor)))
+
+        # Update draw list
+        point = self.get_point(current)
+        self.draw_list.append(point)
+        if self.parents[current] is not None:
+            self.draw_list.append(Segment(self.get_point(self.parents[current]), point))
+
+    def reconstruct_path(self):
+
+        path = []
+        current = self.GOAL
+        while current is not None:
+            path.append(self.get_point(current))
+            current = self.parents[current]
+
+        self.path = path[::-1]
@@ -0,0 +1,204 @@
+from model.controllers.search_based_algorithm import SearchBased
+from model.controllers.voronoi_diagram import GeneralizedVoronoiDiagram
+from model.controllers.indexed_heap import IndexedHeap
+
+from model.geometry.segment import Segment
+from model.geometry.point import Point
+
+
+class VoronoiRoadmap(SearchBased):
+    """
+    Maximum clearance planner. The robot moves along the generalized Voronoi
+    diagram of the map (GeneralizedVoronoiDiagram), which keeps it as far as possible
+    from the obstacles on both sides, instead of hugging them like the shortest path
+    does. Start and goal are connected to the closest visible vertex of the diagram
+    and A* runs on its junctions.
+
+    The diagram only depends on the map: it is kept across resets and rebuilt when
+    the map version changes. Queries only search the few hundred junctions of the
+    diagram, whatever the discretization step.
+    """
+
+    START = 'start'
+    GOAL = 'goal'
+
+    def __init__(self,
+                 world_map,
+                 start=Point(0, 0),
+                 margin=0.2,
+                 iterations_per_step=1,
+                 max_iterations=5000,
+                 discretization_step=0.2,
+                 sample_step=0.1
+                 ):
+
+        self.sample_step = sample_step
+        self.diagram = None
+
+        # Ways to reach the junctions from the start and to reach the goal
+        # from the junctions ({junction: (cost, points)})
+        self.start_edges = {}
+        self.goal_edges = {}
+
+        # Way to reach the goal directly from the start along the diagram (None if there is none)
+        self.direct_edge = None
+
+        # Cost-to-come and parent (previous node and points from it) of each generated node
+        self.costs = {}
+        self.parents = {}
+
+        super().__init__(
+            world_map,
+            start,
+            margin=margin,
+            iterations_per_step=iterations_per_step,
+            max_iterations=max_iterations,
+            dynamic=False,
+            discretization_step=discretization_step
+        )
+
+    def pre_search(self):
+
+        if (self.diagram is None or self.diagram.world_map is not self.world_map or
+                self.diagram.is_outdated()):
+            self.diagram = GeneralizedVoronoiDiagram(self.world_map, self.margin, self.sample_step)
+
+        self.connect_start_and_goal()
+
+        self.open_set = IndexedHeap()
+        self.closed_set = set()
+        self.costs = {self.START: 0}
+        self.parents = {self.START: None}
+
+        self.open_set.push(self.START, self.heuristic(self.start))
+
+    def connect_to_diagram(self, point):
+        """
+        Closest vertex of the diagram that can be reached from the point with a
+        straight line (None if there is no such vertex among the closest ones)
+        """
+
+        for vertex in self.diagram.nearest_vertices(point):
+            if not self.check_collision(point, self.diagram.get_point(vertex)):
+                return vertex
+        return None
+
+    def connect_start_and_goal(self):
+
+        self.start_edges = {}
+        self.goal_edges = {}
+        self.direct_edge = None
+
+        start_vertex = self.connect_to_diagram(self.start)
+        goal_vertex = self.connect_to_diagram(self.world_map.goal)
+        if start_vertex is None or goal_vertex is None:
+            return
+
+        start_point = self.diagram.get_point(start_vertex)
+        goal_point = self.diagram.get_point(goal_vertex)
+
+        for junction, (cost, points) in self.diagram.entry_edges(start_vertex).items():
+            self.start_edges[junction] = (self.start.distance(start_point) + cost, [start_point] + points)
+
+        for junction, (cost, points) in self.diagram.entry_edges(goal_vertex).items():
+            path = points[::-1][1:] + [self.world_map.goal]
+            if junction != goal_vertex:
+                path.insert(-1, goal_point)
+            self.goal_edges[junction] = (cost + goal_point.distance(self.world_map.goal), path)
+
+        # Start and goal connected to the same chain (or the same vertex)
+        if start_vertex == goal_vertex:
+            self.direct_edge = (self.start.distance(start_point) + start_point.distance(self.world_map.goal),
+                                [start_point, self.world_map.goal])
+        elif start_vertex in self.diagram.vertex_chain and goal_vertex in self.diagram.vertex_chain:
+            start_chain, start_k = self.diagram.vertex_chain[start_vertex]
+            goal_chain, goal_k = self.diagram.vertex_chain[goal_vertex]
+            if start_chain == goal_chain:
+                points = self.diagram.get_chain_points(start_chain)
+                if start_k < goal_k:
+                    points = points[start_k:goal_k + 1]
+                else:
+                    points = points[goal_k:start_k + 1][::-1]
+                points.append(self.world_map.goal)
+                cost = self.start.distance(points[0]) + sum(
+                    points[k].distance(points[k + 1]) for k in range(len(points) - 1)
+                )
+                self.direct_edge = (cost, points)
+
+    def get_point(self, node):
+        if node == self.START:
+            return self.start
+        if node == self.GOAL:
+            return self.world_map.goal
+        return self.diagram.get_point(node)
+
+    def heuristic(self, point):
+        return point.distance(self.world_map.goal)
+
+    def get_edges(self, node):
+        """
+        Edges leaving the node. Returns a list of (node, cost, points), where points go
+        from the node (excluded) to the next one (included)
+        """
+
+        if node == self.START:
+            edges = [(junction, cost, points) for junction, (cost, points) in self.start_edges.items()]
+            if self.direct_edge is not None:
+                edges.append((self.GOAL, *self.direct_edge))
+            return edges
+
+        edges = []
+        for chain_index, other in self.diagram.junctions[node]:
+            chain, length = self.diagram.chains[chain_index]
+            points = self.diagram.get_chain_points(chain_index, reverse=chain[0] != node)
+            edges.append((other, length, points[1:]))
+
+        if node in self.goal_edges:
+            cost, points = self.goal_edges[node]
+            edges.append((self.GOAL, cost, points))
+
+        return edges
+
+    def can_run(self):
+        return len(self.open_set) > 0 and not self.has_path()
+
+    def step_search(self):
+
+        current, _ = self.open_set.pop()
+        self.closed_set.add(current)
+
+        # Update draw list
+        if self.parents[current] is not None:
+            previous, points = self.parents[current]
+            points = [self.get_point(previous)] + points
+            for k in range(len(points) - 1):
+                self.draw_list.append(Segment(points[k], points[k + 1]))
+
+        if current == self.GOAL:
+            # Goal reached, reconstruct the path
+            self.reconstruct_path()
+            return
+
+        for neighbor, cost, points in self.get_edges(current):
+            if neighbor in self.closed_set:
+                continue
+
+            new_cost = self.costs[current] + cost
+            if new_cost < self.costs.get(neighbor, float('inf')):
+                self.costs[neighbor] = new_cost
+                self.parents[neighbor] = (current, points)
+                self.open_set.push(neighbor, new_cost + self.heuristic(self.get_point(neighbor)))
+
+    def reconstruct_path(self):
+
+        segments = []
+        current = self.GOAL
+        while self.parents[current] is not None:
+            current, points = self.parents[current]
+            segments.append(points)
+
+        path = [self.start]
+        for points in segments[::-1]:
+            path.extend(points)
+
+        self.path = path
@@ -1,6 +1,8 @@
 from abc import abstractmethod
+import numpy as np
 
 from model.controllers.search_algorithm import SearchAlgorithm
+from model.controllers.lattice_graph import lattice_boundaries
 from model.geometry.polygon import Polygon
 
 from model.geometry.point import Point
@@ -23,7 +25,8 @@ class SearchBased(SearchAlgorithm):
                  iterations_per_step=1,
                  max_iterations=5000,
                  dynamic=False,
-                 discretization_step=0.2
+                 discretization_step=0.2,
+                 lazy_collision=False
                  ):
 
         # Side of the area that each node covers
@@ -38,6 +41,9 @@ class SearchBased(SearchAlgorithm):
         # to avoid adding it twice to the open_set
         self.generated_neighbors = set()
 
+        # Cost of the lattice edges already checked ({(index_1, index_2): cost})
+        self.edge_costs = {}
+
         super().__init__(
             world_map,
             start,
@@ -45,12 +51,14 @@ class SearchBased(SearchAlgorithm):
             iterations_per_step=iterations_per_step,
             max_iterations=max_iterations,
             dynamic=dynamic,
+            lazy_collision=lazy_collision
         )
 
     def reset(self):
         self.open_set = None
         self.closed_set = None
         self.generated_neighbors = set()
+        self.edge_costs = {}
         super().reset()
 
     def get_view(self, point):
@@ -77,6 +85,102 @@ class SearchBased(SearchAlgorithm):
     def has_path(self):
         return len(self.path) > 0 and self.cell_contains(self.path[-1], self.world_map.goal)
 
+    def point_to_index(self, point):
+        """
+        Returns the integer coordinates (i, j) on the lattice of the cell that contains
+        the point. The lattice is the same used by get_neighbors: cell (i, j) is
+        centered in (i * discretization_step, j * discretization_step)
+        """
+        return round(point.x / self.discretization_step), round(point.y / self.discretization_step)
+
+    def index_to_point(self, index):
+        return Point(index[0] * self.discretization_step, index[1] * self.discretization_step)
+
+    def get_index_boundaries(self):
+        """
+        Returns (min_i, min_j, max_i, max_j), the range of lattice indices inside the map
+        """
+        return lattice_boundaries(self.world_map.map_boundaries, self.discretization_step)
+
+    def get_lattice_neighbors(self, index):
+        """
+        Returns the indices of the (up to 8) cells adjacent to the one specified, inside the map
+        """
+
+        min_i, min_j, max_i, max_j = self.get_index_boundaries()
+        neighbors = []
+        for di in range(-1, 2):
+            for dj in range(-1, 2):
+                if not (di == 0 and dj == 0):
+                    i, j = index[0] + di, index[1] + dj
+                    if min_i <= i <= max_i and min_j <= j <= max_j:
+                        neighbors.append((i, j))
+        return neighbors
+
+    def edge_cost(self, index_1, index_2):
+        """
+        Cost of the edge between two adjacent cells of the lattice (infinite if there
+        is a collision). Collision checks are cached in self.edge_costs
+        """
+
+        key = (index_1, index_2) if index_1 < index_2 else (index_2, index_1)
+        if key not in self.edge_costs:
+            point_1 = self.index_to_point(index_1)
+            point_2 = self.index_to_point(index_2)
+            if self.check_collision(point_1, point_2):
+                self.edge_costs[key] = float('inf')
+            else:
+                self.edge_costs[key] = point_1.distance(point_2)
+        return self.edge_costs[key]
+
+    def octile_distance(self, index_1, index_2):
+        """
+        Length of the shortest 8-connected path between two cells of the lattice
+        in absence of obstacles
+        """
+        di = abs(index_1[0] - index_2[0])
+        dj = abs(index_1[1] - index_2[1])
+        return (max(di, dj) + (np.sqrt(2) - 1) * min(di, dj)) * self.discretization_step
+
+    def get_edges_in_bounds(self, bounds):
+        """
+        Returns the lattice edges (pairs of indices, each one listed once) whose cost might
+        change if an obstacle with the specified bounds is added or removed, that is the
+        edges crossing the bounds enlarged by the margin used in the collision check.
+        The work is proportional to the footprint of the bounds, not to the map size
+        """
+
+        min_i, min_j, max_i, max_j = self.get_index_boundaries()
+        step = self.discretization_step
+
+        # Enlarge the bounds by the margin used in the collision check
+        min_x, min_y, max_x, max_y = bounds
+        min_x -= self.margin / 2
+        min_y -= self.margin / 2
+        max_x += self.margin / 2
+        max_y += self.margin / 2
+
+        edges = []
+        for i in range(max(min_i, int(np.floor(min_x / step)) - 1), min(max_i, int(np.ceil(max_x / step)) + 1) + 1):
+            for j in range(max(min_j, int(np.floor(min_y / step)) - 1), min(max_j, int(np.ceil(max_y / step)) + 1) + 1):
+
+                # Consider each undirected edge only once (the other 4 directions
+                # are covered by the neighboring cells)
+                for di, dj in ((1, 0), (0, 1), (1, 1), (1, -1)):
+
+                    ni, nj = i + di, j + dj
+                    if not (min_i <= ni <= max_i and min_j <= nj <= max_j):
+                        continue
+
+                    # Check if the edge crosses the enlarged bounds
+                    if (max(i, ni) * step < min_x or min(i, ni) * step > max_x or
+                            max(j, nj) * step < min_y or min(j, nj) * step > max_y):
+                        continue
+
+                    edges.append(((i, j), (ni, nj)))
+
+        return edges
+
     def heuristic(self, point):
         """
         Heuristic function. Leave this as it is if you are not planning to use it
@@ -108,6 +212,15 @@ class SearchBased(SearchAlgorithm):
 
                         neighbor = Point(neighbor_x, neighbor_y)
 
+                        # With lazy collision evaluation the edge is not checked now and it
+                        # might collide: the node is generated from each of its neighbors
+                        # (unless the edge is known to collide) and the algorithm keeps the
+                        # first one whose edge turns out to be free
+                        if self.lazy_collision:
+                            if self.lazy_edge(point, neighbor):
+                                neighbors.append(neighbor)
+                            continue
+
                         # Check if the node has previously been generated
                         if neighbor in self.generated_neighbors:
                             continue
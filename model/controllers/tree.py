@@ -0,0 +1,222 @@
+import math
+
+import numpy as np
+
+from model.geometry.point import Point
+
+
+class Tree:
+    """
+    Tree of the sampling based algorithms, stored as a structure of arrays. Each node
+    is identified by its index and has coordinates, parent index (-1 for the root),
+    cost-to-come and a valid flag. The children of each node are kept as an intrusive
+    linked list (first child, next and previous sibling), so that a node can be
+    moved under another parent in O(1) and the cost of a subtree can be updated
+    without scanning the whole tree. Arrays double their capacity when full.
+
+    Point objects are only created when needed (get_point), e.g. to build the path.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self.initial_capacity = initial_capacity
+        self.size = 0
+        self.allocate(initial_capacity)
+
+    def allocate(self, capacity):
+        self.coordinates = np.zeros((capacity, 2))
+        self.parents = np.full(capacity, -1, dtype=np.int64)
+        self.costs = np.zeros(capacity)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.first_child = np.full(capacity, -1, dtype=np.int64)
+        self.next_sibling = np.full(capacity, -1, dtype=np.int64)
+        self.previous_sibling = np.full(capacity, -1, dtype=np.int64)
+
+    def grow(self):
+        capacity = 2 * len(self.costs)
+        for name, fill in (('coordinates', 0), ('parents', -1), ('costs', 0), ('valid', False),
+                           ('first_child', -1), ('next_sibling', -1), ('previous_sibling', -1)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def clear(self):
+        self.size = 0
+        self.allocate(self.initial_capacity)
+
+    def __len__(self):
+        return self.size
+
+    # ------------------------------ Nodes ------------------------------ #
+
+    def add(self, point, parent=-1):
+        """
+        Add a node in the point, child of the specified parent (-1 for a root). Returns its index
+        """
+
+        if self.size == len(self.costs):
+            self.grow()
+
+        index = self.size
+        self.size += 1
+
+        self.coordinates[index] = (point.x, point.y)
+        self.valid[index] = True
+        self.costs[index] = 0
+        self.parents[index] = -1
+        self.first_child[index] = -1
+        self.next_sibling[index] = -1
+        self.previous_sibling[index] = -1
+
+        if parent >= 0:
+            self.set_parent(index, parent)
+
+        return index
+
+    def get_point(self, index):
+        x, y = self.coordinates[index].tolist()
+        return Point(x, y)
+
+    def distance(self, index, point):
+        x, y = self.coordinates[index].tolist()
+        return math.hypot(point.x - x, point.y - y)
+
+    def distance_between(self, index_1, index_2):
+        x_1, y_1 = self.coordinates[index_1].tolist()
+        x_2, y_2 = self.coordinates[index_2].tolist()
+        return math.hypot(x_1 - x_2, y_1 - y_2)
+
+    def get_parent(self, index):
+        parent = self.parents[index]
+        return None if parent < 0 else int(parent)
+
+    def get_children(self, index):
+        children = []
+        child = self.first_child[index]
+        while child >= 0:
+            children.append(int(child))
+            child = self.next_sibling[child]
+        return children
+
+    def get_branch(self, index):
+        """
+        Indices of the nodes from the root to the specified one
+        """
+
+        branch = []
+        while index >= 0:
+            branch.append(int(index))
+            index = self.parents[index]
+        return branch[::-1]
+
+    # ------------------------------ Structure ------------------------------ #
+
+    def detach(self, index):
+        parent = self.parents[index]
+        if parent < 0:
+            return
+
+        previous, following = self.previous_sibling[index], self.next_sibling[index]
+        if previous >= 0:
+            self.next_sibling[previous] = following
+        else:
+            self.first_child[parent] = following
+        if following >= 0:
+            self.previous_sibling[following] = previous
+
+        self.parents[index] = -1
+        self.next_sibling[index] = -1
+        self.previous_sibling[index] = -1
+
+    def set_parent(self, index, parent):
+        """
+        Move the node under a new parent. The cost difference is propagated to the
+        whole subtree of the node, so costs are always the actual cost-to-come
+        """
+
+        self.detach(index)
+
+        self.parents[index] = parent
+        following = self.first_child[parent]
+        self.next_sibling[index] = following
+        if following >= 0:
+            self.previous_sibling[following] = index
+        self.first_child[parent] = index
+
+        delta = float(self.costs[parent]) + self.distance_between(parent, index) - float(self.costs[index])
+        if delta != 0:
+            self.costs[self.get_subtree(index)] += delta
+
+    def get_subtree(self, index):
+        """
+        Indices of the node and of all its descendants
+        """
+
+        subtree = []
+        stack = [index]
+        while len(stack) > 0:
+            current = stack.pop()
+            subtree.append(current)
+            child = self.first_child[current]
+            while child >= 0:
+                stack.append(child)
+                child = self.next_sibling[child]
+        return subtree
+
+    def propagate_invalid(self):
+        """
+        Invalidate all the descendants of the invalid nodes
+        """
+
+        valid = self.valid[:self.size]
+        parents = self.parents[:self.size]
+        has_parent = parents >= 0
+        while True:
+            inherited = valid & ~(has_parent & ~valid[np.maximum(parents, 0)])
+            if np.array_equal(inherited, valid):
+                break
+            valid[:] = inherited
+
+    def compact(self):
+        """
+        Remove the invalid nodes. The valid descendants of a removed node become roots.
+        Returns an array that maps the old indices to the new ones (-1 for the removed nodes)
+        """
+
+        keep = self.valid[:self.size].copy()
+        mapping = np.full(self.size, -1, dtype=np.int64)
+        mapping[keep] = np.arange(np.count_nonzero(keep))
+
+        coordinates = self.coordinates[:self.size][keep]
+        costs = self.costs[:self.size][keep]
+        parents = self.parents[:self.size][keep]
+        parents = np.where(parents >= 0, mapping[np.maximum(parents, 0)], -1)
+
+        self.clear()
+        while len(self.costs) < len(costs):
+            self.grow()
+
+        self.size = len(costs)
+        self.coordinates[:self.size] = coordinates
+        self.costs[:self.size] = costs
+        self.valid[:self.size] = True
+
+        # Rebuild the child lists
+        for index in np.nonzero(parents >= 0)[0]:
+            parent = parents[index]
+            self.parents[index] = parent
+            following = self.first_child[parent]
+            self.next_sibling[index] = following
+            if following >= 0:
+                self.previous_sibling[following] = index
+            self.first_child[parent] = index
+
+        return mapping
+
+    def get_edges(self):
+        """
+        Returns the arrays of parent and child indices of the edges between valid nodes
+        """
+
+        children = np.nonzero((self.parents[:self.size] >= 0) & self.valid[:self.size])[0]
+        return self.parents[children], children
@@ -0,0 +1,298 @@
+import numpy as np
+from scipy.spatial import ConvexHull
+
+from model.geometry.circle import Circle
+
+
+class ObstacleVisibilityGraph:
+    """
+    Visibility graph of the obstacles of the map. Each obstacle is replaced by its
+    convex hull (exact for the rectangles generated by the map) inflated by half the
+    margin; the nodes of the graph are the vertices of the inflated obstacles (moved
+    slightly outwards) and two nodes are connected if the segment between them does
+    not cross any inflated obstacle. The shortest path between two points among
+    polygonal obstacles only turns at these vertices, so a search on the graph
+    extended with start and goal gives the exact shortest path.
+
+    Segments are tested in batches with NumPy (Cyrus-Beck clipping against the
+    edges of the inflated obstacles), after discarding the obstacles whose bounds
+    don't overlap them. For each pair of nodes that are not visible the graph stores
+    the obstacles blocking it, so that the graph can be updated incrementally from
+    the map journal: when an obstacle is added, the edges crossing it are removed
+    and its vertices are connected to the others; when it is removed, its vertices
+    are dropped and the pairs it was the only blocker of become edges again.
+    """
+
+    # Distance between the inflated obstacles and the nodes placed on their vertices
+    NODE_OFFSET = 1e-3
+
+    # Number of sides of the polygons approximating circular obstacles
+    CIRCLE_SIDES = 12
+
+    def __init__(self, world_map, margin=0.2):
+
+        self.world_map = world_map
+        self.margin = margin
+
+        # Inflated obstacles ({obstacle_id: (normals, offsets, bounds)}), inside where normals . x <= offsets
+        self.obstacles = {}
+
+        # Position of each node and nodes placed on the vertices of each obstacle
+        self.nodes = {}
+        self.obstacle_nodes = {}
+        self.next_node_id = 0
+
+        # Visible pairs ({node: {node: cost}}) and obstacles blocking the other pairs ({(node, node): set(obstacle_id)})
+        self.edges = {}
+        self.blockers = {}
+
+        self.map_version = None
+
+        self.build()
+
+    def build(self):
+
+        self.map_version = self.world_map.version
+
+        self.obstacles = {}
+        self.nodes = {}
+        self.obstacle_nodes = {}
+        self.edges = {}
+        self.blockers = {}
+
+        for obstacle_id in self.world_map.obstacle_ids:
+            self.register_obstacle(obstacle_id, self.world_map.get_obstacle(obstacle_id))
+
+        node_ids = list(self.nodes.keys())
+        pairs = [(a, b) for k, a in enumerate(node_ids) for b in node_ids[k + 1:]]
+        self.connect_pairs(pairs)
+
+    def update(self):
+        """
+        Bring the graph up to date with the map. Returns True if something changed
+        """
+
+        if self.map_version == self.world_map.version:
+            return False
+
+        changes = self.world_map.changes_since(self.map_version)
+        if changes is None:
+            self.build()
+            return True
+
+        for change in changes:
+            if change.kind == change.ADD:
+                obstacle = self.world_map.get_obstacle(change.obstacle_id)
+
+                # The obstacle might have been removed in the meantime
+                if obstacle is not None:
+                    self.add_obstacle(change.obstacle_id, obstacle)
+            else:
+                self.remove_obstacle(change.obstacle_id)
+
+        self.map_version = self.world_map.version
+        return True
+
+    # ------------------------------ Geometry ------------------------------ #
+
+    def get_hull(self, polygon):
+        """
+        Vertices of the convex hull of the shape, counterclockwise
+        """
+
+        if isinstance(polygon, Circle):
+            # Circumscribed regular polygon
+            radius = polygon.radius / np.cos(np.pi / self.CIRCLE_SIDES)
+            angles = np.arange(self.CIRCLE_SIDES) * 2 * np.pi / self.CIRCLE_SIDES
+            return np.stack([polygon.pose.x + radius * np.cos(angles), polygon.pose.y + radius * np.sin(angles)], axis=1)
+
+        points = np.array(polygon.to_point_array(), dtype=float)
+        return points[ConvexHull(points).vertices]
+
+    @staticmethod
+    def inflate(hull, distance):
+        """
+        Move the edges of the convex polygon outwards by the distance. Returns the
+        vertices of the inflated polygon, its outward edge normals and the offsets
+        of the edges (the inside is where normals . x <= offsets)
+        """
+
+        edges = np.roll(hull, -1, axis=0) - hull
+        normals = np.stack([edges[:, 1], -edges[:, 0]], axis=1)
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+        # Vertex k is shared by edge k - 1 and edge k
+        previous_normals = np.roll(normals, 1, axis=0)
+        miter = (previous_normals + normals) / (1 + np.sum(previous_normals * normals, axis=1, keepdims=True))
+        vertices = hull + distance * miter
+
+        offsets = np.sum(normals * hull, axis=1) + distance
+        return vertices, normals, offsets
+
+    @staticmethod
+    def crossing(starts, ends, normals, offsets):
+        """
+        Vectorized test of the segments (arrays of start and end points) against a convex
+        polygon. Returns a boolean array, True for the segments crossing its interior
+        """
+
+        directions = ends - starts
+        numerators = offsets[None, :] - starts @ normals.T
+        denominators = directions @ normals.T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = numerators / denominators
+
+        entering = np.where(denominators < 0, ratios, -np.inf).max(axis=1)
+        exiting = np.where(denominators > 0, ratios, np.inf).min(axis=1)
+        outside = np.any((denominators == 0) & (numerators < 0), axis=1)
+
+        return ~outside & (np.minimum(exiting, 1) - np.maximum(entering, 0) > 1e-9)
+
+    def find_blockers(self, starts, ends, obstacle_ids=None):
+        """
+        Obstacles crossed by each of the segments. Returns a list of sets of obstacle ids
+        """
+
+        blockers = [set() for _ in range(len(starts))]
+        if len(starts) == 0:
+            return blockers
+
+        min_corner = np.minimum(starts, ends)
+        max_corner = np.maximum(starts, ends)
+
+        for obstacle_id in self.obstacles if obstacle_ids is None else obstacle_ids:
+            normals, offsets, (min_x, min_y, max_x, max_y) = self.obstacles[obstacle_id]
+
+            # Discard the segments whose bounds don't overlap the obstacle
+            candidates = np.nonzero((max_corner[:, 0] > min_x) & (min_corner[:, 0] < max_x) &
+                                    (max_corner[:, 1] > min_y) & (min_corner[:, 1] < max_y))[0]
+            if len(candidates) == 0:
+                continue
+
+            crossing = self.crossing(starts[candidates], ends[candidates], normals, offsets)
+            for k in candidates[crossing]:
+                blockers[k].add(obstacle_id)
+
+        return blockers
+
+    # ------------------------------ Graph ------------------------------ #
+
+    def register_obstacle(self, obstacle_id, obstacle):
+        """
+        Store the inflated obstacle and create the nodes on its vertices (the ones inside the map)
+        """
+
+        hull = self.get_hull(obstacle.polygon)
+        vertices, normals, offsets = self.inflate(hull, self.margin / 2)
+        bounds = (*vertices.min(axis=0), *vertices.max(axis=0))
+        self.obstacles[obstacle_id] = (normals, offsets, bounds)
+
+        min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+        node_ids = []
+        for x, y in self.inflate(hull, self.margin / 2 + self.NODE_OFFSET)[0]:
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                self.nodes[self.next_node_id] = (x, y)
+                self.edges[self.next_node_id] = {}
+                node_ids.append(self.next_node_id)
+                self.next_node_id += 1
+
+        self.obstacle_nodes[obstacle_id] = node_ids
+        return node_ids
+
+    def get_segments(self, pairs):
+        starts = np.array([self.nodes[a] for a, _ in pairs], dtype=float).reshape(-1, 2)
+        ends = np.array([self.nodes[b] for _, b in pairs], dtype=float).reshape(-1, 2)
+        return starts, ends
+
+    def connect_pairs(self, pairs, obstacle_ids=None):
+        """
+        Test the pairs of nodes and store them as edges or blocked pairs
+        """
+
+        starts, ends = self.get_segments(pairs)
+        for (a, b), blockers in zip(pairs, self.find_blockers(starts, ends, obstacle_ids)):
+            if len(blockers) == 0:
+                cost = np.hypot(self.nodes[a][0] - self.nodes[b][0], self.nodes[a][1] - self.nodes[b][1])
+                self.edges[a][b] = cost
+                self.edges[b][a] = cost
+            else:
+                self.blockers[(a, b) if a < b else (b, a)] = blockers
+
+    def add_obstacle(self, obstacle_id, obstacle):
+
+        new_nodes = self.register_obstacle(obstacle_id, obstacle)
+
+        # Existing edges crossing the new obstacle
+        visible = [(a, b) for a in self.edges for b in self.edges[a] if a < b]
+        starts, ends = self.get_segments(visible)
+        for (a, b), blockers in zip(visible, self.find_blockers(starts, ends, [obstacle_id])):
+            if len(blockers) > 0:
+                del self.edges[a][b]
+                del self.edges[b][a]
+                self.blockers[(a, b)] = blockers
+
+        # Blocked pairs also crossing the new obstacle (needed to restore them correctly)
+        blocked = list(self.blockers.keys())
+        starts, ends = self.get_segments(blocked)
+        for pair, blockers in zip(blocked, self.find_blockers(starts, ends, [obstacle_id])):
+            self.blockers[pair] |= blockers
+
+        # Connect the new nodes to all the others
+        new_set = set(new_nodes)
+        pairs = [(a, b) for a in new_nodes for b in self.nodes if b not in new_set or a < b]
+        self.connect_pairs(pairs)
+
+    def remove_obstacle(self, obstacle_id):
+
+        if obstacle_id not in self.obstacles:
+            return
+
+        del self.obstacles[obstacle_id]
+
+        removed = set(self.obstacle_nodes.pop(obstacle_id))
+        for node in removed:
+            for other in self.edges.pop(node):
+                if other not in removed:
+                    del self.edges[other][node]
+            del self.nodes[node]
+
+        for pair in list(self.blockers.keys()):
+            if pair[0] in removed or pair[1] in removed:
+                del self.blockers[pair]
+                continue
+
+            blockers = self.blockers[pair]
+            if obstacle_id in blockers:
+                blockers.discard(obstacle_id)
+
+                # The obstacle was the only one blocking the pair
+                if len(blockers) == 0:
+                    del self.blockers[pair]
+                    a, b = pair
+                    cost = np.hypot(self.nodes[a][0] - self.nodes[b][0], self.nodes[a][1] - self.nodes[b][1])
+                    self.edges[a][b] = cost
+                    self.edges[b][a] = cost
+
+    def connect_point(self, point):
+        """
+        Nodes visible from the point. Returns {node: cost}. The graph is not modified
+        """
+
+        node_ids = list(self.nodes.keys())
+        starts = np.tile(np.array([point.x, point.y], dtype=float), (len(node_ids), 1))
+        ends = np.array([self.nodes[node] for node in node_ids], dtype=float).reshape(-1, 2)
+
+        visible = {}
+        for node, blockers, end in zip(node_ids, self.find_blockers(starts, ends), ends):
+            if len(blockers) == 0:
+                visible[node] = np.hypot(end[0] - point.x, end[1] - point.y)
+        return visible
+
+    def is_visible(self, point_1, point_2):
+        starts = np.array([[point_1.x, point_1.y]], dtype=float)
+        ends = np.array([[point_2.x, point_2.y]], dtype=float)
+        return len(self.find_blockers(starts, ends)[0]) == 0
+
+    def __len__(self):
+        return len(self.nodes)
@@ -0,0 +1,258 @@
+import numpy as np
+from scipy.spatial import Voronoi, cKDTree
+
+from model.geometry.circle import Circle
+from model.geometry.point import Point
+
+
+class GeneralizedVoronoiDiagram:
+    """
+    Approximation of the generalized Voronoi diagram of the map: the set of points
+    equidistant from the two closest obstacles (or from an obstacle and the map
+    boundaries). The boundaries of the obstacles and of the map are sampled every
+    sample_step and scipy computes the Voronoi diagram of the samples; the ridges
+    separating samples of different obstacles form the skeleton. Ridges that get
+    closer than margin / 2 to their samples (accounting for the sampling error)
+    are discarded.
+
+    The skeleton is stored as a roadmap: its junctions (vertices with degree
+    other than 2) are the nodes and the chains of vertices between them are the
+    edges, so the graph is small and does not depend on the sampling resolution.
+    The diagram reflects the map at the time it is built (map_version).
+    """
+
+    # Owner of the samples taken along the map boundaries
+    BOUNDARY = -1
+
+    def __init__(self, world_map, margin=0.2, sample_step=0.1):
+
+        self.world_map = world_map
+        self.margin = margin
+        self.sample_step = sample_step
+
+        # Vertices of the skeleton and their k-d tree
+        self.vertices = None
+        self.vertex_tree = None
+
+        # Chains of skeleton vertices between junctions ([(vertex indices, length)])
+        self.chains = []
+
+        # Chains leaving each junction ({junction: [(chain index, other junction), ...]})
+        self.junctions = {}
+
+        # Chain and position in the chain of each vertex that is not a junction ({vertex: (chain, k)})
+        self.vertex_chain = {}
+
+        self.map_version = None
+
+        self.build()
+
+    def is_outdated(self):
+        return self.map_version != self.world_map.version
+
+    # ------------------------------ Sampling ------------------------------ #
+
+    def sample_segment(self, start, end):
+        length = np.hypot(end[0] - start[0], end[1] - start[1])
+        num_samples = max(1, int(np.ceil(length / self.sample_step)))
+        t = np.arange(num_samples)[:, None] / num_samples
+        return np.array(start) + t * (np.array(end) - np.array(start))
+
+    def sample_shape(self, shape):
+
+        if isinstance(shape, Circle):
+            num_samples = max(8, int(np.ceil(2 * np.pi * shape.radius / self.sample_step)))
+            angles = np.arange(num_samples) * 2 * np.pi / num_samples
+            return np.stack([shape.pose.x + shape.radius * np.cos(angles),
+                             shape.pose.y + shape.radius * np.sin(angles)], axis=1)
+
+        points = shape.to_point_array()
+        return np.concatenate([self.sample_segment(points[k], points[(k + 1) % len(points)])
+                               for k in range(len(points))])
+
+    def sample_boundaries(self):
+        min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+        corners = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+        return np.concatenate([self.sample_segment(corners[k], corners[(k + 1) % 4]) for k in range(4)])
+
+    # ------------------------------ Construction ------------------------------ #
+
+    def build(self):
+
+        self.map_version = self.world_map.version
+
+        samples = [self.sample_boundaries()]
+        owners = [np.full(len(samples[0]), self.BOUNDARY)]
+        for obstacle_id in self.world_map.obstacle_ids:
+            obstacle_samples = self.sample_shape(self.world_map.get_obstacle(obstacle_id).polygon)
+            samples.append(obstacle_samples)
+            owners.append(np.full(len(obstacle_samples), obstacle_id))
+
+        samples = np.concatenate(samples)
+        owners = np.concatenate(owners)
+
+        # Coincident samples (e.g. touching obstacles) are not allowed by Voronoi
+        samples, unique = np.unique(np.round(samples, 9), axis=0, return_index=True)
+        owners = owners[unique]
+
+        diagram = Voronoi(samples)
+
+        ridge_points = diagram.ridge_points
+        ridge_vertices = np.array(diagram.ridge_vertices, dtype=object)
+
+        # Ridges between samples of different obstacles, with both vertices finite
+        edges = []
+        min_x, min_y, max_x, max_y = self.world_map.map_boundaries
+        vertices = diagram.vertices
+        inside = ((vertices[:, 0] >= min_x) & (vertices[:, 0] <= max_x) &
+                  (vertices[:, 1] >= min_y) & (vertices[:, 1] <= max_y))
+        for (p, q), ridge in zip(ridge_points, ridge_vertices):
+            if owners[p] == owners[q] or len(ridge) != 2 or -1 in ridge:
+                continue
+            u, v = ridge
+            if not (inside[u] and inside[v]):
+                continue
+            if self.ridge_clearance(vertices[u], vertices[v], samples[p], samples[q]) < self.required_clearance():
+                continue
+            edges.append((u, v))
+
+        self.build_roadmap(vertices, edges)
+
+    def required_clearance(self):
+        """
+        Distance from the samples needed to be at least margin / 2 from the boundaries
+        (a point of the boundary can be up to sample_step / 2 from the closest sample)
+        """
+        return np.hypot(self.margin / 2, self.sample_step / 2)
+
+    @staticmethod
+    def ridge_clearance(start, end, sample_1, sample_2):
+        """
+        Minimum distance between the ridge and the two samples it separates (all the
+        points of the ridge are equidistant from them). The closest point is the
+        projection of the midpoint of the samples on the ridge
+        """
+
+        direction = end - start
+        midpoint = (sample_1 + sample_2) / 2
+        length_squared = np.dot(direction, direction)
+        t = 0 if length_squared == 0 else np.clip(np.dot(midpoint - start, direction) / length_squared, 0, 1)
+        closest = start + t * direction
+        return np.hypot(*(closest - sample_1))
+
+    def build_roadmap(self, vertices, edges):
+        """
+        Collapse the chains of vertices with degree 2 into single roadmap edges
+        """
+
+        neighbors = {}
+        for u, v in edges:
+            neighbors.setdefault(u, set()).add(v)
+            neighbors.setdefault(v, set()).add(u)
+
+        # Renumber the vertices of the skeleton
+        used = sorted(neighbors.keys())
+        renumber = {old: new for new, old in enumerate(used)}
+        self.vertices = vertices[used] if len(used) > 0 else np.zeros((0, 2))
+        self.vertex_tree = cKDTree(self.vertices) if len(used) > 0 else None
+        neighbors = {renumber[u]: {renumber[v] for v in vs} for u, vs in neighbors.items()}
+
+        junctions = {u for u, vs in neighbors.items() if len(vs) != 2}
+
+        self.chains = []
+        self.junctions = {u: [] for u in junctions}
+        self.vertex_chain = {}
+
+        visited = set()
+
+        def walk(start, first):
+            chain = [start, first]
+            previous, current = start, first
+            while current not in junctions:
+                visited.add(current)
+                previous, current = current, next(v for v in neighbors[current] if v != previous)
+                chain.append(current)
+                if current == start:
+                    break
+            return chain
+
+        def add_chain(chain):
+            points = self.vertices[chain]
+            length = np.sum(np.hypot(*(points[1:] - points[:-1]).T))
+            index = len(self.chains)
+            self.chains.append((chain, length))
+            self.junctions[chain[0]].append((index, chain[-1]))
+            if chain[-1] != chain[0]:
+                self.junctions[chain[-1]].append((index, chain[0]))
+            for k, vertex in enumerate(chain[1:-1]):
+                self.vertex_chain[vertex] = (index, k + 1)
+
+        walked = set()
+        for junction in junctions:
+            for first in neighbors[junction]:
+                if (junction, first) in walked:
+                    continue
+                chain = walk(junction, first)
+                walked.add((chain[-1], chain[-2]))
+                walked.add((junction, first))
+                add_chain(chain)
+
+        # Loops without junctions (e.g. around an isolated obstacle): any vertex becomes a junction
+        for vertex in neighbors:
+            if vertex in junctions or vertex in visited:
+                continue
+            junctions.add(vertex)
+            self.junctions[vertex] = []
+            visited.add(vertex)
+            chain = walk(vertex, next(iter(neighbors[vertex])))
+            add_chain(chain)
+
+    # ------------------------------ Queries ------------------------------ #
+
+    def get_point(self, vertex):
+        return Point(*self.vertices[vertex])
+
+    def get_chain_points(self, chain_index, reverse=False):
+        chain, _ = self.chains[chain_index]
+        if reverse:
+            chain = chain[::-1]
+        return [self.get_point(vertex) for vertex in chain]
+
+    def nearest_vertices(self, point, k=10):
+        """
+        Indices of the k skeleton vertices closest to the point, closest first
+        """
+
+        if self.vertex_tree is None:
+            return []
+        k = min(k, len(self.vertices))
+        _, indices = self.vertex_tree.query([point.x, point.y], k=k)
+        return list(np.atleast_1d(indices))
+
+    def entry_edges(self, vertex):
+        """
+        Ways to reach the junctions from a vertex of the skeleton, following its chain.
+        Returns {junction: (cost, points)}, where points go from the vertex (excluded)
+        to the junction (included)
+        """
+
+        if vertex in self.junctions:
+            return {vertex: (0, [])}
+
+        chain_index, k = self.vertex_chain[vertex]
+        chain, _ = self.chains[chain_index]
+        points = [self.get_point(v) for v in chain]
+
+        edges = {}
+        for junction, path in ((chain[0], points[:k][::-1]), (chain[-1], points[k + 1:])):
+            previous = points[k]
+            cost = 0
+            for point in path:
+                cost += previous.distance(point)
+                previous = point
+            if junction not in edges or cost < edges[junction][0]:
+                edges[junction] = (cost, path)
+        return edges
+
+    def __len__(self):
+        return len(self.junctions)
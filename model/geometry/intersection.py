@@ -1,3 +1,5 @@
+import numpy as np
+
 from model.geometry.polygon import Polygon
 from model.geometry.circle import Circle
 from model.geometry.rectangle import Rectangle
@@ -92,6 +94,42 @@ def circle_intersects_segment(circle, segment):
     return segment_intersects_circle(segment, circle)
 
 
+def segment_buffers_intersect_polygon(starts, ends, margin, polygon):
+    """
+    Vectorized polygon_intersects_polygon(Polygon.segment_buffer(Segment(start, end), margin, margin), polygon)
+    for the segments from starts[k] to ends[k] ((n, 2) arrays of points, segments of non-zero
+    length). Returns an array of n booleans
+    """
+
+    directions = ends - starts
+    units = directions / np.sqrt(directions[:, 0] ** 2 + directions[:, 1] ** 2)[:, None]
+    normals = np.column_stack([-units[:, 1], units[:, 0]]) * margin
+
+    # Corners of the buffers ((n, 4, 2), same order as segment_buffer) and vertices of the polygon
+    corners = np.stack([starts + normals, ends + normals, ends - normals, starts - normals], axis=1)
+    vertices = np.array(polygon.to_point_array(), dtype=float)
+
+    # Axes of the separating axis test: normals of the edges of the buffers and of the polygon
+    buffer_edges = np.roll(corners, -1, axis=1) - corners
+    buffer_axes = np.stack([-buffer_edges[..., 1], buffer_edges[..., 0]], axis=-1)
+    polygon_edges = np.roll(vertices, -1, axis=0) - vertices
+    polygon_axes = np.column_stack([-polygon_edges[:, 1], polygon_edges[:, 0]])
+
+    # Projections on the axes of the buffers ((n, 4 axes, points))
+    buffer_projections = np.einsum('nac,nbc->nab', buffer_axes, corners)
+    polygon_projections = np.einsum('nac,kc->nak', buffer_axes, vertices)
+    separated = ((buffer_projections.max(axis=2) < polygon_projections.min(axis=2)) |
+                 (polygon_projections.max(axis=2) < buffer_projections.min(axis=2))).any(axis=1)
+
+    # Projections on the axes of the polygon ((n, axes, 4 points) and (axes, points))
+    buffer_projections = np.einsum('ac,nbc->nab', polygon_axes, corners)
+    polygon_projections = polygon_axes @ vertices.T
+    separated |= ((buffer_projections.max(axis=2) < polygon_projections.min(axis=1)) |
+                  (polygon_projections.max(axis=1) < buffer_projections.min(axis=2))).any(axis=1)
+
+    return ~separated
+
+
 def check_intersection(obj_1, obj_2):
     if isinstance(obj_1, Circle):
         if isinstance(obj_2, Circle):
@@ -3,6 +3,7 @@ from abc import abstractmethod
 import numpy as np
 
 # Serialization
+import hashlib
 import json
 import pickle
 
@@ -16,6 +17,29 @@ from model.geometry.intersection import check_intersection
 from model.world.map.obstacle import Obstacle
 
 
+class MapChange:
+    """
+    Entry of the map journal. Each time an obstacle is added to or removed from
+    the map a change is recorded together with the bounds of the obstacle, so
+    that dynamic algorithms can repair only the region that has been affected
+    """
+
+    ADD = 'add'
+    REMOVE = 'remove'
+
+    def __init__(self, version, kind, obstacle_id, bounds):
+        self.version = version
+        self.kind = kind
+        self.obstacle_id = obstacle_id
+        self.bounds = bounds
+
+    def __str__(self):
+        return f'MapChange (v{self.version}, {self.kind}, {self.obstacle_id}, {self.bounds})'
+
+    def __repr__(self):
+        return self.__str__()
+
+
 class Map:
     """
     The map should be generated first. Once generated, a goal and some obstacles
@@ -28,6 +52,10 @@ class Map:
     by a polygon) return the IDs of the obstacles that intersect the region.
     """
 
+    # Number of changes kept in the journal. Callers that are further behind
+    # are told that the whole map should be considered as changed
+    MAX_JOURNAL_LENGTH = 256
+
     def __init__(self,
 
                  # Obstacles parameters
@@ -100,6 +128,14 @@ class Map:
         # using their velocity vector or can be randomly spawned
         self.enable_changes = True
 
+        # Map version, incremented each time the obstacles change. Incremental
+        # changes (add/remove) are also recorded in the journal; whole map
+        # changes (reset, load, generate, ...) clear the journal and move its
+        # base version forward, meaning that everything should be recomputed
+        self.version = 0
+        self._journal_base_version = 0
+        self._journal = []
+
     @property
     def goal(self):
         return self._current_goal
@@ -108,6 +144,16 @@ class Map:
     def obstacles(self):
         return list(self._obstacles.values())
 
+    @property
+    def obstacle_ids(self):
+        return list(self._obstacles.keys())
+
+    def get_obstacle(self, obstacle_id):
+        """
+        Returns the obstacle with the specified id (None if there is no such obstacle)
+        """
+        return self._obstacles.get(obstacle_id)
+
     def set_goal(self, goal, clearance=0.2):
         """
         Set a new goal only if there are no obstacles near it
@@ -143,6 +189,9 @@ class Map:
                     # Call to the private method
                     self._add_obstacle(obstacle)
 
+                    # Record the change
+                    self._record_change(MapChange.ADD, obstacle_id, obstacle)
+
                     # Increment the index for the next polygon
                     self._next_obstacle_id += 1
 
@@ -164,11 +213,14 @@ class Map:
         if self.enable_changes:
 
             if obstacle_id in self._obstacles:
-                del self._obstacles[obstacle_id]
+                obstacle = self._obstacles.pop(obstacle_id)
 
                 # Update other data structures
                 self._remove_obstacle(obstacle_id)
 
+                # Record the change
+                self._record_change(MapChange.REMOVE, obstacle_id, obstacle)
+
                 return True
 
         return False
@@ -188,6 +240,49 @@ class Map:
         polygon = self._generate_random_polygon(point)
         return self.add_obstacle(Obstacle(polygon))
 
+    def _record_change(self, kind, obstacle_id, obstacle):
+        self.version += 1
+        self._journal.append(MapChange(self.version, kind, obstacle_id, obstacle.get_bounds()))
+
+        # Drop the oldest change: it's no longer known what changed after older versions
+        if len(self._journal) > self.MAX_JOURNAL_LENGTH:
+            self._journal_base_version = self._journal.pop(0).version
+
+    def _invalidate_journal(self):
+        """
+        The whole map changed: incremental changes are no longer meaningful
+        """
+        self.version += 1
+        self._journal_base_version = self.version
+        self._journal = []
+
+    def changes_since(self, version):
+        """
+        Returns the list of changes (MapChange) that occurred after the specified
+        version, oldest first. Returns None if the journal can't tell what changed
+        (e.g. the map has been reset or reloaded in the meantime, or the changes
+        have been dropped from the journal because they are too old): in this case
+        the caller should consider the whole map as changed
+        """
+
+        if version < self._journal_base_version:
+            return None
+        return [change for change in self._journal if change.version > version]
+
+    def fingerprint(self):
+        """
+        Hash of the content of the map (boundaries and obstacles, the goal is not
+        included): maps with the same fingerprint have the same free space
+        """
+
+        # Obstacle ids are part of the content: roadmaps and caches refer to obstacles by id
+        data = {
+            'boundaries': [float(value) for value in self.map_boundaries],
+            'obstacles': [{'id': obstacle_id, 'polygon': obstacle.polygon.to_dict()}
+                          for obstacle_id, obstacle in sorted(self._obstacles.items())]
+        }
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=float).encode()).hexdigest()
+
     def enable(self):
         self.enable_changes = True
 
@@ -226,8 +321,13 @@ class Map:
         We may want to reset other data structures too, that is why we call
         the abstract _reset method
         """
+        fingerprint = self.fingerprint()
         self._obstacles = self._initial_obstacles.copy()
         self._next_obstacle_id = max(self._obstacles.keys(), default=0) + 1
+
+        # If the obstacles didn't change, the data computed on the map is still valid
+        if self.fingerprint() != fingerprint:
+            self._invalidate_journal()
         self._reset()
 
     @abstractmethod
@@ -241,6 +341,7 @@ class Map:
         """
         self._obstacles = {}
         self._next_obstacle_id = 0
+        self._invalidate_journal()
         self._clear()
 
     @abstractmethod
@@ -272,6 +373,7 @@ class Map:
             self._obstacles = obj._obstacles.copy()
             self._next_obstacle_id = max(self._obstacles.keys(), default=0) + 1
             self._current_goal = obj._current_goal
+            self._invalidate_journal()
             self._load_from_pickle()
 
     @abstractmethod
@@ -294,6 +396,7 @@ class Map:
         self._obstacles = {o_dict['id']: Obstacle.from_dict(o_dict['obstacle']) for o_dict in data['obstacles']}
         self._initial_obstacles = self._obstacles.copy()
         self._next_obstacle_id = max(self._obstacles.keys(), default=0) + 1
+        self._invalidate_journal()
         self._load_from_json_data()
 
     @abstractmethod
@@ -376,3 +479,4 @@ class Map:
         self._initial_obstacles = self._obstacles.copy()
         self._next_obstacle_id = len(obstacles)
         self._current_goal = goal
+        self._invalidate_journal()